@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class SiteStatus(Enum):
@@ -21,6 +21,9 @@ class TransactionStatus(Enum):
 class LockType(Enum):
     READ = 1
     WRITE = 2
+    # taken on the whole site before a lock on one of its variables, see LockManager
+    INTENTION_READ = 3
+    INTENTION_WRITE = 4
 
 
 class NumType(Enum):
@@ -37,9 +40,18 @@ class AbortType(Enum):
     DEADLOCK = 1
     SITE_FAILURE = 2
     NO_DATA_FOR_READ_ONLY = 3
-
-
-class OperationType(Enum):
+    # wound-wait: an older transaction requested a lock it holds
+    WOUNDED = 4
+    # wait-die: it requested a lock held by an older transaction
+    DIED = 5
+    # optimistic concurrency control: a variable read was committed since
+    VALIDATION = 6
+    # the client of the transaction closed its connection to the server
+    DISCONNECTED = 7
+
+
+# stored as a plain int in Operation
+class OperationType(IntEnum):
     BEGIN = 1
     BEGINRO = 2
     WRITE = 3
@@ -48,8 +60,8 @@ class OperationType(Enum):
     RECOVER = 6
     DUMP = 7
     END = 8
+    STATS = 9
 
+# default topology, see model/Topology.py
 num_distinct_variables = 20
 num_sites = 10
-
-TABLE_HEADERS = ["Site"] + [f"x{i}" for i in range(1, num_distinct_variables + 1)]
\ No newline at end of file
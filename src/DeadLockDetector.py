@@ -1,141 +1,168 @@
-from collections import defaultdict
-from src.model.Operation import Operation
-from src.CustomizedConf import OperationType
+from heapq import heappop, heappush
 
 
 class DeadLockDetector:
+    """
+    A persistent wait-for graph keyed by tid.
+
+    Edges are added when an operation blocks on locks held by other transactions and removed
+    when it is retried, succeeds or its transaction leaves. A cycle check only searches from
+    the transactions whose outgoing edges changed since the last check.
+
+    :param self.waits_for: tid -> {tid holding a lock it waits for: number of blocked operations}
+    :param self.waited_by: tid -> set of tids waiting for it
+    :param self.changed: tids whose outgoing edges were added since the last check
+    :param self.pending: heap of the changed tids, oldest first, a tid no longer in changed is skipped
+    :param self.trace: the last cycle found
+    :param self.metrics: Metrics of the transaction manager
+    :param self.excluded: tids a cycle is not searched through, none by default
+    """
+    excluded = frozenset()
 
     def __init__(self, tm):
         self.tm = tm
-        self.v_operation_dict = {}
-        self.Trans_waitlist = {}
-
-    def add_operation(self, operation):
-        operation_type = operation.get_type()
-
-        tid = operation.get_tid()
-        if self.tm.transactions[tid].is_read_only():
+        self.metrics = tm.metrics
+        self.waits_for = {}
+        self.waited_by = {}
+        self.changed = set()
+        self.pending = []
+        self.trace = []
+
+    def mark_changed(self, tid):
+        if tid not in self.changed:
+            self.changed.add(tid)
+            heappush(self.pending, tid)
+
+    def set_changed(self, tids):
+        """
+        Replace the tids a cycle is searched from at the next check
+
+        :param tids: iterable of tids
+        :return: None
+        """
+        self.changed = set(tids)
+        self.pending = sorted(self.changed)
+
+    def add_wait(self, tid, holders):
+        """
+        Add the edges of an operation of tid blocked by holders
+
+        :param tid: transaction id of the blocked operation
+        :param holders: tids holding the conflicting locks
+        :return: None
+        """
+        for holder in holders:
+            if holder == tid:
+                continue
+            edges = self.waits_for.setdefault(tid, {})
+            edges[holder] = edges.get(holder, 0) + 1
+            self.waited_by.setdefault(holder, set()).add(tid)
+            self.mark_changed(tid)
+
+    def remove_wait(self, tid, holders):
+        """
+        Remove the edges added by add_wait(tid, holders) once the operation is unblocked
+
+        :param tid: transaction id of the blocked operation
+        :param holders: tids the operation was waiting for
+        :return: None
+        """
+        edges = self.waits_for.get(tid)
+        if edges is None:
             return
+        for holder in holders:
+            if holder not in edges:
+                continue
+            edges[holder] -= 1
+            if edges[holder] == 0:
+                del edges[holder]
+                self.waited_by[holder].discard(tid)
+        if not edges:
+            del self.waits_for[tid]
 
-        vid = operation.get_vid()
-        operation_list = self.v_operation_dict.get(vid, set())
-        # Read operation
-        if operation_type == OperationType.READ:
-            for op in operation_list:
-                if op.get_tid() == tid and not (op.get_type != operation_type and operation_list >= 2):
-                    # Add operation to the dictionary
-                    operation_list.add(operation)
-                    self.v_operation_dict[vid] = operation_list
-                    return
-
-            for op in operation_list:
-                if op.get_type() == OperationType.WRITE and op.get_tid() != tid:
-                    waiting_ops = self.Trans_waitlist.get(tid, set())
-                    waiting_ops.add(op.get_tid())
-                    self.Trans_waitlist[tid] = waiting_ops
-        # Write operation
-        else:
-            for op in operation_list:
-                if op.get_tid() == tid and op.get_type == OperationType.WRITE:
-                    operation_list.add(operation)
-                    self.v_operation_dict[vid] = operation_list
-                    return
-
-            for op in operation_list:
-                if op.get_tid() != tid:
-                    waiting_ops = self.Trans_waitlist.get(tid, set())
-                    waiting_ops.add(op.get_tid())
-                    self.Trans_waitlist[tid] = waiting_ops
-
-        # Add operation to the dictionary
-        s_operation_list = set(operation_list)
-        s_operation_list.add(operation)
-        self.v_operation_dict[vid] = s_operation_list
-
-    #method get from geeksforgeeks.org to detect cycles
     def deadlock(self):
-        graph = self.Trans_waitlist
-        edge_list = []
-        for key, values in graph.items():
-            for value in values:
-                edge_list.append([key, value])
-        V = len(self.tm.transactions)
-        G = Graph(V)
-        for edge in edge_list:
-            G.addEdge(edge[0], edge[1])
-        if G.isCyclic() == 1:
-            self.trace = self.getcycle()
-            return True
-        else:
-            return False
-
-    # Remove the aborted transaction from deadlockdetector
+        """
+        Check the transactions whose edges changed for a cycle, the cycle is kept in self.trace
+
+        :return: Boolean
+        """
+        self.metrics.incr("deadlock.checks")
+        changed, pending = self.changed, self.pending
+        while pending:
+            # oldest tid first, so the cycle found does not depend on the hash order of the set
+            tid = heappop(pending)
+            if tid not in changed:
+                continue
+            changed.remove(tid)
+            self.metrics.incr("deadlock.searches")
+            cycle = self.find_cycle(tid)
+            if cycle:
+                self.metrics.incr("deadlock.cycles")
+                self.metrics.observe("deadlock.cycle_length", len(cycle))
+                # the transaction may belong to another cycle once this one is broken
+                self.mark_changed(tid)
+                self.trace = cycle
+                return True
+        return False
+
+    def find_cycle(self, start):
+        """
+        Search a path from start back to itself, not through the excluded tids
+
+        :param start: tid
+        :return: list of tids in the cycle, empty if there is none
+        """
+        excluded = self.excluded
+        if start in excluded:
+            return []
+        parent = {start: None}
+        stack = [start]
+        while stack:
+            tid = stack.pop()
+            for holder in self.waits_for.get(tid, ()):
+                if holder in excluded:
+                    continue
+                if holder == start:
+                    cycle = [tid]
+                    while tid != start:
+                        tid = parent[tid]
+                        cycle.append(tid)
+                    cycle.reverse()
+                    return cycle
+                if holder not in parent:
+                    parent[holder] = tid
+                    stack.append(holder)
+        return []
+
+    # Remove the aborted or committed transaction from deadlockdetector
     def remove_transaction(self, tid):
-        for v, op_list in self.v_operation_dict.items():
-            new_op_list = []
-            for op in op_list:
-                if op.get_tid != tid:
-                    new_op_list.append(op)
-            self.v_operation_dict[v] = new_op_list
-        self.Trans_waitlist.pop(tid, None)
+        for holder in self.waits_for.pop(tid, {}):
+            self.waited_by[holder].discard(tid)
+        for waiter in self.waited_by.pop(tid, set()):
+            edges = self.waits_for[waiter]
+            edges.pop(tid, None)
+            if not edges:
+                del self.waits_for[waiter]
+        self.changed.discard(tid)
 
     # get the tids in the cycle
     def getcycle(self):
-        graph = self.Trans_waitlist
-        edge_list = []
-        for key, values in graph.items():
-            for value in values:
-                edge_list.append([key, value])
-        v_set = set()
-        start = []
-        end = []
-        for edge in edge_list:
-            start.append(edge[0])
-            end.append(edge[1])
-            v_set.add(edge[0])
-            v_set.add(edge[1])
-        for i in range(len(v_set)):
-            for v in end:
-                if v not in start:
-                    edge_list.remove(v)
-        cycle = []
-        for v in v_set:
-            cycle.append(v)
-        return cycle
-
-#graph class get from geeksforgeeks.org to detect cycles
-class Graph:
-    def __init__(self, vertices):
-        self.graph = defaultdict(list)
-        self.V = vertices
-
-    def addEdge(self, u, v):
-        self.graph[u].append(v)
-
-    def isCyclicUtil(self, v, visited, recStack):
-
-        # Mark current node as visited and
-        # adds to recursion stack
-        visited[v] = True
-        recStack[v] = True
-
-        for neighbour in self.graph[v]:
-            if visited[neighbour] == False:
-                if self.isCyclicUtil(neighbour, visited, recStack) == True:
-                    return True
-            elif recStack[neighbour] == True:
-                return True
+        return self.trace
 
-        # The node needs to be poped from
-        # recursion stack before function ends
-        recStack[v] = False
-        return False
 
-    def isCyclic(self):
-        visited = [False] * (self.V + 1)
-        recStack = [False] * (self.V + 1)
-        for node in range(self.V):
-            if visited[node] == False:
-                if self.isCyclicUtil(node, visited, recStack) == True:
-                    return True
+class NullWaitForGraph(DeadLockDetector):
+    """
+    A wait-for graph keeping no edges, for the deadlock policies that never look for a cycle
+    """
+
+    def add_wait(self, tid, holders):
+        pass
+
+    def remove_wait(self, tid, holders):
+        pass
+
+    def deadlock(self):
         return False
+
+    def remove_transaction(self, tid):
+        pass
@@ -0,0 +1,87 @@
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from src.manager.DataManager import DataManager
+from src.manager.LogManager import LogConfig
+from src.model.Topology import Topology
+
+
+def prepare(directory, topology, site_id, batch, checkpoint):
+    """
+    Commit a new value of every copy of the site, batch variables per transaction, and
+    optionally checkpoint them so the log is empty
+
+    :return: None
+    """
+    log_config = LogConfig(directory, group_size=1024, checkpoint_interval=1 << 62)
+    data_manager = DataManager(site_id, topology, log=log_config.open(site_id))
+    vids = topology.get_variables(site_id)
+    for tid, start in enumerate(range(0, len(vids), batch)):
+        data_manager.commit_writes({vid: vid * 7 for vid in vids[start:start + batch]}, tid)
+    if checkpoint:
+        data_manager.save_checkpoint()
+    data_manager.close()
+
+
+def eager(directory, topology, site_id):
+    """
+    Build every copy in memory like the eager data layout did before the copies were lazy
+    """
+    data_manager = DataManager(site_id, topology)
+    for vid in topology.get_variables(site_id):
+        data_manager.materialize(vid)
+    return data_manager
+
+
+def restart(directory, topology, site_id):
+    return DataManager(site_id, topology, log=LogConfig(directory).open(site_id))
+
+
+def measure(start_site, directory, topology, site_id, reads):
+    """
+    Time the start of a site and then reads of random variables
+
+    :return: (startup seconds, seconds of the reads, bytes allocated by the start)
+    """
+    start = time.perf_counter()
+    data_manager = start_site(directory, topology, site_id)
+    startup = time.perf_counter() - start
+
+    vids = topology.get_variables(site_id)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(reads):
+        data_manager.read(rng.choice(vids))
+    reading = time.perf_counter() - start
+    data_manager.close()
+
+    tracemalloc.start()
+    data_manager = start_site(directory, topology, site_id)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    data_manager.close()
+    return startup, reading, allocated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("CheckpointBenchmark")
+    parser.add_argument("-variables", type=int, default=200000, help="number of variables")
+    parser.add_argument("-sites", type=int, default=10, help="number of sites")
+    parser.add_argument("-batch", type=int, default=10, help="variables written per transaction")
+    parser.add_argument("-reads", type=int, default=1000, help="reads after the start")
+    args = parser.parse_args()
+
+    topology = Topology(args.variables, args.sites)
+    site_id = 1
+    print(f"site {site_id} holds {len(topology.get_variables(site_id))} copies")
+    print(f"{'start':>12} {'startup s':>10} {'reads s':>8} {'allocated MB':>13}")
+    with tempfile.TemporaryDirectory() as log_only, tempfile.TemporaryDirectory() as checkpointed:
+        prepare(log_only, topology, site_id, args.batch, False)
+        prepare(checkpointed, topology, site_id, args.batch, True)
+        for name, start_site, directory in (("eager", eager, None),
+                                            ("log replay", restart, log_only),
+                                            ("checkpoint", restart, checkpointed)):
+            startup, reading, allocated = measure(start_site, directory, topology, site_id, args.reads)
+            print(f"{name:>12} {startup:>10.3f} {reading:>8.4f} {allocated / 2 ** 20:>13.1f}")
@@ -0,0 +1,67 @@
+import argparse
+import time
+from src.benchmarks.WorkloadGenerator import Workload
+from src.manager.DeadlockPolicy import create_policy
+from src.utils.FileRunner import run
+from src.utils.Metrics import Metrics
+from src.utils.OutputSink import NullSink
+from src.utils.Parser import parse_command
+
+# workload name -> parameters of Workload, all with many transactions on few hot variables
+WORKLOADS = {
+    "hot-keys": dict(read_ratio=0.5, skew=1.2, concurrency=20),
+    "hot-writes": dict(read_ratio=0.2, skew=1.2, concurrency=20),
+    "wide-transactions": dict(ops_per_transaction=20, read_ratio=0.5, skew=1.0, concurrency=10),
+}
+
+# policy name -> (deadlock policy, detection interval)
+POLICIES = {
+    "detect": ("detect", 1),
+    "detect/10": ("detect", 10),
+    "detect/100": ("detect", 100),
+    "wound-wait": ("wound-wait", 1),
+    "wait-die": ("wait-die", 1),
+}
+
+
+def measure(lines, policy):
+    """
+    Run the trace with a deadlock policy
+
+    :return: dict of the results
+    """
+    operations = [parse_command(line, tick) for tick, line in enumerate(lines, 1)]
+    metrics = Metrics()
+    start = time.perf_counter()
+    run(operations, NullSink(), metrics=metrics, deadlock_policy=create_policy(*policy))
+    seconds = time.perf_counter() - start
+    counters = metrics.counters
+    commits = counters.get("commits", 0)
+    aborts = sum(counters.get(f"aborts.{reason}", 0) for reason in ("deadlock", "wounded", "died"))
+    return {
+        "seconds": seconds,
+        "commits": commits,
+        "aborts": aborts,
+        "abort_rate": aborts / max(1, commits + aborts),
+        "commits_per_second": commits / seconds,
+        "checks": counters.get("deadlock.checks", 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("DeadlockBenchmark")
+    parser.add_argument("-transactions", type=int, default=2000, help="transactions per workload")
+    parser.add_argument("-seed", type=int, default=0, help="random seed of the workloads")
+    args = parser.parse_args()
+
+    print(f"{'workload':>17} {'policy':>10} {'seconds':>8} {'commits':>8} {'aborts':>7} {'abort rate':>10} "
+          f"{'commits/s':>10} {'checks':>7}")
+    for name, params in WORKLOADS.items():
+        params = dict(params)
+        ops = params.pop("ops_per_transaction", 8)
+        lines = list(Workload(args.transactions, ops, seed=args.seed, **params).generate())
+        for policy_name, policy in POLICIES.items():
+            result = measure(lines, policy)
+            print(f"{name:>17} {policy_name:>10} {result['seconds']:>8.2f} {result['commits']:>8} "
+                  f"{result['aborts']:>7} {result['abort_rate']:>10.1%} {result['commits_per_second']:>10.0f} "
+                  f"{result['checks']:>7}")
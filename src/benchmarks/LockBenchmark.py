@@ -0,0 +1,112 @@
+import argparse
+import time
+from src.CustomizedConf import LockType
+from src.benchmarks.WorkloadGenerator import Workload
+from src.manager.LockManager import LockManager
+from src.utils.FileRunner import run
+from src.utils.Metrics import Metrics
+from src.utils.OutputSink import NullSink
+from src.utils.Parser import parse_command
+
+# workload name -> parameters of Workload, from little to heavy contention on few variables
+WORKLOADS = {
+    "uniform": dict(read_ratio=0.5, concurrency=10),
+    "hot-keys": dict(read_ratio=0.5, skew=1.2, concurrency=20),
+    "hot-writes": dict(read_ratio=0.2, skew=1.2, concurrency=20),
+    "many-readers": dict(read_ratio=0.9, skew=1.0, concurrency=40),
+}
+
+
+def measure(lines, fair_locks):
+    """
+    Run the trace with fair or barging locks
+
+    :return: dict of the results
+    """
+    operations = [parse_command(line, tick) for tick, line in enumerate(lines, 1)]
+    metrics = Metrics()
+    start = time.perf_counter()
+    run(operations, NullSink(), metrics=metrics, fair_locks=fair_locks)
+    seconds = time.perf_counter() - start
+    counters = metrics.counters
+    wait = metrics.histograms.get("wait.ticks")
+    return {
+        "seconds": seconds,
+        "commits": counters.get("commits", 0),
+        "deadlocks": counters.get("aborts.deadlock", 0),
+        "conflicts": counters.get("lock.read.conflict", 0) + counters.get("lock.write.conflict", 0),
+        "wait_p99": wait.percentile(99) if wait is not None else 0,
+        "wait_max": wait.max if wait is not None else 0,
+        "retries": counters.get("retry.attempts", 0),
+        "write_locks": counters.get("lock.write.granted", 0) + counters.get("lock.write.promoted", 0),
+    }
+
+
+def hot_replica(writers, ticks):
+    """
+    A trace where a reader holds the lock of x2 at site 10 only, writers of x2 wait for it while
+    other operations run. A write locking the up sites one by one locks sites 1 to 9 and releases
+    them on every retry.
+
+    :return: list of lines
+    """
+    lines = [f"fail({sid})" for sid in range(1, 10)]
+    lines += ["begin(T1)", "R(T1,x2)"]
+    lines += [f"recover({sid})" for sid in range(1, 10)]
+    for tid in range(2, writers + 2):
+        lines += [f"begin(T{tid})", f"W(T{tid},x2,{tid})"]
+    lines.append(f"begin(T{writers + 2})")
+    lines += [f"R(T{writers + 2},x{2 * (i % 5) + 4})" for i in range(ticks)]
+    lines += [f"end(T{tid})" for tid in range(1, writers + 3)]
+    return lines
+
+
+def measure_groups(num_variables, rounds, escalation_threshold):
+    """
+    Time locking num_variables variables one by one and with one group lock
+
+    :return: [microseconds one by one, microseconds as a group]
+    """
+    vids = list(range(1, num_variables + 1))
+    results = []
+    for grouped in (False, True):
+        start = time.perf_counter()
+        for tid in range(rounds):
+            lock_manager = LockManager(escalation_threshold=escalation_threshold)
+            if grouped:
+                lock_manager.acquire_locks(tid, vids, LockType.WRITE)
+            else:
+                for vid in vids:
+                    lock_manager.acquire_write_lock(tid, vid)
+            lock_manager.release_locks_by_trans(tid)
+        results.append((time.perf_counter() - start) / rounds * 1e6)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("LockBenchmark")
+    parser.add_argument("-transactions", type=int, default=2000, help="transactions per workload")
+    parser.add_argument("-seed", type=int, default=0, help="random seed of the workloads")
+    args = parser.parse_args()
+
+    print(f"{'workload':>13} {'locks':>7} {'seconds':>8} {'commits':>8} {'deadlocks':>9} {'conflicts':>9} "
+          f"{'wait p99':>8} {'wait max':>8}")
+    for name, params in WORKLOADS.items():
+        lines = list(Workload(args.transactions, 8, seed=args.seed, **params).generate())
+        for fair_locks in (False, True):
+            result = measure(lines, fair_locks)
+            print(f"{name:>13} {'fifo' if fair_locks else 'barging':>7} {result['seconds']:>8.2f} "
+                  f"{result['commits']:>8} {result['deadlocks']:>9} {result['conflicts']:>9} "
+                  f"{result['wait_p99']:>8} {result['wait_max']:>8}")
+
+    print()
+    result = measure(hot_replica(20, 2000), True)
+    print(f"hot replica: {result['seconds']:.2f} s, {result['retries']} retries, "
+          f"{result['write_locks']} write locks granted, {result['commits']} commits")
+
+    print()
+    print(f"{'variables':>9} {'one by one us':>14} {'group us':>9} {'escalated us':>13}")
+    for num_variables in (8, 64, 512):
+        single, grouped = measure_groups(num_variables, 200, 1 << 30)
+        escalated = measure_groups(num_variables, 200, 1)[1]
+        print(f"{num_variables:>9} {single:>14.1f} {grouped:>9.1f} {escalated:>13.1f}")
@@ -0,0 +1,84 @@
+import argparse
+import random
+import tracemalloc
+from src.CustomizedConf import OperationType
+from src.utils.FileRunner import run
+from src.utils.OutputSink import NullSink
+from src.utils.Parser import parse_command
+
+
+class LegacyOperation:
+    """
+    The dict-backed Operation with an enum type used before the slotted one, kept for comparison
+    """
+    def __init__(self, operation_type, tid, vid, value, sid, time):
+        self.operation_type = OperationType(operation_type)
+        self.tid = tid
+        self.vid = vid
+        self.value = value
+        self.sid = sid
+        self.time = time
+
+
+def generate_trace(num_transactions, ops_per_transaction, seed=0):
+    """
+    Generate a trace keeping every transaction open until all of them have run their reads, so
+    the transaction manager holds the history of all of them at once
+
+    :param num_transactions: number of transactions
+    :param ops_per_transaction: number of reads of each transaction
+    :param seed: random seed
+    :return: list of lines
+    """
+    rng = random.Random(seed)
+    lines = [f"begin(T{tid})\n" for tid in range(1, num_transactions + 1)]
+    for _ in range(ops_per_transaction):
+        lines.extend(f"R(T{tid},x{rng.randint(1, 20)})\n" for tid in range(1, num_transactions + 1))
+    lines.extend(f"end(T{tid})\n" for tid in range(1, num_transactions + 1))
+    return lines
+
+
+def peak_memory(function, *args):
+    """
+    Peak memory allocated by function(*args) in bytes
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def materialize(lines, record):
+    operations = []
+    for tick, line in enumerate(lines, 1):
+        operation = parse_command(line, tick)
+        operations.append(record(operation.operation_type, operation.tid, operation.vid,
+                                 operation.value, operation.sid, operation.time))
+    return operations
+
+
+def stream(lines):
+    run((parse_command(line, tick) for tick, line in enumerate(lines, 1)), NullSink())
+
+
+if __name__ == "__main__":
+    from src.model.Operation import Operation
+
+    parser = argparse.ArgumentParser("MemoryBenchmark")
+    parser.add_argument("-transactions", type=int, default=1000, help="number of concurrent transactions")
+    parser.add_argument("-ops", type=int, default=300, help="number of reads per transaction")
+    args = parser.parse_args()
+
+    lines = generate_trace(args.transactions, args.ops)
+    print(f"{len(lines)} operations")
+    print(f"{'case':>24} {'peak MB':>9} {'bytes/op':>9}")
+    cases = (
+        ("legacy operations", materialize, lines, LegacyOperation),
+        ("slotted operations", materialize, lines, Operation),
+        ("streamed run", stream, lines),
+    )
+    for name, function, *function_args in cases:
+        peak = peak_memory(function, *function_args)
+        print(f"{name:>24} {peak / 1e6:>9.1f} {peak / len(lines):>9.1f}")
@@ -0,0 +1,58 @@
+import argparse
+import time
+from src.benchmarks.WorkloadBenchmark import WORKLOADS, CountingSink, parse
+from src.benchmarks.WorkloadGenerator import Workload
+from src.manager.OptimisticTransactionManager import OptimisticTransactionManager
+from src.manager.TransactionManager import TransactionManager
+from src.model.Topology import Topology
+from src.utils.FileRunner import run
+from src.utils.Metrics import Metrics
+
+# engine name -> transaction manager class
+ENGINES = {
+    "2pl": TransactionManager,
+    "occ": OptimisticTransactionManager,
+}
+
+
+def measure(workload, manager_class):
+    """
+    Run the trace of workload with a concurrency control engine
+
+    :return: dict of the results
+    """
+    topology = Topology(workload.num_variables, workload.num_sites)
+    operations = [op for op in parse(workload.generate()) if op is not None]
+    sink = CountingSink()
+    metrics = Metrics()
+    start = time.perf_counter()
+    run(operations, sink, topology, manager_class, metrics)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "ops_per_sec": len(operations) / seconds,
+        "commits": sink.commits,
+        "aborts": sink.aborts,
+        "validation_aborts": metrics.counters.get("aborts.validation", 0),
+        "blocked": metrics.counters.get("ops.blocked", 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("OccBenchmark")
+    parser.add_argument("-workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS),
+                        help="workloads to run")
+    parser.add_argument("-scale", type=float, default=1.0, help="factor applied to the number of transactions")
+    parser.add_argument("-seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    print(f"{'workload':>20} {'engine':>6} {'seconds':>8} {'ops/s':>8} {'commits':>8} {'aborts':>7} "
+          f"{'validation':>10} {'blocked':>8}")
+    for name in args.workloads:
+        params = dict(WORKLOADS[name], seed=args.seed)
+        params["transactions"] = max(1, int(params["transactions"] * args.scale))
+        for engine, manager_class in ENGINES.items():
+            result = measure(Workload(**params), manager_class)
+            print(f"{name:>20} {engine:>6} {result['seconds']:>8.2f} {result['ops_per_sec']:>8.0f} "
+                  f"{result['commits']:>8} {result['aborts']:>7} {result['validation_aborts']:>10} "
+                  f"{result['blocked']:>8}")
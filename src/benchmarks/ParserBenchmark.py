@@ -0,0 +1,95 @@
+import argparse
+import random
+import time
+from src.model.Operation import Operation
+from src.CustomizedConf import OperationType
+from src.utils.Parser import parse_command
+
+
+def legacy_parse_line(line, tick):
+    """
+    The substring-matching classifier FileLoader used before the compiled parser, kept for comparison
+    """
+    line = line.strip()
+    if line.find("beginRO") != -1:
+        line = (line.split('('))[1]
+        line = line.replace(')', '')
+        line = line[1:]
+        return Operation(OperationType.BEGINRO, int(line), None, None, None, tick)
+    if line.find("begin") != -1:
+        line = line.split("(")[1]
+        line = line.replace(')', '')
+        line = line[1:]
+        return Operation(OperationType.BEGIN, int(line), None, None, None, tick)
+    if line.find("W") != -1:
+        line = line.split("(")[1]
+        line = line.replace(')', '')
+        values = line.split(",")
+        values[0] = (values[0])[1:]
+        values[1] = (values[1]).split("x")[1]
+        return Operation(OperationType.WRITE, int(values[0]), int(values[1]), int(values[2]), None, tick)
+    if line.find("R") != -1:
+        line = line.split("(")[1]
+        line = line.replace(')', '')
+        values = line.split(",")
+        values[0] = (values[0])[1:]
+        values[1] = (values[1]).split("x")[1]
+        return Operation(OperationType.READ, int(values[0]), int(values[1]), None, None, tick)
+    if line.find("fail") != -1:
+        line = line.split("(")[1]
+        line = line.replace(')', '')
+        return Operation(OperationType.FAIL, None, None, None, int(line), tick)
+    if line.find("end") != -1:
+        line = line.split("(")[1]
+        line = line.replace(')', '')
+        line = line[1:]
+        return Operation(OperationType.END, int(line), None, None, None, tick)
+    if line.find("recover") != -1:
+        line = line.split("(")[1]
+        line = line.replace(')', '')
+        return Operation(OperationType.RECOVER, None, None, None, int(line), tick)
+    if line.find("dump") != -1:
+        return Operation(OperationType.DUMP, None, None, None, None, tick)
+
+
+def generate_lines(num_lines, seed=0):
+    """
+    Generate a trace with the command mix of the test scripts
+
+    :param num_lines: number of lines
+    :param seed: random seed
+    :return: list of lines
+    """
+    rng = random.Random(seed)
+    templates = [
+        (30, lambda: f"R(T{rng.randint(1, 1000)},x{rng.randint(1, 20)})\n"),
+        (30, lambda: f"W(T{rng.randint(1, 1000)}, x{rng.randint(1, 20)}, {rng.randint(0, 10000)})\n"),
+        (15, lambda: f"begin(T{rng.randint(1, 1000)})\n"),
+        (3, lambda: f"beginRO(T{rng.randint(1, 1000)})\n"),
+        (15, lambda: f"end(T{rng.randint(1, 1000)})\n"),
+        (3, lambda: f"fail({rng.randint(1, 10)})\n"),
+        (3, lambda: f"recover({rng.randint(1, 10)})\n"),
+        (1, lambda: "dump()\n"),
+    ]
+    weights = [w for w, _ in templates]
+    makers = [m for _, m in templates]
+    return [rng.choices(makers, weights)[0]() for _ in range(num_lines)]
+
+
+def measure(parse, lines):
+    start = time.perf_counter()
+    for tick, line in enumerate(lines):
+        parse(line, tick)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("ParserBenchmark")
+    parser.add_argument("-lines", type=int, default=1000000, help="number of lines in the trace")
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines)
+    print(f"{'parser':>8} {'seconds':>9} {'lines/s':>12}")
+    for name, parse in (("legacy", legacy_parse_line), ("compiled", parse_command)):
+        seconds = measure(parse, lines)
+        print(f"{name:>8} {seconds:>9.2f} {args.lines / seconds:>12.0f}")
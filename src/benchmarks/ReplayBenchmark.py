@@ -0,0 +1,38 @@
+import argparse
+import os
+import tempfile
+import time
+from src.benchmarks.WorkloadGenerator import Workload
+from src.utils.FileRunner import run_by_file
+from src.utils.TraceRecorder import record_by_file, replay
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("ReplayBenchmark")
+    parser.add_argument("-transactions", type=int, default=5000, help="transactions in the trace")
+    parser.add_argument("-ops", type=int, default=10, help="operations per transaction")
+    parser.add_argument("-format", type=str, default="table", help="output format of the text run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        text = os.path.join(directory, "trace.txt")
+        trace = os.path.join(directory, "trace.rctr")
+        with open(text, "w") as f:
+            for line in Workload(args.transactions, args.ops, fail_rate=0.001, recover_rate=0.1).generate():
+                f.write(line + "\n")
+
+        results = [
+            ("text run", measure(run_by_file, text, os.devnull, args.format)),
+            ("record", measure(record_by_file, text, trace, os.devnull, args.format)),
+            ("replay", measure(replay, trace)),
+        ]
+        print(f"text {os.path.getsize(text)} bytes, trace {os.path.getsize(trace)} bytes")
+        print(f"{'run':>9} {'seconds':>8} {'speedup':>8}")
+        for name, seconds in results:
+            print(f"{name:>9} {seconds:>8.2f} {results[0][1] / seconds:>8.1f}")
@@ -0,0 +1,78 @@
+import argparse
+import time
+from src.CustomizedConf import OperationType
+from src.manager.TransactionManager import TransactionManager
+from src.model.Operation import Operation
+from src.utils.FileRunner import init_sites
+from src.utils.OutputSink import NullSink
+
+
+def build_backlog(num_blocked):
+    """
+    Build a transaction manager where T1 holds the write lock of x1 and num_blocked
+    transactions are blocked reading x1
+
+    :param num_blocked: number of blocked transactions
+    :return: (TransactionManager, next tick)
+    """
+    tm = TransactionManager(NullSink())
+    tm.get_all_sites(init_sites())
+    tick = 0
+    ops = [Operation(OperationType.BEGIN, 1, None, None, None, 0),
+           Operation(OperationType.WRITE, 1, 1, 101, None, 0)]
+    for tid in range(2, num_blocked + 2):
+        ops.append(Operation(OperationType.BEGIN, tid, None, None, None, 0))
+        ops.append(Operation(OperationType.READ, tid, 1, None, None, 0))
+    for op in ops:
+        op.set_time(tick)
+        tm.execute_operation(op)
+        tick += 1
+    return tm, tick
+
+
+def measure_ticks(tm, tick, num_ticks):
+    """
+    Time new operations that do not touch the blocked resource, each of them runs a retry pass
+
+    :return: average microseconds per tick
+    """
+    first_tid = max(tm.transactions) + 1
+    start = time.perf_counter()
+    for i in range(num_ticks):
+        tm.execute_operation(Operation(OperationType.BEGIN, first_tid + i, None, None, None, tick + i))
+    return (time.perf_counter() - start) / num_ticks * 1e6
+
+
+def measure_full_rescan(tm):
+    """
+    Time one pass retrying every blocked operation, the cost each tick had before the wait queue
+
+    :return: microseconds
+    """
+    start = time.perf_counter()
+    for op in list(tm.waiting_list):
+        tm.wait_keys = []
+        tm.assign_task(op, True)
+    return (time.perf_counter() - start) * 1e6
+
+
+def run_benchmark(sizes, num_ticks):
+    results = []
+    for size in sizes:
+        tm, tick = build_backlog(size)
+        per_tick = measure_ticks(tm, tick, num_ticks)
+        rescan = measure_full_rescan(tm)
+        results.append((size, len(tm.waiting_list), per_tick, rescan))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("RetryBenchmark")
+    parser.add_argument("-sizes", type=int, nargs="+", default=[250, 500, 1000, 2000, 4000],
+                        help="numbers of blocked transactions")
+    parser.add_argument("-ticks", type=int, default=1000, help="ticks measured per size")
+    args = parser.parse_args()
+
+    print(f"{'blocked':>8} {'queued':>8} {'retry us/tick':>14} {'full rescan us':>15}")
+    for size, queued, per_tick, rescan in run_benchmark(args.sizes, args.ticks):
+        print(f"{size:>8} {queued:>8} {per_tick:>14.2f} {rescan:>15.1f}")
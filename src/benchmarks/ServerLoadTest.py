@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from src.benchmarks.WorkloadBenchmark import percentile
+from src.utils.Server import OperationServer, BLOCKED
+
+
+def transaction_lines(rng, tid, ops, num_variables, read_ratio):
+    lines = [f"begin(T{tid})\n"]
+    for _ in range(ops):
+        vid = rng.randint(1, num_variables)
+        if rng.random() < read_ratio:
+            lines.append(f"R(T{tid},x{vid})\n")
+        else:
+            lines.append(f"W(T{tid},x{vid},{rng.randint(0, 9999)})\n")
+    lines.append(f"end(T{tid})\n")
+    return lines
+
+
+async def run_client(client, connect, args, latencies, statuses):
+    """
+    Send args.transactions transactions, every transaction is pipelined in one write and the
+    client waits for all its requests before sending the next one
+
+    :return: None
+    """
+    rng = random.Random(client)
+    reader, writer = await connect()
+    rid = 0
+    for i in range(args.transactions):
+        tid = client * args.transactions + i + 1
+        lines = transaction_lines(rng, tid, args.ops, args.variables, args.reads)
+        sent = time.perf_counter()
+        writer.write("".join(lines).encode())
+        await writer.drain()
+        first, rid = rid + 1, rid + len(lines)
+        pending = set(range(first, rid + 1))
+        while pending:
+            response = json.loads(await reader.readline())
+            status = response.get("status")
+            if status is None or status == BLOCKED:
+                continue
+            pending.discard(response["id"])
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+    await writer.wait_closed()
+
+
+async def main(args):
+    if args.port is None and args.unix is None:
+        server = OperationServer()
+        listener = await server.start_tcp("127.0.0.1", 0)
+        host, port = listener.sockets[0].getsockname()[:2]
+    else:
+        server, listener, host, port = None, None, args.host, args.port
+
+    if args.unix:
+        def connect():
+            return asyncio.open_unix_connection(args.unix, limit=1 << 16)
+    else:
+        def connect():
+            return asyncio.open_connection(host, port, limit=1 << 16)
+
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(client, connect, args, latencies, statuses)
+                           for client in range(args.clients)))
+    seconds = time.perf_counter() - start
+    if listener is not None:
+        listener.close()
+        await server.wait_connections()
+    latencies.sort()
+
+    print(json.dumps({
+        "clients": args.clients,
+        "requests": len(latencies),
+        "seconds": round(seconds, 3),
+        "requests_per_sec": round(len(latencies) / seconds, 1),
+        "latency_ms": {name: round(percentile(latencies, p) * 1000, 3)
+                       for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))},
+        "statuses": statuses,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("ServerLoadTest")
+    parser.add_argument("-clients", type=int, default=200, help="number of concurrent connections")
+    parser.add_argument("-transactions", type=int, default=20, help="transactions per client")
+    parser.add_argument("-ops", type=int, default=4, help="reads and writes per transaction")
+    parser.add_argument("-reads", type=float, default=0.8, help="fraction of reads")
+    parser.add_argument("-variables", type=int, default=20, help="number of variables")
+    parser.add_argument("-host", type=str, default="127.0.0.1", help="host of a running server")
+    parser.add_argument("-port", type=int, help="port of a running server, an in-process server is started if "
+                                                "neither -port nor -unix is given")
+    parser.add_argument("-unix", type=str, help="Unix socket of a running server")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+import argparse
+import io
+import os
+import time
+from src.benchmarks.WorkloadGenerator import Workload
+from src.model.Topology import Topology
+from src.utils.FileRunner import run
+from src.utils.OutputSink import TextSink
+from src.utils.Parser import parse_command
+from src.utils.ShardedRunner import run_sharded
+
+
+def parse(lines):
+    return [op for op in (parse_command(line, tick) for tick, line in enumerate(lines)) if op is not None]
+
+
+def measure(runner, lines):
+    """
+    Time one run of the trace
+
+    :param runner: callable(operations, sink)
+    :param lines: lines of the trace
+    :return: (seconds, output)
+    """
+    operations = parse(lines)
+    stream = io.StringIO()
+    start = time.perf_counter()
+    runner(operations, TextSink(stream))
+    return time.perf_counter() - start, stream.getvalue()
+
+
+def count_ends(output):
+    """
+    Count the commits and aborts of an output
+
+    :return: (commits, aborts)
+    """
+    lines = output.splitlines()
+    return (sum(line.endswith(" commit") for line in lines),
+            sum(line.startswith("Transaction ") and line.endswith(" aborted") for line in lines))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("ShardBenchmark")
+    parser.add_argument("-transactions", type=int, default=20000, help="number of transactions")
+    parser.add_argument("-variables", type=int, default=400, help="number of variables")
+    parser.add_argument("-shards", type=int, default=8, help="number of shards, one range of variables each")
+    parser.add_argument("-workers", type=int, nargs="+", default=[1, 2, 4, 8], help="numbers of worker processes")
+    parser.add_argument("-spanning", type=float, nargs="+", default=[0.0, 0.1, 0.5],
+                        help="fractions of the transactions using the variables of every shard")
+    parser.add_argument("-epoch", type=int, default=64, help="ticks between two commit rounds")
+    args = parser.parse_args()
+    topology = Topology(args.variables)
+    print(f"{args.shards} shards, epoch {args.epoch}, {os.cpu_count()} CPUs")
+    print(f"{'spanning':>8} {'mode':>12} {'seconds':>9} {'speedup':>8} {'commits':>8} {'aborts':>7} {'same output':>12}")
+
+    for spanning in args.spanning:
+        workload = Workload(args.transactions, 10, concurrency=4 * args.shards, num_variables=args.variables,
+                            partitions=args.shards, spanning=spanning)
+        lines = list(workload.generate())
+        serial, expected = measure(lambda ops, sink: run(ops, sink, topology), lines)
+        commits, aborts = count_ends(expected)
+        print(f"{spanning:>8} {'serial':>12} {serial:>9.2f} {1:>8.2f} {commits:>8} {aborts:>7} {'':>12}")
+        for workers in args.workers:
+            seconds, output = measure(lambda ops, sink: run_sharded(ops, sink, topology, args.shards, workers,
+                                                                    args.epoch), lines)
+            commits, aborts = count_ends(output)
+            # the commits of spanning transactions are delayed to the end of an epoch, the output
+            # only matches the serial one without them
+            print(f"{spanning:>8} {f'{workers} workers':>12} {seconds:>9.2f} {serial / seconds:>8.2f} {commits:>8} "
+                  f"{aborts:>7} {str(output == expected):>12}")
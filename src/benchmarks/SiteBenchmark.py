@@ -0,0 +1,55 @@
+import argparse
+import time
+from src.benchmarks.WorkloadBenchmark import CountingSink, parse
+from src.benchmarks.WorkloadGenerator import Workload
+from src.model.Topology import Topology
+from src.utils.FileRunner import run
+
+
+def three_copies(vid, num_sites):
+    """
+    Even variables are replicated at three consecutive sites, odd variables are at one site
+    """
+    if vid % 2 == 0:
+        return [(vid + i) % num_sites + 1 for i in range(3)]
+    return [vid % num_sites + 1]
+
+
+# placement name -> placement of Topology, None is the default one
+PLACEMENTS = {
+    "all": None,
+    "three": three_copies,
+}
+
+
+def measure(workload, placement=None):
+    """
+    Run the trace of workload on its number of sites
+
+    :return: dict of the results
+    """
+    topology = Topology(workload.num_variables, workload.num_sites, placement)
+    operations = [op for op in parse(workload.generate()) if op is not None]
+    sink = CountingSink()
+    start = time.perf_counter()
+    run(operations, sink, topology)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "ops_per_sec": len(operations) / seconds, "commits": sink.commits}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("SiteBenchmark")
+    parser.add_argument("-transactions", type=int, default=2000, help="transactions per run")
+    parser.add_argument("-sites", type=int, nargs="+", default=[10, 100, 500], help="numbers of sites")
+    parser.add_argument("-seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    print(f"{'sites':>5} {'copies':>6} {'seconds':>8} {'ops/s':>8} {'commits':>8}")
+    for num_sites in args.sites:
+        for name, placement in PLACEMENTS.items():
+            # many sites are down at any time
+            workload = Workload(args.transactions, 10, read_ratio=0.5, fail_rate=0.05, recover_rate=0.05,
+                                num_variables=200, num_sites=num_sites, seed=args.seed)
+            result = measure(workload, placement)
+            print(f"{num_sites:>5} {name:>6} {result['seconds']:>8.2f} {result['ops_per_sec']:>8.0f} "
+                  f"{result['commits']:>8}")
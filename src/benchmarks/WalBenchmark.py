@@ -0,0 +1,46 @@
+import argparse
+import tempfile
+import time
+from src.benchmarks.WorkloadGenerator import Workload
+from src.manager.LogManager import LogConfig
+from src.utils.FileRunner import run
+from src.utils.Metrics import Metrics
+from src.utils.OutputSink import NullSink
+from src.utils.Parser import parse_command
+
+
+def measure(lines, group_size, checkpoint_interval):
+    """
+    Run the trace with the sites logging to a fresh directory
+
+    :param lines: lines of the trace
+    :param group_size: commit records per fsync, None runs without a log
+    :param checkpoint_interval: commit records between checkpoints
+    :return: (seconds, Metrics of the run)
+    """
+    operations = [parse_command(line, tick) for tick, line in enumerate(lines, 1)]
+    metrics = Metrics()
+    with tempfile.TemporaryDirectory() as directory:
+        log_config = LogConfig(directory, group_size, checkpoint_interval) if group_size else None
+        start = time.perf_counter()
+        run(operations, NullSink(), metrics=metrics, log_config=log_config)
+        return time.perf_counter() - start, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("WalBenchmark")
+    parser.add_argument("-transactions", type=int, default=2000, help="number of transactions")
+    parser.add_argument("-groups", type=int, nargs="+", default=[1, 4, 16, 64, 256], help="group commit sizes")
+    parser.add_argument("-checkpoint", type=int, default=1024, help="commit records between checkpoints")
+    parser.add_argument("-seed", type=int, default=0, help="random seed of the workload")
+    args = parser.parse_args()
+
+    workload = Workload(args.transactions, 6, read_ratio=0.3, read_only_fraction=0.0, seed=args.seed)
+    lines = list(workload.generate())
+
+    print(f"{'group':>8} {'seconds':>9} {'commits/s':>10} {'records':>8} {'fsyncs':>7}")
+    for group_size in [None] + args.groups:
+        seconds, metrics = measure(lines, group_size, args.checkpoint)
+        counters = metrics.counters
+        print(f"{group_size or 'no log':>8} {seconds:>9.3f} {counters.get('commits', 0) / seconds:>10.0f} "
+              f"{counters.get('wal.records', 0):>8} {counters.get('wal.fsyncs', 0):>7}")
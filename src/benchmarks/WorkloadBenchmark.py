@@ -0,0 +1,172 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from src.benchmarks.WorkloadGenerator import Workload
+from src.manager.TransactionManager import TransactionManager
+from src.model.Topology import Topology
+from src.utils.FileRunner import run
+from src.utils.Metrics import NULL_METRICS
+from src.utils.OutputSink import NullSink
+from src.utils.Parser import parse_command
+
+# workload name -> parameters of Workload
+WORKLOADS = {
+    "uniform-read-heavy": dict(transactions=2000, ops_per_transaction=10, read_ratio=0.9),
+    "uniform-write-heavy": dict(transactions=2000, ops_per_transaction=10, read_ratio=0.2),
+    "zipf-contention": dict(transactions=2000, ops_per_transaction=10, read_ratio=0.5, skew=1.2,
+                            concurrency=20),
+    "read-only-mix": dict(transactions=2000, ops_per_transaction=10, read_ratio=0.5, read_only_fraction=0.5),
+    "site-failures": dict(transactions=2000, ops_per_transaction=10, read_ratio=0.5, fail_rate=0.01,
+                          recover_rate=0.1),
+}
+
+
+class CountingSink(NullSink):
+    """
+    Discard every result but count the commits and aborts
+    """
+
+    def __init__(self, stream=None, buffer_size=256):
+        super().__init__(stream, buffer_size)
+        self.commits = 0
+        self.aborts = 0
+
+    def message(self, text):
+        if text.endswith(" commit"):
+            self.commits += 1
+        elif text.endswith(" aborted"):
+            self.aborts += 1
+
+
+class MeasuredTransactionManager(TransactionManager):
+    """
+    A transaction manager recording how many ticks each operation of a transaction waited
+
+    :param self.arrivals: id of a blocked operation -> tick it arrived at
+    :param self.wait_ticks: ticks waited by every operation of a transaction that finished
+    """
+
+    def __init__(self, sink=None, topology=None, metrics=NULL_METRICS):
+        super().__init__(sink, topology, metrics)
+        self.arrivals = {}
+        self.wait_ticks = []
+
+    def execute_operation(self, operations):
+        self.arrivals[id(operations)] = operations.get_time()
+        super().execute_operation(operations)
+
+    def assign_task(self, operation, is_retry=False):
+        is_succeed = super().assign_task(operation, is_retry)
+        if is_succeed and operation.get_tid() is not None:
+            self.wait_ticks.append(self.tick - self.arrivals.pop(id(operation)))
+        elif is_succeed:
+            self.arrivals.pop(id(operation))
+        return is_succeed
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of sorted values
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, -(-len(values) * p // 100) - 1))]
+
+
+def parse(lines):
+    return [parse_command(line, tick) for tick, line in enumerate(lines, 1)]
+
+
+def measure(workload, memory=True):
+    """
+    Run the trace of workload through FileRunner.run
+
+    :param workload: Workload
+    :param memory: also measure the peak memory with tracemalloc, in a second run
+    :return: dict of results
+    """
+    lines = list(workload.generate())
+    topology = Topology(workload.num_variables, workload.num_sites)
+    operations = [op for op in parse(lines) if op is not None]
+
+    sink = CountingSink()
+    start = time.perf_counter()
+    tm = run(operations, sink, topology, MeasuredTransactionManager)
+    seconds = time.perf_counter() - start
+
+    wait_ticks = sorted(tm.wait_ticks)
+    results = {
+        "operations": len(operations),
+        "seconds": round(seconds, 4),
+        "ops_per_sec": round(len(operations) / seconds, 1),
+        "commits": sink.commits,
+        "aborts": sink.aborts,
+        "commit_rate": round(sink.commits / workload.transactions, 4),
+        "abort_rate": round(sink.aborts / workload.transactions, 4),
+        "wait_ticks": {
+            "p50": percentile(wait_ticks, 50),
+            "p99": percentile(wait_ticks, 99),
+            "max": wait_ticks[-1] if wait_ticks else 0,
+        },
+    }
+    if memory:
+        operations = [op for op in parse(lines) if op is not None]
+        tracemalloc.start()
+        try:
+            run(operations, CountingSink(), topology)
+            results["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def run_suite(names, scale=1.0, memory=True, seed=0):
+    """
+    Measure the named workloads of WORKLOADS
+
+    :param names: workload names
+    :param scale: factor applied to the number of transactions
+    :param memory: measure the peak memory
+    :param seed: random seed of the traces
+    :return: dict, JSON serializable
+    """
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "workloads": [],
+    }
+    for name in names:
+        params = dict(WORKLOADS[name], seed=seed)
+        params["transactions"] = max(1, int(params["transactions"] * scale))
+        workload = Workload(**params)
+        report["workloads"].append({"name": name, "params": workload.get_params(),
+                                    "results": measure(workload, memory)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("WorkloadBenchmark")
+    parser.add_argument("-workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS),
+                        help="workloads to run")
+    parser.add_argument("-scale", type=float, default=1.0, help="factor applied to the number of transactions")
+    parser.add_argument("-seed", type=int, default=0, help="random seed")
+    parser.add_argument("-nomemory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("-output", help="JSON file the results are written to, stdout by default")
+    args = parser.parse_args()
+
+    report = run_suite(args.workloads, args.scale, not args.nomemory, args.seed)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        for workload in report["workloads"]:
+            results = workload["results"]
+            print(f"{workload['name']:>20} {results['ops_per_sec']:>10.0f} ops/s "
+                  f"commit {results['commit_rate']:.2f} abort {results['abort_rate']:.2f} "
+                  f"wait p99 {results['wait_ticks']['p99']}")
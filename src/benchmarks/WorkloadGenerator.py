@@ -0,0 +1,134 @@
+import argparse
+import itertools
+import random
+import sys
+from src.CustomizedConf import num_distinct_variables, num_sites
+
+
+class Workload:
+    """
+    A synthetic trace in the input language of the simulator.
+
+    Transactions are started until concurrency of them are running, every tick one running
+    transaction picked at random issues its next operation, or its end once it has issued
+    ops_per_transaction of them. After each tick an up site fails with probability fail_rate and
+    every down site recovers with probability recover_rate, the sites still down are recovered
+    before the trace ends.
+
+    :param self.transactions: number of transactions
+    :param self.ops_per_transaction: number of reads and writes of each transaction
+    :param self.read_ratio: probability an operation of a read-write transaction is a read
+    :param self.read_only_fraction: probability a transaction is read-only
+    :param self.skew: Zipf exponent of the variable picked by an operation, 0 is uniform
+    :param self.fail_rate: probability a site fails after a tick
+    :param self.recover_rate: probability a down site recovers after a tick
+    :param self.concurrency: number of transactions running at the same time
+    :param self.partitions: number of contiguous ranges of variables, each transaction only uses one
+    :param self.spanning: probability a transaction picks the range of every operation at random instead
+    """
+
+    def __init__(self, transactions=100, ops_per_transaction=10, read_ratio=0.5, read_only_fraction=0.1,
+                 skew=0.0, fail_rate=0.0, recover_rate=0.2, concurrency=10,
+                 num_variables=num_distinct_variables, num_sites=num_sites, seed=0, partitions=1,
+                 spanning=0.0):
+        self.transactions = transactions
+        self.ops_per_transaction = ops_per_transaction
+        self.read_ratio = read_ratio
+        self.read_only_fraction = read_only_fraction
+        self.skew = skew
+        self.fail_rate = fail_rate
+        self.recover_rate = recover_rate
+        self.concurrency = concurrency
+        self.num_variables = num_variables
+        self.num_sites = num_sites
+        self.seed = seed
+        self.partitions = partitions
+        self.spanning = spanning
+
+    def get_params(self):
+        return dict(vars(self))
+
+    def generate(self):
+        """
+        Generate the lines of the trace
+
+        :return: generator of lines
+        """
+        rng = random.Random(self.seed)
+        size = self.num_variables // self.partitions
+        weights = [1 / rank ** self.skew for rank in range(1, size + 1)]
+        cum_weights = list(itertools.accumulate(weights))
+        # tid -> [operations left, read-only, first variable of its partition, spans every partition]
+        running = {}
+        down = []
+        next_tid = 1
+
+        while next_tid <= self.transactions or running:
+            while len(running) < self.concurrency and next_tid <= self.transactions:
+                read_only = rng.random() < self.read_only_fraction
+                first = rng.randrange(self.partitions) * size if self.partitions > 1 else 0
+                spanning = self.spanning > 0 and rng.random() < self.spanning
+                running[next_tid] = [self.ops_per_transaction, read_only, first, spanning]
+                yield f"beginRO(T{next_tid})\n" if read_only else f"begin(T{next_tid})\n"
+                next_tid += 1
+
+            tid = rng.choice(list(running))
+            state = running[tid]
+            if state[0] == 0:
+                del running[tid]
+                yield f"end(T{tid})\n"
+            else:
+                state[0] -= 1
+                if state[3]:
+                    state[2] = rng.randrange(self.partitions) * size
+                vid = state[2] + rng.choices(range(1, size + 1), cum_weights=cum_weights)[0]
+                if state[1] or rng.random() < self.read_ratio:
+                    yield f"R(T{tid},x{vid})\n"
+                else:
+                    yield f"W(T{tid},x{vid},{rng.randint(0, 9999)})\n"
+
+            if rng.random() < self.fail_rate and len(down) < self.num_sites:
+                sid = rng.choice([sid for sid in range(1, self.num_sites + 1) if sid not in down])
+                down.append(sid)
+                yield f"fail({sid})\n"
+            for sid in [sid for sid in down if rng.random() < self.recover_rate]:
+                down.remove(sid)
+                yield f"recover({sid})\n"
+
+        for sid in down:
+            yield f"recover({sid})\n"
+
+
+def add_arguments(parser):
+    """
+    Add one option per parameter of Workload to parser
+    """
+    parser.add_argument("-transactions", type=int, default=100, help="number of transactions")
+    parser.add_argument("-ops", type=int, default=10, help="number of reads and writes per transaction")
+    parser.add_argument("-reads", type=float, default=0.5, help="fraction of reads in read-write transactions")
+    parser.add_argument("-readonly", type=float, default=0.1, help="fraction of read-only transactions")
+    parser.add_argument("-skew", type=float, default=0.0, help="Zipf exponent of the keys, 0 is uniform")
+    parser.add_argument("-failrate", type=float, default=0.0, help="probability a site fails after a tick")
+    parser.add_argument("-recoverrate", type=float, default=0.2,
+                        help="probability a down site recovers after a tick")
+    parser.add_argument("-concurrency", type=int, default=10, help="number of concurrent transactions")
+    parser.add_argument("-variables", type=int, default=num_distinct_variables, help="number of variables")
+    parser.add_argument("-sites", type=int, default=num_sites, help="number of sites")
+    parser.add_argument("-seed", type=int, default=0, help="random seed")
+    parser.add_argument("-partitions", type=int, default=1,
+                        help="number of ranges of variables, each transaction only uses one")
+    parser.add_argument("-spanning", type=float, default=0.0,
+                        help="fraction of the transactions using every range of variables")
+
+
+def from_arguments(args):
+    return Workload(args.transactions, args.ops, args.reads, args.readonly, args.skew, args.failrate,
+                    args.recoverrate, args.concurrency, args.variables, args.sites, args.seed,
+                    args.partitions, args.spanning)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("WorkloadGenerator")
+    add_arguments(parser)
+    args = parser.parse_args()
+    sys.stdout.writelines(from_arguments(args).generate())
@@ -3,15 +3,128 @@ import sys
 import os
 from utils.FileLoader import FileLoader
 from utils.FileRunner import *
+from src.utils.Parser import ParseError
+from src.utils.OutputSink import SINKS, create_sink
+from src.model.Topology import Topology, TopologyError
+from src.utils.Metrics import Metrics, NULL_METRICS
+from src.utils.BatchRunner import run_batch
+from src.utils.ShardedRunner import run_sharded_by_file
+from src.utils.Server import serve
+from src.utils.TraceRecorder import record_by_file, replay, TraceDivergence, TraceError
+from src.manager.LogManager import LogConfig
+from src.manager.DeadlockPolicy import POLICIES, create_policy
+from src.manager.OptimisticTransactionManager import OptimisticTransactionManager
+from src.manager.TransactionManager import TransactionManager
+from src.CustomizedConf import num_distinct_variables, num_sites
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser("RepCRec")
-    parser.add_argument("mode", type=str)
-    parser.add_argument("-input", type=str, help="input source")
-    parser.add_argument("-output", type=str, help="output source")
+    parser.add_argument("mode", type=str, choices=["r", "b", "s", "p"],
+                        help="r runs one trace, b runs a batch of traces, s serves clients over a socket, "
+                             "p replays a recorded binary trace")
+    parser.add_argument("-input", type=str, help="input source, a directory or glob pattern in mode b, "
+                                                 "the binary trace in mode p")
+    parser.add_argument("-output", type=str, help="output source, the output directory in mode b")
+    parser.add_argument("-workers", type=int, help="number of worker processes in mode b or with -shards, one per CPU by default")
+    parser.add_argument("-host", type=str, default="127.0.0.1", help="host to listen on in mode s")
+    parser.add_argument("-port", type=int, default=7878, help="TCP port to listen on in mode s")
+    parser.add_argument("-unix", type=str, help="Unix socket path to listen on in mode s instead of TCP")
+    parser.add_argument("-shards", type=int, default=0, help="split the variables into shards run in parallel in mode r")
+    parser.add_argument("-epoch", type=int, default=64,
+                        help="ticks the shards run between two commit rounds of the transactions spanning them")
+    parser.add_argument("-format", type=str, default="table", choices=list(SINKS), help="output format")
+    parser.add_argument("-variables", type=int, default=num_distinct_variables, help="number of variables")
+    parser.add_argument("-sites", type=int, default=num_sites, help="number of sites")
+    parser.add_argument("-topology", type=str, help="JSON topology file, overrides -variables and -sites")
+    parser.add_argument("-stats", action="store_true", help="collect metrics, output them on stats() and at the end")
+    parser.add_argument("-wal", type=str, help="directory of the write-ahead logs of the sites in mode r")
+    parser.add_argument("-groupcommit", type=int, default=1,
+                        help="commit records fsync'd together with -wal, above 1 a reported commit can be lost in a crash")
+    parser.add_argument("-checkpoint", type=int, default=1024, help="commit records between checkpoints with -wal")
+    parser.add_argument("-engine", type=str, default="2pl", choices=["2pl", "occ"],
+                        help="concurrency control in mode r: strict two phase locking or optimistic")
+    parser.add_argument("-deadlock", type=str, default="detect", choices=list(POLICIES),
+                        help="deadlock policy in mode r: detect cycles, wound-wait or wait-die")
+    parser.add_argument("-interval", type=int, default=1,
+                        help="ticks between two deadlock checks with -deadlock detect, 1 checks every read and write")
+    parser.add_argument("-record", type=str, help="record the operations and decisions to a binary trace in mode r")
     args = parser.parse_args()
 
+    if args.topology:
+        topology = Topology.from_file(args.topology)
+    else:
+        topology = Topology(args.variables, args.sites)
+
     mode, input_src, output_src = args.mode, args.input, args.output
+    if args.wal and args.mode != "r":
+        parser.error("-wal is only supported in mode r")
+    if args.record and args.mode != "r":
+        parser.error("-record is only supported in mode r")
+    if (args.deadlock != "detect" or args.interval != 1) and args.mode != "r":
+        parser.error("-deadlock and -interval are only supported in mode r")
+    if args.interval < 1:
+        parser.error("-interval must be at least 1")
+    if args.engine != "2pl" and args.mode != "r":
+        parser.error("-engine is only supported in mode r")
 
     if args.mode == "r":
-        run_by_file(input_src, output_src)
+        if args.shards and args.stats:
+            parser.error("-stats is not supported with -shards")
+        if args.shards and args.wal:
+            parser.error("-wal is not supported with -shards")
+        if args.shards and args.record:
+            parser.error("-record is not supported with -shards")
+        if args.epoch < 1:
+            parser.error("-epoch must be at least 1")
+        if args.shards and (args.deadlock != "detect" or args.interval != 1):
+            parser.error("-deadlock and -interval are not supported with -shards")
+        if args.engine == "occ" and (args.shards or args.record):
+            parser.error("-engine occ is not supported with -shards or -record")
+        if args.engine == "occ" and (args.deadlock != "detect" or args.interval != 1):
+            parser.error("-deadlock and -interval only apply to -engine 2pl")
+        deadlock_policy = create_policy(args.deadlock, args.interval)
+        manager_class = OptimisticTransactionManager if args.engine == "occ" else TransactionManager
+        try:
+            if args.shards:
+                run_sharded_by_file(input_src, output_src, args.format, topology, args.shards, args.workers,
+                                    args.epoch)
+            elif args.record:
+                log_config = LogConfig(args.wal, args.groupcommit, args.checkpoint) if args.wal else None
+                record_by_file(input_src, args.record, output_src, args.format, topology,
+                               Metrics() if args.stats else NULL_METRICS, log_config, deadlock_policy)
+            else:
+                log_config = LogConfig(args.wal, args.groupcommit, args.checkpoint) if args.wal else None
+                run_by_file(input_src, output_src, args.format, topology, Metrics() if args.stats else NULL_METRICS,
+                            log_config, deadlock_policy, manager_class)
+        except ParseError as e:
+            parser.exit(1, f"{input_src or 'stdin'}: {e}\n")
+        except TraceError as e:
+            parser.exit(1, f"{args.record}: {e}\n")
+        except TopologyError as e:
+            parser.exit(1, f"{input_src or 'stdin'}: {e}\n")
+    elif args.mode == "b":
+        if input_src is None or output_src is None:
+            parser.error("mode b needs -input and -output")
+        results = run_batch(input_src, output_src, args.format, topology, args.workers, args.stats)
+        failed = [result for result in results if result["status"] != "ok"]
+        for result in failed:
+            print(f"{result['input']}: {result['error']}", file=sys.stderr)
+        print(f"{len(results) - len(failed)} of {len(results)} traces run, outputs in {output_src}")
+        if failed:
+            sys.exit(1)
+    elif args.mode == "s":
+        serve(args.host, args.port, args.unix, topology)
+    elif args.mode == "p":
+        if input_src is None:
+            parser.error("mode p needs -input")
+        try:
+            if output_src is None:
+                num_operations, num_decisions = replay(input_src)
+            else:
+                with open(output_src, "w") as f:
+                    num_operations, num_decisions = replay(input_src, create_sink(args.format, f))
+        except TraceError as e:
+            parser.exit(1, f"{e}\n")
+        except TraceDivergence as e:
+            parser.exit(1, f"{input_src}: diverged at {e}\n")
+        print(f"{num_operations} operations replayed, all {num_decisions} decisions match")
@@ -1,27 +1,261 @@
 from src.CustomizedConf import *
 from src.model.DataCopy import DataCopy
+from src.utils.Metrics import NULL_METRICS
 
 
 class DataManager:
     """
         A class to manage data
+
+        Only the copies the site holds are stored. A copy is materialised as a DataCopy the first
+        time it is written or its availability is set, until then it holds its initial value and
+        its availability follows the last failure or recovery of the site.
+
+        :param self.data: vid -> materialised DataCopy
+        :param self.replicated_available: availability of the replicated copies not materialised
+        :param self.nonreplicated_available: availability of the non-replicated copies not materialised
+        :param self.metrics: Metrics counting materialised copies, commits and reclaimed versions
+        :param self.log: LogManager the commits are logged to, None keeps the data only in memory
+        :param self.checkpoint: CheckpointFile of the copies not materialised yet, None if there is none
+        :param self.fold_checkpoint: the versions of the checkpoint are of a previous run
+        :param self.previous_lsn: sequence number of the last log record of the previous runs
+        :param self.checkpoint_availability: the availability saved in the checkpoint is still valid
+
+        With a log the copies are rebuilt from the checkpoint and the log when the site recovers. A
+        log left by a previous run is replayed when the site starts, its versions are folded into
+        the initial version since the clock starts again from 0. The copies of the checkpoint are
+        only read from it when they are first accessed.
     """
-    def __init__(self, site_id):
+    def __init__(self, site_id, topology, metrics=NULL_METRICS, log=None):
         self.site_id = site_id
-        self.uncommitted_log = {}
-        self.data = self.init_data(site_id)
+        self.metrics = metrics
+        self.topology = topology
+        self.log = log
+        self.data = {}
+        self.replicated_available = True
+        self.nonreplicated_available = True
+        self.versions_reclaimed = 0
+        self.checkpoint = None
+        self.fold_checkpoint = False
+        self.checkpoint_availability = False
+        self.previous_lsn = 0
+        if log is not None:
+            self.previous_lsn = float("inf")
+            self.rebuild()
+            self.previous_lsn = log.lsn
+            self.checkpoint_availability = True
+
+    def materialize(self, vid):
+        """
+        Get the DataCopy of vid, creating it on first access
+
+        :param vid: variable id
+        :return: DataCopy
+        """
+        copy = self.data.get(vid)
+        if copy is None:
+            if not self.holds(vid):
+                raise KeyError(f"x{vid} is not stored at site {self.site_id}")
+            copy = DataCopy(self.topology.get_data_type(vid), self.topology.initial_value(vid))
+            copy.set_read_available(self.is_available(vid))
+            versions = self.get_checkpoint_versions(vid)
+            if versions is not None:
+                copy.commit_times, copy.commit_values = versions
+                copy.set_value(copy.get_latest_commit())
+            self.data[vid] = copy
+            self.metrics.incr("data.copies_materialized")
+        return copy
+
+    def get_checkpoint_versions(self, vid):
+        """
+        Get the versions of vid saved in the checkpoint, folded into the initial version if they
+        are of a previous run
+
+        :param vid: variable id
+        :return: (commit times, values) or None if vid is not in the checkpoint
+        """
+        if self.checkpoint is None:
+            return None
+        versions = self.checkpoint.get_versions(vid)
+        if versions is None or not self.fold_checkpoint:
+            return versions
+        return [-1], versions[1][-1:]
+
+    def holds(self, vid):
+        return self.site_id in self.topology.get_sites(vid)
 
     def set_variable(self, vid, val):
-        self.data[vid].set_value(val)
+        self.materialize(vid).set_value(val)
 
     def set_available(self, vid, availability):
-        self.data[vid].set_read_available(availability)
+        self.materialize(vid).set_read_available(availability)
 
     def is_available(self, vid):
-        return self.data[vid].is_read_available()
+        if vid in self.data:
+            return self.data[vid].is_read_available()
+        if self.checkpoint_availability and self.checkpoint is not None:
+            available = self.checkpoint.is_available(vid)
+            if available is not None:
+                return available
+        if self.topology.is_replicated(vid):
+            return self.replicated_available
+        return self.nonreplicated_available
+
+    def get_value(self, vid):
+        """
+        Get the current value of vid without materialising it, None if the site does not hold vid
+
+        :param vid: variable id
+        :return: value
+        """
+        if vid in self.data:
+            return self.data[vid].get_value()
+        if self.holds(vid):
+            if self.checkpoint is not None:
+                value = self.checkpoint.get_value(vid)
+                if value is not None:
+                    return value
+            return self.topology.initial_value(vid)
+        return None
 
     def read(self, vid):
-        return self.data[vid].get_latest_commit()
+        if vid in self.data:
+            return self.data[vid].get_latest_commit()
+        return self.get_value(vid)
+
+    def read_at(self, vid, time_stamp):
+        """
+        Read the last version of vid committed at or before time_stamp
+
+        :param vid: variable id
+        :param time_stamp: time stamp
+        :return: (commit time, value) or None
+        """
+        if vid in self.data or self.checkpoint is not None and vid in self.checkpoint:
+            return self.materialize(vid).get_version_at(time_stamp)
+        if self.holds(vid) and time_stamp >= -1:
+            return -1, self.topology.initial_value(vid)
+        return None
+
+    def commit(self, vid, val, commit_time):
+        """
+        Commit a new value of vid as a new version
+
+        :param vid: variable id
+        :param val: committed value
+        :param commit_time: time of the commit
+        :return: None
+        """
+        copy = self.materialize(vid)
+        copy.set_value(val)
+        copy.add_commit_history(commit_time, val)
+        self.metrics.incr("data.versions_committed")
+
+    def commit_writes(self, writes, commit_time):
+        """
+        Commit the writes of a transaction at this site, they are logged before they are applied
+
+        :param writes: vid -> value written
+        :param commit_time: time of the commit
+        :return: writes
+        """
+        if self.log is not None:
+            self.log.append(commit_time, writes)
+        for vid, val in writes.items():
+            self.commit(vid, val, commit_time)
+            self.set_available(vid, True)
+        if self.log is not None and self.log.needs_checkpoint():
+            self.save_checkpoint()
+        return writes
+
+    def save_checkpoint(self):
+        """
+        Checkpoint every copy that differs from its initial state, the new checkpoint replaces
+        the one the copies not materialised are read from
+
+        :return: None
+        """
+        checkpoint = self.log.checkpoint(self.iter_versions())
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        self.checkpoint = checkpoint
+        self.fold_checkpoint = False
+        self.checkpoint_availability = True
+
+    def iter_versions(self):
+        """
+        Iterate over the materialised copies and the copies of the checkpoint, sorted by vid
+
+        :return: generator of (vid, read availability, commit times, values)
+        """
+        vids = set(self.data)
+        if self.checkpoint is not None:
+            vids.update(self.checkpoint.vids())
+        for vid in sorted(vids):
+            copy = self.data.get(vid)
+            if copy is not None:
+                yield vid, copy.is_read_available(), copy.commit_times, copy.commit_values
+            else:
+                times, values = self.get_checkpoint_versions(vid)
+                yield vid, self.is_available(vid), times, values
+
+    def rebuild(self):
+        """
+        Rebuild the committed versions from the checkpoint and the log
+
+        :return: None
+        """
+        self.data = {}
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        self.checkpoint, commits = self.log.replay()
+        self.fold_checkpoint = self.checkpoint is not None and self.checkpoint.lsn <= self.previous_lsn
+        self.checkpoint_availability = False
+        for lsn, commit_time, writes in commits:
+            for vid, val in writes.items():
+                copy = self.materialize(vid)
+                copy.set_value(val)
+                copy.set_read_available(True)
+                if lsn <= self.previous_lsn:
+                    copy.commit_times = [-1]
+                    copy.commit_values = [val]
+                else:
+                    copy.add_commit_history(commit_time, val)
+        self.metrics.incr("wal.rebuilds")
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+            self.checkpoint = None
+
+    def collect_garbage(self, watermark, vids=None):
+        """
+        Drop the versions older than watermark, one version at or before watermark is kept
+
+        :param watermark: begin time of the oldest active read-only transaction
+        :param vids: variables to collect, all materialised variables if None
+        :return: number of versions dropped
+        """
+        if vids is None:
+            vids = self.data.keys()
+        reclaimed = sum(self.data[vid].prune(watermark) for vid in vids if vid in self.data)
+        self.versions_reclaimed += reclaimed
+        self.metrics.incr("data.versions_reclaimed", reclaimed)
+        return reclaimed
+
+    def get_gc_stats(self):
+        """
+        Get the version garbage collection statistics of the site
+
+        :return: dict
+        """
+        return {
+            "versions_reclaimed": self.versions_reclaimed,
+            "versions_live": sum(copy.count_versions() for copy in self.data.values())
+                             + len(self.topology.get_variables(self.site_id)) - len(self.data),
+        }
 
     def recover(self):
         """
@@ -29,6 +263,10 @@ class DataManager:
 
         :return: None
         """
+        self.replicated_available = False
+        self.nonreplicated_available = True
+        if self.log is not None:
+            self.rebuild()
         for key, value in self.data.items():
             if value.get_data_type() == DataType.NONREPLICATED:
                 value.set_read_available(True)
@@ -37,40 +275,17 @@ class DataManager:
 
     def fail(self):
         """
-        set variables readability to False and clear all uncommitted log after a site failed
+        set variables readability to False after a site failed
 
         :return: None
         """
-        self.uncommitted_log = {}
+        self.replicated_available = False
+        self.nonreplicated_available = False
+        self.checkpoint_availability = False
+        if self.log is not None:
+            # the copies are still shown by dump() while the site is down, they are replaced by
+            # the ones rebuilt from the log when it recovers
+            self.log.flush()
         for key, value in self.data.items():
             value.set_read_available(False)
 
-    def revert_trans_changes(self, tid):
-        """
-        Revert changes if transaction is going to be aborted
-
-        :param transaction id
-        :return: None
-        """
-        self.uncommitted_log.pop(tid, None)
-
-    def get_variable(self, vid):
-        """
-        Read the value of given variable
-
-        :param vid: variable id
-        :return: data copy object
-        """
-        return self.data[vid]
-
-    def init_data(self, site_id):
-        data = {}
-        for i in range(1, num_distinct_variables + 1):
-            if i % 2 == 0:
-                data[i] = DataCopy(DataType.REPLICATED, num_sites * i)
-            if i % 2 == 1:
-                if i % num_sites + 1 == site_id:
-                    data[i] = DataCopy(DataType.NONREPLICATED, num_sites * i)
-                else:
-                    data[i] = DataCopy(DataType.NONREPLICATED, None)
-        return data
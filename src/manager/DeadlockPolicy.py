@@ -0,0 +1,124 @@
+from src.CustomizedConf import AbortType, OperationType
+
+
+class DeadlockPolicy:
+    """
+    How the transaction manager deals with deadlocks. on_block is told about every operation
+    blocked by the locks of other transactions, after_operation runs once the operation of the
+    tick and its retries are done, it may abort transactions.
+
+    :param self.uses_graph: the policy needs the wait-for graph of the blocked operations
+    """
+    name = None
+    uses_graph = False
+
+    def on_block(self, tm, tid, holders):
+        pass
+
+    def after_operation(self, tm, operation):
+        pass
+
+    def get_settings(self):
+        return {"policy": self.name}
+
+
+class Detection(DeadlockPolicy):
+    """
+    Look for cycles in the wait-for graph and abort the youngest transaction of each. With an
+    interval of 1 the graph is checked after every read and write, otherwise after the first
+    operation at least interval ticks after the last check.
+
+    :param self.last_check: tick of the last check
+    """
+    name = "detect"
+    uses_graph = True
+
+    def __init__(self, interval=1):
+        if interval < 1:
+            raise ValueError("the detection interval must be at least 1")
+        self.interval = interval
+        self.last_check = 0
+
+    def after_operation(self, tm, operation):
+        if self.interval == 1:
+            # even an ignored read or write
+            if operation.get_type() not in (OperationType.READ, OperationType.WRITE):
+                return
+        elif tm.tick - self.last_check < self.interval:
+            return
+        self.last_check = tm.tick
+        start = tm.metrics.start()
+        tm.resolve_deadlock()
+        tm.metrics.stop("time.deadlock_us", start)
+
+    def get_settings(self):
+        return {"policy": self.name, "interval": self.interval}
+
+
+class Prevention(DeadlockPolicy):
+    """
+    Compare the begin time stamps of a blocked transaction and of the transactions it waits for,
+    a wait is only allowed in one direction of age so no cycle can form
+
+    :param self.pending: (tid, holders) of the operations blocked during the tick
+    """
+
+    def __init__(self):
+        self.pending = []
+
+    def on_block(self, tm, tid, holders):
+        self.pending.append((tid, holders))
+
+    def after_operation(self, tm, operation):
+        pending, self.pending = self.pending, []
+        for tid, holders in pending:
+            trans = tm.transactions.get(tid)
+            if trans is not None:
+                self.resolve(tm, trans, holders)
+
+    def resolve(self, tm, trans, holders):
+        raise NotImplementedError
+
+
+class WoundWait(Prevention):
+    """
+    An older transaction wounds, i.e. aborts, the younger transactions it waits for, a younger
+    one waits for older ones
+    """
+    name = "wound-wait"
+
+    def resolve(self, tm, trans, holders):
+        for holder in sorted(holders):
+            other = tm.transactions.get(holder)
+            if other is not None and other.time_stamp > trans.time_stamp:
+                tm.abort(holder, AbortType.WOUNDED)
+
+
+class WaitDie(Prevention):
+    """
+    An older transaction waits for younger ones, a younger one dies, i.e. aborts itself, instead
+    of waiting for an older one
+    """
+    name = "wait-die"
+
+    def resolve(self, tm, trans, holders):
+        for holder in holders:
+            other = tm.transactions.get(holder)
+            if other is not None and other.time_stamp < trans.time_stamp:
+                tm.abort(trans.tid, AbortType.DIED)
+                return
+
+
+# name -> policy class
+POLICIES = {policy.name: policy for policy in (Detection, WoundWait, WaitDie)}
+
+
+def create_policy(name, interval=1):
+    """
+    Create a deadlock policy by name, interval is only used by detection
+
+    :return: DeadlockPolicy
+    """
+    if name == Detection.name:
+        return Detection(interval)
+    return POLICIES[name]()
@@ -1,13 +1,274 @@
 from src.CustomizedConf import LockType
+from src.utils.Metrics import NULL_METRICS
+
+# key of the lock on the whole site in the lock table, variable ids start from 1
+SITE_LOCK = 0
+
+# mode -> modes other transactions may hold at the same time
+COMPATIBLE = {
+    LockType.INTENTION_READ: {LockType.INTENTION_READ, LockType.INTENTION_WRITE, LockType.READ},
+    LockType.INTENTION_WRITE: {LockType.INTENTION_READ, LockType.INTENTION_WRITE},
+    LockType.READ: {LockType.INTENTION_READ, LockType.READ},
+    LockType.WRITE: set(),
+}
+
+# mode -> modes it includes, a transaction holding the mode does not need to request them
+COVERS = {
+    LockType.INTENTION_READ: {LockType.INTENTION_READ},
+    LockType.INTENTION_WRITE: {LockType.INTENTION_READ, LockType.INTENTION_WRITE},
+    LockType.READ: {LockType.INTENTION_READ, LockType.READ},
+    LockType.WRITE: {LockType.INTENTION_READ, LockType.INTENTION_WRITE, LockType.READ, LockType.WRITE},
+}
+
+# mode of a variable lock -> intention mode taken on the site before it
+INTENTION = {LockType.READ: LockType.INTENTION_READ, LockType.WRITE: LockType.INTENTION_WRITE}
+
+
+def combine(held, requested):
+    """
+    Weakest mode including both modes, read and intention write combine into write
+    """
+    if held is None or requested in COVERS[held]:
+        return held if held is not None else requested
+    if held in COVERS[requested]:
+        return requested
+    return LockType.WRITE
+
+
+class LockEntry:
+    """
+    The holders and the waiting requests of one lock
+
+    :param self.holders: tid -> mode held
+    :param self.counts: mode -> number of holders of the mode
+    :param self.queue: [tid, mode] of the refused requests in arrival order
+    """
+    __slots__ = ("holders", "counts", "queue")
+
+    def __init__(self):
+        self.holders = {}
+        self.counts = dict.fromkeys(COMPATIBLE, 0)
+        self.queue = []
+
+    def conflicts(self, tid, mode):
+        """
+        Check another transaction holds a mode incompatible with mode
+        """
+        held = self.holders.get(tid)
+        compatible = COMPATIBLE[mode]
+        for other_mode, count in self.counts.items():
+            if count and other_mode not in compatible and not (other_mode == held and count == 1):
+                return True
+        return False
+
+    def queued_ahead(self, tid, mode):
+        """
+        Check a request queued before the one of tid, or before the tail if tid is not queued,
+        is incompatible with mode
+        """
+        compatible = COMPATIBLE[mode]
+        for other, other_mode in self.queue:
+            if other == tid:
+                return False
+            if other_mode not in compatible:
+                return True
+        return False
+
+    def get_blockers(self, tid, mode):
+        blockers = {other for other, other_mode in self.holders.items()
+                    if other != tid and other_mode not in COMPATIBLE[mode]}
+        for other, other_mode in self.queue:
+            if other == tid:
+                break
+            if other_mode not in COMPATIBLE[mode]:
+                blockers.add(other)
+        return blockers
+
+    def dequeue(self, tid):
+        for i, (other, other_mode) in enumerate(self.queue):
+            if other == tid:
+                del self.queue[i]
+                return True
+        return False
 
 
 class LockManager:
     """
     A class to manager lock
+
+    Every variable has a lock with a FIFO queue of the refused requests. A request is granted
+    when no other transaction holds an incompatible mode and, if the locks are fair, no
+    incompatible request was queued before it, so a waiting writer is not overtaken by later
+    readers. A read lock is upgraded to a write lock through the same queue.
+
+    The site itself is a lock too: a transaction takes an intention mode on it before a variable
+    lock, and a group of at least escalation_threshold variables is locked at once with a read or
+    write lock on the whole site instead.
+
+    :param self.lock_table: vid -> LockEntry, SITE_LOCK -> LockEntry of the whole site
+    :param self.trans_locks: tid -> set of (vid, lock type) pairs held by the transaction
+    :param self.trans_requests: tid -> set of vids where the transaction has a queued request
+    :param self.site_waiters: vids of the requests refused because of the lock on the site
+    :param self.write_waiters: vid -> tids refused a write lock on vid, only kept when the locks are not fair
+    :param self.trans_write_waits: tid -> vids where the transaction waits for a write lock
+    :param self.fair: refused requests are queued and later requests wait behind them
+    :param self.metrics: Metrics counting the granted and conflicting lock requests
     """
 
-    def __init__(self):
+    def __init__(self, metrics=NULL_METRICS, fair=True, escalation_threshold=64):
+        self.metrics = metrics
+        self.fair = fair
+        self.escalation_threshold = escalation_threshold
         self.lock_table = {}
+        self.trans_locks = {}
+        self.trans_requests = {}
+        self.site_waiters = set()
+        self.write_waiters = {}
+        self.trans_write_waits = {}
+        self.release_listeners = []
+
+    def add_release_listener(self, listener):
+        """
+        Register a callback invoked as listener(vid, lock_type) whenever a lock is released
+
+        :param listener: callable
+        :return: None
+        """
+        self.release_listeners.append(listener)
+
+    def notify_release(self, vid, lock_type):
+        for listener in self.release_listeners:
+            listener(vid, lock_type)
+
+    def index_lock(self, tid, vid, lock_type):
+        self.trans_locks.setdefault(tid, set()).add((vid, lock_type))
+
+    def unindex_lock(self, tid, vid, lock_type):
+        locks = self.trans_locks.get(tid)
+        if locks is not None:
+            locks.discard((vid, lock_type))
+            if not locks:
+                del self.trans_locks[tid]
+
+    def get_entry(self, vid):
+        entry = self.lock_table.get(vid)
+        if entry is None:
+            entry = self.lock_table[vid] = LockEntry()
+        return entry
+
+    def add_write_waiter(self, tid, vid):
+        self.write_waiters.setdefault(vid, set()).add(tid)
+        self.trans_write_waits.setdefault(tid, set()).add(vid)
+
+    def remove_write_waiter(self, tid, vid):
+        waiters = self.write_waiters.get(vid)
+        if waiters is not None and tid in waiters:
+            waiters.discard(tid)
+            if not waiters:
+                del self.write_waiters[vid]
+            vids = self.trans_write_waits[tid]
+            vids.discard(vid)
+            if not vids:
+                del self.trans_write_waits[tid]
+
+    def get_other_write_waiters(self, tid, vid):
+        return self.write_waiters.get(vid, set()) - {tid}
+
+    def is_grantable(self, entry, tid, vid, mode):
+        if entry.conflicts(tid, mode):
+            return False
+        if self.fair:
+            return not entry.queued_ahead(tid, mode)
+        # without a queue an upgrade still waits for the writers refused before it
+        return not (mode == LockType.WRITE and entry.holders.get(tid) == LockType.READ
+                    and self.get_other_write_waiters(tid, vid))
+
+    def grant(self, entry, tid, vid, mode):
+        held = entry.holders.get(tid)
+        if held is not None:
+            entry.counts[held] -= 1
+            self.unindex_lock(tid, vid, held)
+        entry.holders[tid] = mode
+        entry.counts[mode] += 1
+        self.index_lock(tid, vid, mode)
+        if entry.queue and entry.dequeue(tid):
+            self.unindex_request(tid, vid)
+        if self.write_waiters:
+            self.remove_write_waiter(tid, vid)
+
+    def enqueue(self, entry, tid, vid, mode):
+        for request in entry.queue:
+            if request[0] == tid:
+                request[1] = mode
+                return
+        entry.queue.append([tid, mode])
+        self.trans_requests.setdefault(tid, set()).add(vid)
+        self.metrics.incr("lock.queued")
+
+    def unindex_request(self, tid, vid):
+        vids = self.trans_requests.get(tid)
+        if vids is not None:
+            vids.discard(vid)
+            if not vids:
+                del self.trans_requests[tid]
+
+    def request(self, tid, vid, mode):
+        """
+        Request mode on vid, or on the whole site if vid is SITE_LOCK, a refused request is queued
+
+        :return: Boolean
+        """
+        entry = self.get_entry(vid)
+        held = entry.holders.get(tid)
+        if held is not None and mode in COVERS[held]:
+            return True
+        mode = combine(held, mode)
+        if self.is_grantable(entry, tid, vid, mode):
+            self.grant(entry, tid, vid, mode)
+            return True
+        if self.fair:
+            self.enqueue(entry, tid, vid, mode)
+        elif mode == LockType.WRITE:
+            self.add_write_waiter(tid, vid)
+        return False
+
+    def request_intention(self, tid, vids, mode):
+        """
+        Check the site lets tid lock vids in mode. A refused intention is queued on the site and
+        vids are woken when the site lock is released.
+
+        :return: (True, intention mode to grant or None) or (False, None)
+        """
+        site_entry = self.get_entry(SITE_LOCK)
+        held = site_entry.holders.get(tid)
+        intention = INTENTION[mode]
+        if held is not None and intention in COVERS[held]:
+            return True, None
+        intention = combine(held, intention)
+        if self.is_grantable(site_entry, tid, SITE_LOCK, intention):
+            return True, intention
+        if self.fair:
+            self.enqueue(site_entry, tid, SITE_LOCK, intention)
+        self.site_waiters.update(vids)
+        return False, None
+
+    def acquire(self, tid, vid, mode):
+        """
+        Lock vid, the intention mode is taken on the site together with the first variable lock.
+        A lock on the whole site covering mode is enough.
+
+        :return: Boolean
+        """
+        site_entry = self.lock_table.get(SITE_LOCK)
+        if site_entry is not None and mode in COVERS.get(site_entry.holders.get(tid), ()):
+            return True
+        allowed, intention = self.request_intention(tid, (vid,), mode)
+        if not allowed or not self.request(tid, vid, mode):
+            self.drop_if_unlocked(SITE_LOCK)
+            return False
+        if intention is not None:
+            self.grant(self.lock_table[SITE_LOCK], tid, SITE_LOCK, intention)
+        return True
 
     def acquire_read_lock(self, tid, vid):
         """
@@ -17,42 +278,153 @@ class LockManager:
         :param tid: transaction id
         :return: Boolean
         """
-        if vid not in self.lock_table:
-            # add transaction_id to the read lock list
-            self.lock_table[vid] = {LockType.READ: {tid}, LockType.WRITE: None}
+        if self.acquire(tid, vid, LockType.READ):
+            self.metrics.incr("lock.read.granted")
             return True
-        else:
-            # no write lock or own write lock by itself
-            if self.lock_table[vid][LockType.WRITE] is None or self.lock_table[vid][LockType.WRITE] == tid:
-                self.lock_table[vid][LockType.READ].add(tid)
-                return True
-            # has other write lock, refused to acquire the read lock
-            elif self.lock_table[vid][LockType.WRITE] is not None:
-                return False
+        self.metrics.incr("lock.read.conflict")
+        return False
 
     def acquire_write_lock(self, tid, vid):
         """
-        Try to acquire write lock in a variable
+        Try to acquire write lock in a variable, a read lock of tid is upgraded when no other
+        transaction holds the variable and no write request is queued before it
 
         :param vid: variable id
         :param tid: transaction id
         :return: Boolean
         """
-        if vid not in self.lock_table:
-            # add transaction_id to write lock list
-            self.lock_table[vid] = {LockType.READ: set(), LockType.WRITE: tid}
+        entry = self.lock_table.get(vid)
+        held = entry.holders.get(tid) if entry is not None else None
+        if held == LockType.WRITE:
             return True
-        else:
-            # promote existed read lock
-            if tid in self.lock_table[vid][LockType.READ] and len(self.lock_table[vid][LockType.READ]) == 1:
-                self.lock_table[vid][LockType.READ].remove(tid)
-                self.lock_table[vid][LockType.WRITE] = tid
-                return True
-            # has already acquired write lock
-            elif tid == self.lock_table[vid][LockType.WRITE]:
-                return True
-            else:
-                return False
+        upgrade = held == LockType.READ
+        if self.acquire(tid, vid, LockType.WRITE):
+            self.metrics.incr("lock.write.promoted" if upgrade else "lock.write.granted")
+            return True
+        self.metrics.incr("lock.write.conflict")
+        return False
+
+    def check_locks(self, tid, vids, lock_type):
+        """
+        Find what refuses tid a lock_type lock on every variable of vids, nothing is locked or
+        queued
+
+        :param tid: transaction id
+        :param vids: variable ids
+        :param lock_type: LockType.READ or LockType.WRITE
+        :return: list of the refused vids, [SITE_LOCK] if the lock on the site refuses them all
+        """
+        site_entry = self.lock_table.get(SITE_LOCK)
+        if site_entry is not None:
+            held = site_entry.holders.get(tid)
+            if held is not None and lock_type in COVERS[held]:
+                return []
+            intention = INTENTION[lock_type]
+            if (held is None or intention not in COVERS[held]) \
+                    and not self.is_grantable(site_entry, tid, SITE_LOCK, combine(held, intention)):
+                return [SITE_LOCK]
+        refused = []
+        for vid in vids:
+            entry = self.lock_table.get(vid)
+            if entry is None:
+                continue
+            held = entry.holders.get(tid)
+            if held is not None and lock_type in COVERS[held]:
+                continue
+            if not self.is_grantable(entry, tid, vid, combine(held, lock_type)):
+                refused.append(vid)
+        return refused
+
+    def acquire_locks(self, tid, vids, lock_type):
+        """
+        Lock a group of variables in one call, all of them or none. From escalation_threshold
+        variables the whole site is locked instead.
+
+        :param tid: transaction id
+        :param vids: variable ids
+        :param lock_type: LockType.READ or LockType.WRITE
+        :return: Boolean
+        """
+        if len(vids) >= self.escalation_threshold:
+            granted = self.request(tid, SITE_LOCK, lock_type)
+            self.metrics.incr("lock.escalated" if granted else "lock.escalation.conflict")
+            return granted
+
+        site_entry = self.lock_table.get(SITE_LOCK)
+        if site_entry is not None and lock_type in COVERS.get(site_entry.holders.get(tid), ()):
+            return True
+        refused = self.check_locks(tid, vids, lock_type)
+        if refused:
+            if refused == [SITE_LOCK]:
+                self.request_intention(tid, vids, lock_type)
+            elif self.fair:
+                for vid in refused:
+                    entry = self.lock_table[vid]
+                    self.enqueue(entry, tid, vid, combine(entry.holders.get(tid), lock_type))
+            self.metrics.incr("lock.group.conflict")
+            return False
+        _, intention = self.request_intention(tid, vids, lock_type)
+        for vid in vids:
+            self.request(tid, vid, lock_type)
+        if intention is not None:
+            self.grant(self.lock_table[SITE_LOCK], tid, SITE_LOCK, intention)
+        self.metrics.incr("lock.group.granted")
+        return True
+
+    def get_blockers(self, tid, vid, lock_type):
+        """
+        Get the transactions whose locks on vid or on the site, or whose earlier queued requests,
+        conflict with a lock_type request of tid
+
+        :param tid: transaction id
+        :param vid: variable id, SITE_LOCK for the whole site
+        :param lock_type: requested lock type
+        :return: set
+        """
+        blockers = set()
+        site_entry = self.lock_table.get(SITE_LOCK)
+        if site_entry is not None and vid != SITE_LOCK:
+            blockers.update(site_entry.get_blockers(tid, INTENTION[lock_type]))
+        entry = self.lock_table.get(vid)
+        if entry is not None:
+            blockers.update(entry.get_blockers(tid, combine(entry.holders.get(tid), lock_type)))
+            if lock_type == LockType.WRITE and entry.holders.get(tid) == LockType.READ:
+                blockers.update(self.get_other_write_waiters(tid, vid))
+        return blockers
+
+    def cancel_request(self, tid, vid):
+        """
+        Withdraw the queued request of tid on vid, e.g. a read served by another site
+
+        :param tid: transaction id
+        :param vid: variable id
+        :return: None
+        """
+        entry = self.lock_table.get(vid)
+        if entry is not None and entry.queue and entry.dequeue(tid):
+            self.unindex_request(tid, vid)
+            self.drop_if_unlocked(vid)
+            self.notify_release(vid, LockType.WRITE)
+
+    def release(self, tid, vid):
+        entry = self.lock_table.get(vid)
+        if entry is None:
+            return None
+        mode = entry.holders.pop(tid, None)
+        if mode is not None:
+            entry.counts[mode] -= 1
+            self.unindex_lock(tid, vid, mode)
+        if entry.queue and entry.dequeue(tid):
+            self.unindex_request(tid, vid)
+        self.drop_if_unlocked(vid)
+        locks = self.trans_locks.get(tid)
+        if vid != SITE_LOCK and locks is not None and len(locks) == 1:
+            site_vid, site_mode = next(iter(locks))
+            if site_vid == SITE_LOCK and site_mode in (LockType.INTENTION_READ, LockType.INTENTION_WRITE):
+                # the intention is only kept while tid holds a lock on a variable of the site
+                self.release(tid, SITE_LOCK)
+                self.notify_site_release()
+        return mode
 
     def release_read_lock(self, tid, vid):
         """
@@ -62,8 +434,10 @@ class LockManager:
         :param tid: transaction id
         :return: None
         """
-        if tid in self.lock_table[vid][LockType.READ]:
-            self.lock_table[vid][LockType.READ].remove(tid)
+        entry = self.lock_table.get(vid)
+        if entry is not None and entry.holders.get(tid) == LockType.READ:
+            self.release(tid, vid)
+            self.notify_release(vid, LockType.READ)
 
     def release_write_lock(self, tid, vid):
         """
@@ -73,33 +447,57 @@ class LockManager:
         :param tid: transaction id
         :return: None
         """
-        if tid == self.lock_table[vid][LockType.WRITE]:
-            self.lock_table[vid][LockType.WRITE] = None
+        entry = self.lock_table.get(vid)
+        if entry is not None and entry.holders.get(tid) == LockType.WRITE:
+            self.release(tid, vid)
+            self.notify_release(vid, LockType.WRITE)
 
     def release_lock(self, tid, vid):
         self.release_read_lock(tid, vid)
         self.release_write_lock(tid, vid)
 
+    def drop_if_unlocked(self, vid):
+        entry = self.lock_table.get(vid)
+        if entry is not None and not entry.holders and not entry.queue:
+            self.lock_table.pop(vid)
+
     def release_locks_by_trans(self, tid):
         """
-        Try to release all locks set by tid
+        Try to release all locks set by tid and withdraw its queued requests, only the locks and
+        requests recorded for tid are visited
 
         :param tid: Transaction id
         :return: None
         """
-        variable_delete_list = []
-        for vid, lock_list in self.lock_table.items():
-            # release read lock
-            self.release_read_lock(tid, vid)
-
-            # release write lock
-            self.release_write_lock(tid, vid)
-
-            if len(lock_list[LockType.READ]) == 0 and lock_list[LockType.WRITE] is None:
-                variable_delete_list.append(vid)
+        for vid in list(self.trans_write_waits.get(tid, ())):
+            self.remove_write_waiter(tid, vid)
+        for vid in self.trans_requests.pop(tid, ()):
+            entry = self.lock_table[vid]
+            entry.dequeue(tid)
+            self.drop_if_unlocked(vid)
+            # the requests queued behind it may be granted now
+            if vid == SITE_LOCK:
+                self.notify_site_release()
+            else:
+                self.notify_release(vid, LockType.WRITE)
+        for vid, lock_type in self.trans_locks.pop(tid, ()):
+            entry = self.lock_table[vid]
+            del entry.holders[tid]
+            entry.counts[lock_type] -= 1
+            self.drop_if_unlocked(vid)
+            if vid == SITE_LOCK:
+                self.notify_site_release()
+            else:
+                self.notify_release(vid, lock_type)
 
-        for vid in variable_delete_list:
-            self.lock_table.pop(vid)
+    def notify_site_release(self):
+        """
+        Wake the requests refused because of the lock on the site and the requests queued on it
+        """
+        site_waiters, self.site_waiters = self.site_waiters, set()
+        for vid in site_waiters:
+            self.notify_release(vid, LockType.WRITE)
+        self.notify_release(SITE_LOCK, LockType.WRITE)
 
     def get_all_transactions(self):
         """
@@ -107,15 +505,7 @@ class LockManager:
 
         :return: set
         """
-        transactions = set()
-        for vid, lock_list in self.lock_table.items():
-            # Read Transaction on vid
-            for tid in lock_list[LockType.READ]:
-                transactions.add(tid)
-            # Write transaction on vid:
-            if lock_list[LockType.WRITE]:
-                transactions.add(lock_list[LockType.WRITE])
-        return transactions
+        return set(self.trans_locks)
 
     def fail(self):
         """
@@ -123,4 +513,11 @@ class LockManager:
 
         :return: None
         """
-        self.lock_table = {}
+        lock_table, self.lock_table = self.lock_table, {}
+        self.trans_locks = {}
+        self.trans_requests = {}
+        self.write_waiters = {}
+        self.trans_write_waits = {}
+        site_waiters, self.site_waiters = self.site_waiters, set()
+        for vid in lock_table.keys() | site_waiters:
+            self.notify_release(vid, LockType.WRITE)
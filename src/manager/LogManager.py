@@ -0,0 +1,172 @@
+import os
+import struct
+import zlib
+from src.utils.CheckpointFile import CheckpointFile, write_checkpoint
+from src.utils.Metrics import NULL_METRICS
+
+# record header: payload length, crc32 of the payload
+HEADER = struct.Struct("<II")
+# payload: log sequence number, commit time, number of writes, followed by the writes
+COMMIT = struct.Struct("<QqI")
+# one write: variable id, length of the value, followed by the value as a signed little endian
+# integer of that many bytes, values are not limited to 64 bits
+WRITE = struct.Struct("<qI")
+
+
+def encode_write(vid, value):
+    data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+    return WRITE.pack(vid, len(data)) + data
+
+
+class LogConfig:
+    """
+    Where and how the sites log their commits
+
+    :param self.directory: directory of the logs and checkpoints, site<N>.wal and site<N>.ckpt
+    :param self.group_size: number of commit records written and fsync'd together, above 1 a commit
+                            is reported before its record is durable and a crash can lose it
+    :param self.checkpoint_interval: number of commit records of a site between two checkpoints
+    """
+
+    def __init__(self, directory, group_size=1, checkpoint_interval=1024):
+        if group_size < 1 or checkpoint_interval < 1:
+            raise ValueError("group_size and checkpoint_interval must be at least 1")
+        self.directory = directory
+        self.group_size = group_size
+        self.checkpoint_interval = checkpoint_interval
+
+    def open(self, site_id, metrics=NULL_METRICS):
+        os.makedirs(self.directory, exist_ok=True)
+        return LogManager(os.path.join(self.directory, f"site{site_id}.wal"),
+                          os.path.join(self.directory, f"site{site_id}.ckpt"),
+                          self.group_size, self.checkpoint_interval, metrics)
+
+
+class LogManager:
+    """
+    An append-only write-ahead log of the commits of one site.
+
+    A commit record holds every write of a transaction at the site and its commit time. Records
+    are buffered and written with one fsync per group of group_size records, the group is also
+    written before a checkpoint, a failure of the site and on close. By default every record is
+    fsync'd before its commit is reported. A larger group trades that for fewer fsyncs: a crash of
+    the process loses at most the unwritten group, whose commits were already reported.
+
+    Every checkpoint_interval records the committed versions of the site are written to the
+    checkpoint file, see CheckpointFile, and the log is emptied. A record carries a sequence
+    number so a record already in the checkpoint is not replayed twice.
+
+    :param self.lsn: sequence number of the last record
+    :param self.pending: encoded records not written yet
+    :param self.since_checkpoint: number of records since the last checkpoint
+    """
+
+    def __init__(self, log_path, checkpoint_path, group_size=1, checkpoint_interval=1024, metrics=NULL_METRICS):
+        self.log_path = log_path
+        self.checkpoint_path = checkpoint_path
+        self.group_size = group_size
+        self.checkpoint_interval = checkpoint_interval
+        self.metrics = metrics
+        self.lsn = 0
+        self.pending = []
+        self.since_checkpoint = 0
+        self.file = open(log_path, "ab")
+
+    def append(self, commit_time, writes):
+        """
+        Log the writes of a committed transaction
+
+        :param commit_time: time of the commit
+        :param writes: vid -> value
+        :return: None
+        """
+        self.lsn += 1
+        payload = COMMIT.pack(self.lsn, commit_time, len(writes)) \
+            + b"".join(encode_write(vid, value) for vid, value in writes.items())
+        self.pending.append(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.since_checkpoint += 1
+        self.metrics.incr("wal.records")
+        if len(self.pending) >= self.group_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the pending records and fsync the log
+
+        :return: None
+        """
+        if not self.pending:
+            return
+        data = b"".join(self.pending)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.metrics.incr("wal.fsyncs")
+        self.metrics.incr("wal.bytes", len(data))
+        self.metrics.observe("wal.group_size", len(self.pending))
+        self.pending = []
+
+    def needs_checkpoint(self):
+        return self.since_checkpoint >= self.checkpoint_interval
+
+    def checkpoint(self, entries):
+        """
+        Save the committed versions of the site and empty the log
+
+        :param entries: (vid, read availability, commit times, values) sorted by vid
+        :return: the new CheckpointFile
+        """
+        self.flush()
+        size = write_checkpoint(self.checkpoint_path, self.lsn, entries)
+        self.file.truncate(0)
+        os.fsync(self.file.fileno())
+        self.since_checkpoint = 0
+        self.metrics.incr("wal.checkpoints")
+        self.metrics.incr("wal.checkpoint_bytes", size)
+        return CheckpointFile(self.checkpoint_path)
+
+    def replay(self):
+        """
+        Open the checkpoint and read the log records after it. A torn or corrupted record ends
+        the log, it and everything after it are cut off.
+
+        :return: (CheckpointFile or None, list of (sequence number, commit time, vid -> value))
+        """
+        self.flush()
+        checkpoint, lsn = None, 0
+        if os.path.exists(self.checkpoint_path):
+            checkpoint = CheckpointFile(self.checkpoint_path)
+            lsn = checkpoint.lsn
+
+        with open(self.log_path, "rb") as f:
+            data = f.read()
+        commits, offset = [], 0
+        while offset + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, offset)
+            start, end = offset + HEADER.size, offset + HEADER.size + length
+            if end > len(data) or length < COMMIT.size or zlib.crc32(data[start:end]) != crc:
+                break
+            record_lsn, commit_time, count = COMMIT.unpack_from(data, start)
+            if record_lsn > lsn:
+                writes, position = {}, start + COMMIT.size
+                for _ in range(count):
+                    vid, size = WRITE.unpack_from(data, position)
+                    position += WRITE.size
+                    writes[vid] = int.from_bytes(data[position:position + size], "little", signed=True)
+                    position += size
+                commits.append((record_lsn, commit_time, writes))
+                lsn = record_lsn
+            offset = end
+
+        if offset < len(data):
+            self.file.truncate(offset)
+            os.fsync(self.file.fileno())
+            self.metrics.incr("wal.truncated_bytes", len(data) - offset)
+        self.lsn = max(self.lsn, lsn)
+        self.since_checkpoint = len(commits)
+        return checkpoint, commits
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
@@ -0,0 +1,114 @@
+from src.CustomizedConf import *
+from src.manager.TransactionManager import TransactionManager
+from src.manager.WaitQueue import lock_key, site_key, trans_key
+from src.utils.Metrics import NULL_METRICS
+
+
+class OptimisticTransactionManager(TransactionManager):
+    """
+    A transaction manager with optimistic concurrency control instead of strict two phase locking.
+
+    A read-write transaction takes no lock. A read records the commit time of the version it read
+    and a write is buffered in the write set of the transaction, as with locks. At the end the transaction is validated backward: it aborts if a transaction that
+    committed since one of its reads wrote the variable read, otherwise its writes are applied.
+    Read-only transactions read the versions committed before they began, as with locks.
+
+    A site failure aborts the transactions that read or wrote at the site, at their end, like a
+    failure of a site where they held locks.
+
+    :param self.read_sets: tid -> {vid: commit time of the version read}
+    :param self.last_commits: vid -> time of the last commit writing it
+    """
+
+    def __init__(self, sink=None, topology=None, metrics=NULL_METRICS):
+        super().__init__(sink, topology, metrics)
+        self.read_sets = {}
+        self.last_commits = {}
+
+    def execute_read(self, operation, is_retry=False):
+        tid, vid = operation.get_tid(), operation.get_vid()
+        if self.transactions[tid].transaction_type == TransactionType.RO:
+            return super().execute_read(operation, is_retry)
+        if not is_retry:
+            self.save_to_transaction(operation)
+
+        self.wait_keys.append(lock_key(vid, LockType.READ))
+        up_sids, readable_sids, _ = self.get_site_index(vid)
+        if readable_sids:
+            site = self.sites[readable_sids[0] - 1]
+            trans = self.transactions[tid]
+            trans.sites.add(site.sid)
+            if trans.read_own_write(vid, site.sid) is None:
+                # a variable written by tid is not validated, tid reads its own value
+                version = site.data_manager.read_at(vid, self.tick)
+                self.read_sets.setdefault(tid, {}).setdefault(vid, version[0])
+            return self.read_variable(tid, vid, site)
+        if len(up_sids) < len(self.var_sites[vid]):
+            self.wait_keys.extend(site_key(site.sid) for site in self.var_sites[vid]
+                                  if site.status == SiteStatus.DOWN)
+        return False
+
+    def execute_write(self, operation, is_retry=False):
+        if not is_retry:
+            self.save_to_transaction(operation)
+
+        tid = operation.get_tid()
+        writes = dict(operation.get_writes())
+        var_up_sids = {}
+        for vid in writes:
+            up_sids = self.get_site_index(vid)[0]
+            if not up_sids:
+                # retry later if no site holding the variable is up now
+                self.wait_keys.extend(site_key(site.sid) for site in self.var_sites[vid])
+                self.sink.table(["Transaction waits because of a site down"], [["T" + str(tid)]])
+                return False
+            var_up_sids[vid] = up_sids
+
+        trans = self.transactions[tid]
+        for vid, up_sids in var_up_sids.items():
+            trans.add_write(vid, writes[vid], up_sids)
+            trans.sites.update(up_sids)
+            self.sink.table(["Sites affected by a write"], [[f"{sid}"] for sid in up_sids])
+        return True
+
+    def execute_fail(self, operation):
+        sid = operation.get_sid()
+        for tid, trans in self.transactions.items():
+            if sid in trans.sites:
+                trans.set_trans_status(TransactionStatus.ABORTED)
+                trans.lose_writes(sid)
+                # a blocked end operation can abort now
+                self.waiting_list.wake(trans_key(tid))
+        return super().execute_fail(operation)
+
+    def validate(self, tid):
+        """
+        Check no transaction committed a variable tid read since it read it
+
+        :param tid: transaction id
+        :return: Boolean
+        """
+        last_commits = self.last_commits
+        for vid, version in self.read_sets.get(tid, {}).items():
+            if last_commits.get(vid, -1) > version:
+                return False
+        return True
+
+    def commit(self, tid):
+        # the end went through the checks of a site failure and of blocked operations already
+        self.metrics.incr("occ.validations")
+        if not self.validate(tid):
+            self.abort(tid, AbortType.VALIDATION)
+            return
+        written = list(self.transactions[tid].writes)
+        super().commit(tid)
+        for vid in written:
+            self.last_commits[vid] = self.tick
+        self.forget(tid)
+
+    def abort(self, tid, abort_type=AbortType.DEADLOCK):
+        super().abort(tid, abort_type)
+        self.forget(tid)
+
+    def forget(self, tid):
+        self.read_sets.pop(tid, None)
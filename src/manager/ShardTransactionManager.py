@@ -0,0 +1,183 @@
+from src.CustomizedConf import AbortType, OperationType, TransactionStatus
+from src.DeadLockDetector import DeadLockDetector
+from src.manager.TransactionManager import TransactionManager
+
+# phases of a tick, in the order the serial manager outputs their results, the decisions of the
+# coordinator are reported last
+RETRY, EXECUTE, DEADLOCK, DECIDE = 0, 1, 2, 3
+
+
+class ShardWaitForGraph(DeadLockDetector):
+    """
+    The wait-for graph of one shard. A cycle through a transaction spanning several shards is
+    left to the coordinator, which sees the edges of every shard.
+
+    :param self.excluded: tids of the transactions spanning this shard and others
+    :param self.added: edges were added since the last report to the coordinator
+    """
+
+    def __init__(self, tm, spanning):
+        super().__init__(tm)
+        self.excluded = spanning
+        self.added = False
+
+    def add_wait(self, tid, holders):
+        super().add_wait(tid, holders)
+        self.added = self.added or any(holder != tid for holder in holders)
+
+
+class ShardTransactionManager(TransactionManager):
+    """
+    The transaction manager of one shard in a sharded run, with its own sites, lock tables and
+    data for the variables of the shard.
+
+    It executes the reads and writes of the variables of the shard, the begin and end of every
+    transaction using them and the global commands. It is told about the ticks of the other
+    shards with pass_tick, where it retries its woken operations and checks for deadlocks as the
+    serial manager would at that tick. The sink is a RecordingSink, every result is recorded under
+    the key (tick, phase, arrival tick of the retried operation or first tid of the broken cycle)
+    so the results of all shards can be merged into the serial order.
+
+    A transaction spanning several shards is prepared instead of committed when its end succeeds
+    here: it keeps its locks until the coordinator commits or aborts it with apply_decision. Its
+    abort at the end, after a failure of a site it accessed, is only reported to the coordinator,
+    which aborts it in its other shards. Its home shard, the first one, outputs its end.
+
+    :param self.shard: index of the shard
+    :param self.spanning: tid -> home shard, of the transactions spanning this shard and others
+    :param self.prepared: tid -> key of the end, of the spanning transactions prepared here and not decided yet
+    :param self.local_aborts: (key, tid, abort type) of the spanning transactions aborted here since the last report
+    :param self.retried: tick whose blocked operations were retried already, before the global command of the tick
+    """
+
+    def __init__(self, sink=None, topology=None, shard=0, spanning=None):
+        super().__init__(sink, topology)
+        self.shard = shard
+        self.spanning = spanning if spanning is not None else {}
+        self.prepared = {}
+        self.local_aborts = []
+        self.retried = None
+        self.wait_for_graph = ShardWaitForGraph(self, self.spanning)
+        self.waiting_list.wait_for_graph = self.wait_for_graph
+
+    def retry(self):
+        if self.tick != self.retried:
+            super().retry()
+        self.sink.key = (self.tick, EXECUTE, 0)
+
+    def assign_task(self, operation, is_retry=False):
+        if is_retry:
+            self.sink.key = (self.tick, RETRY, operation.get_time())
+        return super().assign_task(operation, is_retry)
+
+    def break_cycle(self, cycle):
+        # cycles are broken in the order of their first tid, in every shard alike
+        self.sink.key = (self.tick, DEADLOCK, cycle[0])
+        super().break_cycle(cycle)
+
+    def execute_operation(self, operations):
+        tid = operations.get_tid()
+        home = self.spanning.get(tid)
+        if operations.get_type() == OperationType.END and home is not None and home != self.shard \
+                and tid in self.aborted:
+            # the end of an aborted spanning transaction, its home shard reports it is ignored
+            self.aborted.discard(tid)
+            self.pass_tick(operations.get_time(), False)
+            return True
+        return super().execute_operation(operations)
+
+    def commit(self, tid):
+        if tid not in self.spanning:
+            super().commit(tid)
+            return
+        # the coordinator commits it once all its shards prepared it
+        self.prepared[tid] = self.sink.key
+
+    def abort(self, tid, abort_type=AbortType.DEADLOCK):
+        if tid not in self.spanning:
+            super().abort(tid, abort_type)
+            return
+        # the coordinator aborts it in its other shards and its home shard reports it
+        self.local_aborts.append((self.sink.key, tid, abort_type))
+        self.sink.muted = True
+        super().abort(tid, abort_type)
+        self.sink.muted = False
+
+    def apply_decision(self, key, tid, committed, abort_type):
+        """
+        Commit or abort a transaction as the coordinator decided, at the current tick
+
+        :param key: key the decision is reported under
+        :param tid: transaction id
+        :param committed: commit the transaction, abort it otherwise
+        :param abort_type: reason of the abort
+        :return: None
+        """
+        home = self.spanning.get(tid)
+        if home is None:
+            if tid not in self.transactions:
+                return
+            home = self.shard
+        elif tid not in self.transactions and home != self.shard:
+            return
+        self.prepared.pop(tid, None)
+        self.sink.key = key
+        self.sink.muted = home != self.shard
+        if tid not in self.transactions:
+            # it was aborted here already, only the report is left
+            self.sink.message(f"Transaction {tid} aborted")
+        elif committed:
+            super().commit(tid)
+        else:
+            super().abort(tid, abort_type)
+        self.sink.muted = False
+
+    def drop_blocked(self, arrival):
+        """
+        Drop the oldest blocked operation if it arrived at the given tick, the coordinator drops
+        the oldest one of all shards like FileRunner.run does after the last operation
+
+        :param arrival: arrival tick of the operation
+        :return: None
+        """
+        waiting_list = self.waiting_list
+        if waiting_list and next(iter(waiting_list.entries.values())).operation.get_time() == arrival:
+            waiting_list.pop_first()
+
+    def report(self):
+        """
+        Collect what the coordinator needs at the end of an epoch
+
+        :return: (tid -> (key of the end, still active) of the prepared spanning transactions,
+            the spanning transactions aborted since the last report, wait-for edges, edges were
+            added since the last report, arrival tick of the oldest blocked operation
+            or None)
+        """
+        transactions = self.transactions
+        prepared = {tid: (key, transactions[tid].transaction_status != TransactionStatus.ABORTED)
+                    for tid, key in self.prepared.items()}
+        local_aborts, self.local_aborts = self.local_aborts, []
+        graph = self.wait_for_graph
+        added, graph.added = graph.added, False
+        edges = {tid: list(holders) for tid, holders in graph.waits_for.items()}
+        waiting_list = self.waiting_list
+        oldest = next(iter(waiting_list.entries.values())).operation.get_time() if waiting_list else None
+        return prepared, local_aborts, edges, added, oldest
+
+    def pass_tick(self, tick, check_deadlock):
+        """
+        Process a tick of another shard, nothing is done unless an operation was woken up or a
+        wait-for edge was added since the last check
+
+        :param tick: the tick
+        :param check_deadlock: the operation of the tick was a read or a write
+        :return: None
+        """
+        waiting_list = self.waiting_list
+        if not waiting_list.ready and not waiting_list.changed_trans \
+                and not (check_deadlock and self.wait_for_graph.changed):
+            return
+        self.set_tick(tick)
+        self.retry()
+        if check_deadlock:
+            self.resolve_deadlock()
@@ -1,9 +1,20 @@
+import sys
+from bisect import insort
+from collections import OrderedDict
 from src.CustomizedConf import *
-from src.DeadLockDetector import *
+from src.DeadLockDetector import DeadLockDetector, NullWaitForGraph
+from src.manager.DeadlockPolicy import Detection
+from src.manager.LockManager import SITE_LOCK
+from src.manager.WaitQueue import WaitQueue, lock_key, site_key, trans_key
 from src.model.Site import Site
+from src.model.Topology import Topology
 from src.model.Transaction import Transaction
 from src.model.Operation import Operation
-from prettytable import PrettyTable
+from src.utils.OutputSink import PrettyTableSink
+from src.utils.Metrics import NULL_METRICS
+
+# operation type -> name of the counter of its operations
+OPERATION_COUNTERS = {operation_type: f"ops.{operation_type.name.lower()}" for operation_type in OperationType}
 
 
 class TransactionManager:
@@ -11,87 +22,250 @@ class TransactionManager:
     The transaction manager distributes operation and hold the information of the entire simulation
 
     :param self.transactions: A dict to store running transactions
-    :param self.wait_for_graph: A graph store the waiting sequence of operations to detect deadlock
-    :param self.waiting_list: A waiting list contains all blocked operations
+    :param self.aborted: tids of the aborted transactions whose end has not been read yet, their
+        remaining operations are ignored
+    :param self.wait_for_graph: A wait-for graph of blocked transactions to detect deadlock
+    :param self.deadlock_policy: DeadlockPolicy, detection after every read and write by default
+    :param self.waiting_list: A wait queue contains all blocked operations indexed by the resource they wait on
     :param self.waiting_trans: A waiting set store all waiting transactions
+    :param self.wait_keys: Resources the last blocked operation waits on
+    :param self.wait_holders: Transactions holding the locks the last blocked operation waits on
     :param self.sites: A list store all sites
+    :param self.topology: Variables, sites and replica placement of the simulation
+    :param self.var_sites: vid -> list of the sites holding a copy of the variable
+    :param self.site_index: vid -> (sorted ids of the up sites holding it, sorted ids of the up sites a
+        read-write transaction can read it at, ids of the up sites where it can only be read after a commit),
+        built when first used and kept up to date on failures, recoveries and commits. The tuple of the up
+        sites is replaced, not changed, so the write sets keep it without a copy
+    :param self.tick: Time of the operation being processed
+    :param self.active_read_only: Active read-only transactions in begin order, tid -> begin time
+    :param self.sink: OutputSink receiving the results, pretty tables on stdout by default
+    :param self.metrics: Metrics of the run, shared with the sites, disabled by default
     """
 
-    def __init__(self):
+    def __init__(self, sink=None, topology=None, metrics=NULL_METRICS):
+        self.sink = sink if sink is not None else PrettyTableSink(sys.stdout)
+        self.metrics = metrics
+        self.topology = topology if topology is not None else Topology()
         self.transactions = {}
-        self.waiting_list = []
-        self.waiting_trans = set()
+        self.aborted = set()
         self.wait_for_graph = DeadLockDetector(self)
+        self.waiting_list = WaitQueue(self.wait_for_graph)
+        self.deadlock_policy = Detection()
+        self.waiting_trans = set()
+        self.wait_keys = []
+        self.wait_holders = set()
         self.sites = []
+        self.var_sites = {}
+        self.site_index = {}
+        self.tick = 0
+        self.active_read_only = OrderedDict()
+
+    def set_tick(self, tick):
+        self.tick = tick
+
+    def set_deadlock_policy(self, policy):
+        """
+        Replace the deadlock policy, before the first operation. A policy that does not use the
+        wait-for graph does not keep one.
+
+        :param policy: DeadlockPolicy
+        :return: None
+        """
+        self.deadlock_policy = policy
+        self.wait_for_graph = DeadLockDetector(self) if policy.uses_graph else NullWaitForGraph(self)
+        self.waiting_list.wait_for_graph = self.wait_for_graph
 
     def get_all_sites(self, sites):
         self.sites = sites
+        self.var_sites = {vid: [sites[sid - 1] for sid in sids] for vid, sids in self.topology.var_sites.items()}
+        for site in sites:
+            site.lock_manager.add_release_listener(self.on_lock_release)
+
+    def get_site_index(self, vid):
+        """
+        Get the ids of the up sites of vid without checking every site holding it
+
+        :param vid: variable id
+        :return: (tuple of the sorted up sids, sorted sids of the up sites it is readable at, sids of
+            the up sites it is not readable at)
+        """
+        entry = self.site_index.get(vid)
+        if entry is None:
+            up_sids, readable_sids, unreadable = [], [], set()
+            for site in self.var_sites[vid]:
+                if site.status == SiteStatus.UP:
+                    up_sids.append(site.sid)
+                    if site.data_manager.is_available(vid):
+                        readable_sids.append(site.sid)
+                    else:
+                        unreadable.add(site.sid)
+            entry = self.site_index[vid] = (tuple(up_sids), readable_sids, unreadable)
+        return entry
+
+    def update_site_index(self, site):
+        """
+        Update the index of the variables held by a site that failed or recovered, only the
+        variables already indexed are updated
+
+        :param site: Site
+        :return: None
+        """
+        sid, is_up = site.sid, site.status == SiteStatus.UP
+        site_index = self.site_index
+        for vid in self.topology.get_variables(sid):
+            entry = site_index.get(vid)
+            if entry is None:
+                continue
+            up_sids, readable_sids, unreadable = entry
+            # a recovery of an up site also resets the availability of its copies
+            others = [other for other in up_sids if other != sid]
+            if sid in readable_sids:
+                readable_sids.remove(sid)
+            unreadable.discard(sid)
+            if is_up:
+                insort(others, sid)
+                if site.data_manager.is_available(vid):
+                    insort(readable_sids, sid)
+                else:
+                    unreadable.add(sid)
+            site_index[vid] = (tuple(others), readable_sids, unreadable)
+
+    def on_lock_release(self, vid, lock_type):
+        """
+        Wake up operations waiting for a lock on vid after a lock is released
+
+        :param vid: variable id
+        :param lock_type: type of the released lock
+        :return: None
+        """
+        self.waiting_list.wake(lock_key(vid, LockType.WRITE))
+        if lock_type == LockType.WRITE:
+            self.waiting_list.wake(lock_key(vid, LockType.READ))
 
     def execute_operation(self, operations):
         """
         Process the new operation
 
         :param operations: new operation
-        :return: None
+        :return: False if the operation is blocked
         """
+        # an unknown id is an error of the input, it is reported before anything is changed
+        self.topology.validate_operation(operations)
+        metrics = self.metrics
+        metrics.incr(OPERATION_COUNTERS[operations.get_type()])
+        self.set_tick(operations.get_time())
         # retry
+        start = metrics.start()
         self.retry()
-        is_succeed = self.assign_task(operations)
-        if not is_succeed:
-            self.waiting_list.append(operations)
+        metrics.stop("time.retry_us", start)
+        # the remaining operations of an aborted transaction are ignored
+        tid = operations.get_tid()
+        operation_type = operations.get_type()
+        if tid is not None and tid not in self.transactions \
+                and operation_type not in (OperationType.BEGIN, OperationType.BEGINRO):
+            if tid not in self.aborted:
+                raise KeyError(f"Try to execute {OperationType(operation_type).name} in a non-existing transaction")
+            if operation_type == OperationType.END:
+                self.aborted.discard(tid)
+            metrics.incr("ops.ignored")
+            self.sink.message(f"Transaction {tid} is not running, {OperationType(operation_type).name} ignored")
+            is_succeed = True
+        else:
+            self.wait_keys, self.wait_holders = [], set()
+            start = metrics.start()
+            is_succeed = self.assign_task(operations)
+            metrics.stop("time.execute_us", start)
+            if operation_type == OperationType.END:
+                # the end aborted the transaction, nothing of it is left to ignore
+                self.aborted.discard(tid)
+            if not is_succeed:
+                metrics.incr("ops.blocked")
+                self.waiting_list.add(operations, self.wait_keys, self.wait_holders)
+                if self.wait_holders:
+                    self.deadlock_policy.on_block(self, tid, self.wait_holders)
+
+        self.deadlock_policy.after_operation(self, operations)
+        return is_succeed
+
+    def resolve_deadlock(self):
+        """
+        Break every wait-for cycle, they are found from the oldest tid
 
-        # detect deadlock and then abort the youngest transaction if deadlock happens
-        if (OperationType.READ == operations.get_type()
-            or OperationType.WRITE == operations.get_type()) \
-                and self.wait_for_graph.deadlock():
-            trans = self.find_youngest_trans(self.wait_for_graph.getcycle())[0]
-            self.abort(trans)
+        :return: None
+        """
+        while self.wait_for_graph.deadlock():
+            self.break_cycle(self.wait_for_graph.getcycle())
 
-    def retry(self):
+    def break_cycle(self, cycle):
         """
-        retry blocked operations
+        Abort the youngest transaction of a wait-for cycle
 
+        :param cycle: tids in the cycle
         :return: None
         """
-        blocked_list = []
-        blocked_trans = set()
-        for op in self.waiting_list:
-            if not self.assign_task(op, True):
-                blocked_list.append(op)
-                if op.get_type() == OperationType.END and op.get_tid() not in blocked_trans:
-                    continue
-                blocked_trans.add(op.get_tid())
+        self.abort(self.find_youngest_trans(cycle))
+
+    def retry(self):
+        """
+        retry blocked operations whose resources have been released since they were blocked
 
-        self.waiting_list = blocked_list
-        self.waiting_trans = blocked_trans
+        :return: None
+        """
+        for entry in self.waiting_list.drain_ready():
+            self.wait_keys, self.wait_holders = [], set()
+            self.metrics.incr("retry.attempts")
+            if self.assign_task(entry.operation, True):
+                # ticks the operation sat in the waiting list
+                self.metrics.observe("wait.ticks", self.tick - entry.operation.get_time())
+                self.waiting_list.remove(entry)
+            else:
+                self.waiting_list.block(entry, self.wait_keys, self.wait_holders)
+                if self.wait_holders:
+                    self.deadlock_policy.on_block(self, entry.operation.get_tid(), self.wait_holders)
+
+        # the blocked end operations of a transaction are only retried after all its other operations
+        for tid in self.waiting_list.collect_changed_trans():
+            if tid in self.waiting_list.blocked_count:
+                self.waiting_trans.add(tid)
+            elif tid in self.waiting_trans:
+                self.waiting_trans.remove(tid)
+                self.waiting_list.wake(trans_key(tid))
 
     def find_youngest_trans(self, cycle):
         """
         Find the youngest transaction
 
         :param cycle: The deadlock cycle
-        :return: The youngest transaction
+        :return: tid of the youngest transaction
         """
-        ages = [(tid, self.transactions[tid].time_stamp) for tid in cycle]
-        return sorted(ages, key=lambda x: -x[1])[0]
+        transactions = self.transactions
+        return max(cycle, key=lambda tid: transactions[tid].time_stamp)
 
-    def abort(self, tid):
+    def abort(self, tid, abort_type=AbortType.DEADLOCK):
         """
         Abort the transaction
         :param tid: transaction_id
+        :param abort_type: reason of the abort
         :return: None
         """
-        for site in self.sites:
+        for sid in sorted(self.transactions[tid].sites):
+            site = self.sites[sid - 1]
             if site.get_status() == SiteStatus.UP:
                 site.lock_manager.release_locks_by_trans(tid)
-                site.data_manager.revert_trans_changes(tid)
 
         # Remove any blocked operation belongs to this transaction
-        self.waiting_list = [op for op in self.waiting_list if op.get_tid != tid]
+        blocked = self.waiting_list.get_operations(tid)
+        self.waiting_list.remove_transaction(tid)
         # Remove transaction in wait for graph
         self.wait_for_graph.remove_transaction(tid)
+        self.active_read_only.pop(tid, None)
         self.transactions.pop(tid)
-        print(f"Transaction {tid} aborted")
+        # the operations read after the abort are ignored, up to the end of the transaction
+        if not any(operation.get_type() == OperationType.END for operation in blocked):
+            self.aborted.add(tid)
+        self.metrics.incr(f"aborts.{abort_type.name.lower()}")
+        self.sink.message(f"Transaction {tid} aborted")
 
     def assign_task(self, operation, is_retry=False):
         if OperationType.BEGIN == operation.get_type():
@@ -110,6 +284,8 @@ class TransactionManager:
             return self.execute_dump()
         elif OperationType.END == operation.get_type():
             return self.execute_end(operation, is_retry)
+        elif OperationType.STATS == operation.get_type():
+            return self.execute_stats()
 
     def execute_begin(self, operation):
         """
@@ -136,11 +312,9 @@ class TransactionManager:
         trans = Transaction(tid, time_stamp)
         trans.set_trans_type(TransactionType.RO)
 
+        # reads are served from the versions committed before time_stamp, no snapshot is taken
         self.transactions[tid] = trans
-
-        # take snapshot
-        for site in self.sites:
-            site.get_snapshot(time_stamp)
+        self.active_read_only[tid] = time_stamp
         return True
 
     def execute_read(self, operation, is_retry=False):
@@ -160,14 +334,16 @@ class TransactionManager:
             trans_time_stamp = self.transactions[tid].time_stamp
             # 1.1: If xi is not replicated and the site holding xi is up, then the read-only
             # transaction can read it. Because that is the only site that knows about xi.
-            if vid % 2 == 1:
-                site = self.sites[vid % num_sites]
-                if site.status == SiteStatus.UP and vid in site.snapshots[trans_time_stamp]:
-                    rows = [[tid, f"{site.sid}", f"{site.get_snapshot_variable(trans_time_stamp, vid)}"]]
-                    print_table(headers, rows)
+            if not self.topology.is_replicated(vid):
+                site = self.var_sites[vid][0]
+                if site.status == SiteStatus.UP:
+                    _, value = site.data_manager.read_at(vid, trans_time_stamp)
+                    rows = [[tid, f"{site.sid}", f"{value}"]]
+                    self.sink.table(headers, rows)
                     return True
                 else:
-                    print_result(["Transaction waits because of a site down"], [[tid]])
+                    self.wait_keys.append(site_key(site.sid))
+                    self.sink.table(["Transaction waits because of a site down"], [[tid]])
                     return False
             # 1.2: If xi is replicated then RO can read xi from site s if xi was committed
             # at s by some transaction T’ before RO began and s was up all the time
@@ -175,35 +351,56 @@ class TransactionManager:
             # RO can read the version that T’ wrote. If there is no such site then
             # RO can abort.
             else:
-                is_data_exist = False
-                for site in self.sites:
-                    # if the site has the variable is down, has -> True, we could retry latter
-                    if site.status == SiteStatus.DOWN \
-                            and trans_time_stamp in site.snapshots \
-                            and vid in site.snapshots[trans_time_stamp]:
-                        is_data_exist = True
-                    elif trans_time_stamp in site.snapshots \
-                            and vid in site.snapshots[trans_time_stamp]:
-                        rows = [[tid, f"{site.sid}", f"{site.get_snapshot_variable(trans_time_stamp, vid)}"]]
-                        print_table(headers, rows)
+                up_sids = self.get_site_index(vid)[0]
+                for sid in up_sids:
+                    site = self.sites[sid - 1]
+                    version = site.read_version(vid, trans_time_stamp)
+                    if version is not None:
+                        rows = [[tid, f"{site.sid}", f"{version[1]}"]]
+                        self.sink.table(headers, rows)
                         return True
-                # No site has the variable in the snapshot
+                is_data_exist = False
+                if len(up_sids) < len(self.var_sites[vid]):
+                    for site in self.var_sites[vid]:
+                        # if the site has the variable is down, has -> True, we could retry latter
+                        if site.status == SiteStatus.DOWN and site.read_version(vid, trans_time_stamp) is not None:
+                            is_data_exist = True
+                            self.wait_keys.append(site_key(site.sid))
+                # No site has a version the transaction can read
                 if not is_data_exist:
                     self.abort(tid, AbortType.NO_DATA_FOR_READ_ONLY)
                     return True
         # Case 2: read-write transaction
         else:
             # 2.1 check specific site the index of variable read is odd (non-replicated)
-            for site in self.generate_site_list(vid):
-                if site.status == SiteStatus.UP \
-                        and site.data_manager.is_available(vid) \
-                        and site.lock_manager.acquire_read_lock(tid, vid):
+            self.wait_keys.append(lock_key(vid, LockType.READ))
+            up_sids, readable_sids, _ = self.get_site_index(vid)
+            sites, trans_sites = self.sites, self.transactions[tid].sites
+            # a refused read is queued at the first site only, the other copies are tried again
+            # when the operation is woken up instead of holding a place in every queue
+            for sid in readable_sids:
+                site = sites[sid - 1]
+                is_first = sid == readable_sids[0]
+                if not is_first and site.lock_manager.check_locks(tid, (vid,), LockType.READ):
+                    continue
+                trans_sites.add(sid)
+                if site.lock_manager.acquire_read_lock(tid, vid):
+                    if not is_first:
+                        # the request queued at the first site is not needed any more
+                        sites[readable_sids[0] - 1].lock_manager.cancel_request(tid, vid)
                     return self.read_variable(tid, vid, site)
+            for sid in up_sids:
+                self.wait_holders.update(sites[sid - 1].lock_manager.get_blockers(tid, vid, LockType.READ))
+            if len(up_sids) < len(self.var_sites[vid]):
+                self.wait_keys.extend(site_key(site.sid) for site in self.var_sites[vid]
+                                      if site.status == SiteStatus.DOWN)
         return False
 
     def execute_write(self, operation, is_retry=False):
         """
-        Execute Write operation
+        Execute Write operation of one or several variables. The write locks of every up copy
+        are checked first and only taken when all of them can be granted, so a conflict takes no
+        lock and a retry has none to release.
 
         :param operation: specific data from operations.
         :param retry: If the operation is a retry
@@ -212,55 +409,67 @@ class TransactionManager:
         if not is_retry:
             self.save_to_transaction(operation)
 
-        tid, vid, value = operation.get_tid(), operation.get_vid(), operation.get_value()
-
-        if vid % 2 != 0:
-            # site list start from 0, so the index should minus 1, from vid%10+1 to vid%10
-            site = self.sites[vid % num_sites]
-            if site.status == SiteStatus.UP \
-                    and site.lock_manager.acquire_write_lock(tid, vid):
-                logs = site.data_manager.uncommitted_log.get(tid, {})
-                logs[vid] = value
-                site.data_manager.uncommitted_log[tid] = logs
-                rows = [[f"{site.sid}"]]
-                header = ["Sites affected by a write"]
-                print_table(header, rows)
-                return True
-            else:
-                print_table(["Transaction waits because of a site down"], [["T" + str(tid)]])
+        tid = operation.get_tid()
+        writes = dict(operation.get_writes())
+        # vid -> ids of the up sites holding it, sid -> (site, vids written at the site)
+        var_up_sids, site_vids = {}, {}
+        for vid in writes:
+            self.wait_keys.append(lock_key(vid, LockType.WRITE))
+            up_sids = self.get_site_index(vid)[0]
+            if not up_sids:
+                # retry later if no site holding the variable is up now
+                self.wait_keys.extend(site_key(site.sid) for site in self.var_sites[vid])
+                self.sink.table(["Transaction waits because of a site down"], [["T" + str(tid)]])
+                return False
+            var_up_sids[vid] = up_sids
+            for sid in up_sids:
+                site_vids.setdefault(sid, (self.sites[sid - 1], []))[1].append(vid)
+
+        trans_sites = self.transactions[tid].sites
+        for site, vids in site_vids.values():
+            refused = site.lock_manager.check_locks(tid, vids, LockType.WRITE)
+            if refused:
+                # only the first refused lock is requested and queued, the operation is retried
+                # when it is released
+                vid = vids[0] if refused == [SITE_LOCK] else refused[0]
+                trans_sites.add(site.sid)
+                site.lock_manager.acquire_write_lock(tid, vid)
+                self.wait_holders.update(site.lock_manager.get_blockers(tid, vid, LockType.WRITE))
+                self.sink.table(["Transaction wait because of lock conflict"], [[tid]])
                 return False
-        else:
-            locked_sites = []
-            for site in self.sites:
-                # check site status and append it to locked sites
-                if site.status == SiteStatus.UP:
-                    if site.lock_manager.acquire_write_lock(tid, vid):
-                        locked_sites.append(site)
-                        rows = [[f"{site.sid}"]]
-                        header = ["Sites affected by a write"]
-                        print_table(header, rows)
 
-                    # release all locks added previously if it is conflicted
-                    else:
-                        for locked_site in locked_sites:
-                            locked_site.lock_manager.release_lock(tid, vid)
-                        print_table(["Transaction wait because of lock conflict"], [[tid]])
-                        return False
-            # Execute write operation
-            if locked_sites:
-                for locked_site in locked_sites:
-                    logs = locked_site.data_manager.uncommitted_log.get(tid, {})
-                    logs[vid] = value
-                    locked_site.data_manager.uncommitted_log[tid] = logs
-                return True
-
-            # retry later if not available list now
-            print_result(["Transaction waits because of a site down"], [["T" + str(tid)]])
-            return False
+        trans_sites.update(site_vids)
+        for site, vids in site_vids.values():
+            for vid in vids:
+                site.lock_manager.acquire_write_lock(tid, vid)
+        trans = self.transactions[tid]
+        for vid, up_sids in var_up_sids.items():
+            trans.add_write(vid, writes[vid], up_sids)
+            self.sink.table(["Sites affected by a write"], [[f"{sid}"] for sid in up_sids])
+        return True
 
     def execute_dump(self):
         rows = [site.print_all_sites() for site in self.sites]
-        print_table(TABLE_HEADERS, rows)
+        self.sink.table(self.topology.table_headers(), rows)
+        return True
+
+    def execute_stats(self):
+        """
+        Output the counters and the histograms of the metrics collected so far
+
+        :return: True
+        """
+        if not self.metrics.enabled:
+            self.sink.message("Metrics are disabled")
+            return True
+        snapshot = self.metrics.snapshot()
+        counters = snapshot["counters"]
+        counters["transactions.running"] = len(self.transactions)
+        counters["waiting.operations"] = len(self.waiting_list)
+        self.sink.table(["Metric", "Value"], [[name, value] for name, value in counters.items()])
+        rows = [[name, h["count"]] + [round(h[key], 2) for key in ("mean", "min", "p50", "p99", "max")]
+                for name, h in snapshot["histograms"].items()]
+        self.sink.table(["Metric", "Count", "Mean", "Min", "p50", "p99", "Max"], rows)
         return True
 
     def execute_fail(self, operation):
@@ -270,12 +479,22 @@ class TransactionManager:
         trans = site.lock_manager.get_all_transactions()
         for tid in trans:
             self.transactions[tid].set_trans_status(TransactionStatus.ABORTED)
-        site.fail()
+            # the writes not committed are lost with the site
+            self.transactions[tid].lose_writes(site.sid)
+            # a blocked end operation can abort now
+            self.waiting_list.wake(trans_key(tid))
+        site.fail(self.tick)
+        self.update_site_index(site)
         return True
 
     def execute_recover(self, operation):
         site = self.sites[operation.get_sid() - 1]
-        site.recover()
+        site.recover(self.tick)
+        self.update_site_index(site)
+        if site.data_manager.log is not None:
+            # the versions rebuilt from the log include the ones collected before the failure
+            site.data_manager.collect_garbage(self.get_watermark())
+        self.waiting_list.wake(site_key(site.sid))
         return True
 
     def execute_end(self, operation, is_retry=False):
@@ -283,7 +502,6 @@ class TransactionManager:
             self.save_to_transaction(operation)
 
         tid = operation.get_tid()
-        trans_start_time = self.transactions[tid].time_stamp
 
         # Two situation need to abort commit operation
 
@@ -292,85 +510,104 @@ class TransactionManager:
         # and then abort only at its commit time (unless T is aborted earlier due to
         # deadlock).
         if self.transactions[tid].transaction_status == TransactionStatus.ABORTED:
-            self.abort(tid)
+            self.abort(tid, AbortType.SITE_FAILURE)
             return True
 
         # 2. If there are blocked operation of the commit transaction, block the commit
         if tid in self.waiting_trans:
+            self.wait_keys.append(trans_key(tid))
             return False
-        # IOUtils.print_commit_result(tid)
-        print(f"Transaction {tid} commit")
-        # execute commit operation
-        for site in self.sites:
+        self.commit(tid)
+        return True
+
+    def commit(self, tid):
+        """
+        Commit a transaction whose operations are all done, its writes are applied at the up sites
+        it wrote at and its locks are released
+
+        :param tid: transaction id
+        :return: None
+        """
+        self.active_read_only.pop(tid, None)
+        watermark = self.get_watermark()
+        site_index = self.site_index
+        trans = self.transactions[tid]
+        site_writes = trans.get_site_writes()
+        # execute commit operation at the sites the transaction locked or wrote at
+        for sid in sorted(trans.sites):
+            site = self.sites[sid - 1]
             if site.status == SiteStatus.UP:
-                if tid in site.data_manager.uncommitted_log:
-                    logs = site.data_manager.uncommitted_log[tid]
-                    for vid, val in logs.items():
-                        site.data_manager.set_variable(vid, val)
-                        site.data_manager.set_available(vid, True)
-                    # committed, delete it from uncommitted_log
-                    site.data_manager.uncommitted_log.pop(tid)
-                # when readonly transaction end, delete the snapshot belongs to it
-                elif trans_start_time in site.snapshots:
-                    site.snapshots.pop(trans_start_time)
+                writes = site_writes.get(sid)
+                if writes:
+                    site.data_manager.commit_writes(writes, self.tick)
+                    for vid in writes:
+                        self.waiting_list.wake(lock_key(vid, LockType.READ))
+                        # the first commit after a recovery makes a replicated variable readable
+                        entry = site_index.get(vid)
+                        if entry is not None and sid in entry[2]:
+                            entry[2].discard(sid)
+                            insort(entry[1], sid)
+                    # drop the versions of the written variables no read-only transaction can read
+                    site.data_manager.collect_garbage(watermark, writes.keys())
                 # release all locks by this committed transaction
                 site.lock_manager.release_locks_by_trans(tid)
 
-        if tid in self.waiting_trans:
-            self.transactions.pop(tid)
+        # reported once its writes are logged
+        self.sink.message(f"Transaction {tid} commit")
+        self.metrics.incr("commits")
+        # a finished transaction is not kept, memory does not grow with the length of the trace
+        self.transactions.pop(tid)
         # When transaction commit, we need to remove the transaction in the wait for graph
         self.wait_for_graph.remove_transaction(tid)
 
-        return True
+    def get_watermark(self):
+        """
+        Get the begin time of the oldest active read-only transaction, versions committed before
+        it are only needed up to the last one
 
-    def generate_site_list(self, vid):
+        :return: time stamp
         """
-        check variable status and return site list
-        :param vid: variable id
-        :return: List
+        for time_stamp in self.active_read_only.values():
+            return time_stamp
+        return self.tick
+
+    def collect_garbage(self):
         """
-        site_list = []
+        Drop the unreachable versions of every variable on every site
 
-        if vid % 2 == 1:
-            # non-replicated var find the only site
-            site_list.append(self.sites[vid % num_sites])
-        else:
-            site_list.extend(self.sites)
+        :return: number of versions dropped
+        """
+        watermark = self.get_watermark()
+        return sum(site.data_manager.collect_garbage(watermark) for site in self.sites)
+
+    def get_gc_stats(self):
+        """
+        Get the version garbage collection statistics of all sites
 
-        return site_list
+        :return: dict
+        """
+        stats = {"watermark": self.get_watermark(), "versions_reclaimed": 0, "versions_live": 0}
+        for site in self.sites:
+            for key, value in site.data_manager.get_gc_stats().items():
+                stats[key] += value
+        return stats
 
     def save_to_transaction(self, operation):
         tid = operation.get_tid()
         if tid not in self.transactions:
-            raise KeyError(f"Try to execute {operation.get_type()} in a non-existing transaction")
+            raise KeyError(f"Try to execute {OperationType(operation.get_type()).name} in a non-existing transaction")
 
         self.transactions[tid].add_operation(operation)
-        self.wait_for_graph.add_operation(operation)
 
 
     def read_variable(self, tid, vid, site):
-        if tid in site.data_manager.uncommitted_log \
-                and vid in site.data_manager.uncommitted_log[tid]:
-            res = site.data_manager.uncommitted_log[tid][vid].get_value()
-        else:
-            res = site.data_manager.get_variable(vid).get_value()
+        # a transaction reads its own writes
+        res = self.transactions[tid].read_own_write(vid, site.sid)
+        if res is None:
+            res = site.data_manager.read(vid)
 
-        print("Read variable as follows:")
-        print_table(["Transaction", "Site", f"x{vid}"], [[tid, f"{site.sid}", res]])
+        self.sink.message("Read variable as follows:")
+        self.sink.table(["Transaction", "Site", f"x{vid}"], [[tid, f"{site.sid}", res]])
 
         return True
 
-
-def print_table(headers, rows):
-    """
-    Print the query result using pretty table, only for dump operation now
-
-    :param headers: table headers
-    :param rows: table rows
-    :return: None
-    """
-    table = PrettyTable()
-    table.field_names = headers
-    for row in rows:
-        table.add_row(row)
-    print(table)
@@ -0,0 +1,226 @@
+from collections import OrderedDict
+from heapq import heappush, heappop
+from src.CustomizedConf import OperationType
+
+
+def lock_key(vid, lock_type):
+    """
+    Resource key of an operation waiting for a lock of lock_type on vid
+    """
+    return "lock", vid, lock_type
+
+
+def site_key(sid):
+    """
+    Resource key of an operation waiting for site sid to recover
+    """
+    return "site", sid
+
+
+def trans_key(tid):
+    """
+    Resource key of an end operation waiting for the other operations of tid
+    """
+    return "trans", tid
+
+
+class WaitEntry:
+    """
+    A blocked operation together with the resources and the transactions it is waiting on
+    """
+    def __init__(self, seq, operation):
+        self.seq = seq
+        self.operation = operation
+        self.keys = ()
+        self.holders = ()
+
+
+class WaitQueue:
+    """
+    A FIFO queue of blocked operations indexed by the resource each of them waits on.
+
+    Instead of retrying every blocked operation before each new operation, an operation is
+    only retried after one of its resources is woken up. Woken operations are retried in
+    arrival order, so the FIFO order of the original full rescan is kept. The wait-for edges
+    of the blocked operations are kept in sync with the queue.
+
+    :param self.entries: blocked operations ordered by arrival
+    :param self.index: resource key -> sequence numbers of the operations waiting on it
+    :param self.ready: heap of sequence numbers woken up and waiting to be retried
+    :param self.trans_entries: tid -> sequence numbers of its blocked operations
+    :param self.blocked_count: tid -> number of blocked non-end operations
+    :param self.changed_trans: tids whose blocked_count changed since the last retry pass
+    :param self.wait_for_graph: DeadLockDetector receiving the wait-for edges
+    """
+
+    def __init__(self, wait_for_graph):
+        self.wait_for_graph = wait_for_graph
+        self.next_seq = 0
+        self.entries = OrderedDict()
+        self.index = {}
+        self.ready = []
+        self.ready_set = set()
+        self.trans_entries = {}
+        self.blocked_count = {}
+        self.changed_trans = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return (entry.operation for entry in self.entries.values())
+
+    def add(self, operation, keys, holders=()):
+        """
+        Queue a new blocked operation at the tail
+
+        :param operation: the blocked operation
+        :param keys: resources the operation waits on
+        :param holders: tids holding the locks the operation waits on
+        :return: None
+        """
+        entry = WaitEntry(self.next_seq, operation)
+        self.next_seq += 1
+        self.entries[entry.seq] = entry
+        self.trans_entries.setdefault(operation.get_tid(), set()).add(entry.seq)
+        if operation.get_type() != OperationType.END:
+            self.update_count(operation.get_tid(), 1)
+        self.block(entry, keys, holders)
+
+    def block(self, entry, keys, holders=()):
+        """
+        Index an entry under the resources it waits on, it keeps its position in the queue
+
+        :param entry: wait entry
+        :param keys: resources the operation waits on
+        :param holders: tids holding the locks the operation waits on
+        :return: None
+        """
+        tid = entry.operation.get_tid()
+        self.wait_for_graph.remove_wait(tid, entry.holders)
+        entry.holders = tuple(holders)
+        self.wait_for_graph.add_wait(tid, entry.holders)
+
+        entry.keys = tuple(keys)
+        for key in entry.keys:
+            waiters = self.index.get(key)
+            if waiters is None:
+                waiters = self.index[key] = OrderedDict()
+            waiters[entry.seq] = None
+
+    def unindex(self, entry):
+        for key in entry.keys:
+            waiters = self.index.get(key)
+            if waiters is not None:
+                waiters.pop(entry.seq, None)
+                if not waiters:
+                    del self.index[key]
+        entry.keys = ()
+
+    def wake(self, key):
+        """
+        Mark every operation waiting on key as ready to be retried
+
+        :param key: resource key
+        :return: None
+        """
+        waiters = self.index.get(key)
+        if not waiters:
+            return
+        for seq in list(waiters):
+            entry = self.entries[seq]
+            self.unindex(entry)
+            if seq not in self.ready_set:
+                self.ready_set.add(seq)
+                heappush(self.ready, seq)
+
+    def drain_ready(self):
+        """
+        Yield woken entries in arrival order for one retry pass.
+
+        An entry woken during the pass is retried in the same pass if it arrived after the
+        entry being retried, otherwise it is kept for the next pass, as a full rescan would do.
+
+        :return: generator of WaitEntry
+        """
+        deferred = []
+        last_seq = -1
+        while self.ready:
+            seq = heappop(self.ready)
+            if seq not in self.entries:
+                self.ready_set.discard(seq)
+                continue
+            if seq < last_seq:
+                deferred.append(seq)
+                continue
+            self.ready_set.discard(seq)
+            last_seq = seq
+            yield self.entries[seq]
+
+        for seq in deferred:
+            heappush(self.ready, seq)
+
+    def remove(self, entry):
+        """
+        Remove an entry from the queue, e.g. after its operation succeeded
+
+        :param entry: wait entry
+        :return: None
+        """
+        if entry.seq not in self.entries:
+            return
+        self.unindex(entry)
+        del self.entries[entry.seq]
+        self.wait_for_graph.remove_wait(entry.operation.get_tid(), entry.holders)
+        self.ready_set.discard(entry.seq)
+        operation = entry.operation
+        seqs = self.trans_entries[operation.get_tid()]
+        seqs.discard(entry.seq)
+        if not seqs:
+            del self.trans_entries[operation.get_tid()]
+        if operation.get_type() != OperationType.END:
+            self.update_count(operation.get_tid(), -1)
+
+    def pop_first(self):
+        """
+        Remove and return the oldest blocked operation
+
+        :return: Operation
+        """
+        entry = next(iter(self.entries.values()))
+        self.remove(entry)
+        return entry.operation
+
+    def remove_transaction(self, tid):
+        """
+        Remove every blocked operation of tid
+
+        :param tid: transaction id
+        :return: None
+        """
+        for seq in sorted(self.trans_entries.get(tid, ())):
+            self.remove(self.entries[seq])
+
+    def get_operations(self, tid):
+        """
+        Get the blocked operations of tid in arrival order
+
+        :param tid: transaction id
+        :return: list of Operation
+        """
+        return [self.entries[seq].operation for seq in sorted(self.trans_entries.get(tid, ()))]
+
+    def update_count(self, tid, delta):
+        self.blocked_count[tid] = self.blocked_count.get(tid, 0) + delta
+        if self.blocked_count[tid] == 0:
+            del self.blocked_count[tid]
+        self.changed_trans.add(tid)
+
+    def collect_changed_trans(self):
+        """
+        Return the tids whose blocked operations changed since the last call
+
+        :return: set
+        """
+        changed, self.changed_trans = self.changed_trans, set()
+        return changed
@@ -1,8 +1,20 @@
+from bisect import bisect_right
+
+
 class DataCopy:
+    """
+    A copy of a variable at a site together with its committed versions
+
+    :param self.commit_times: commit times of the versions in ascending order
+    :param self.commit_values: committed values, commit_values[i] was committed at commit_times[i]
+    """
+    __slots__ = ("data_type", "read_available", "commit_times", "commit_values", "value")
+
     def __init__(self, data_type, initial_value):
         self.data_type = data_type
         self.read_available = True
-        self.commit_history = {-1: initial_value}
+        self.commit_times = [-1]
+        self.commit_values = [initial_value]
         self.value = initial_value
 
     def is_read_available(self):
@@ -15,20 +27,47 @@ class DataCopy:
         return self.data_type
 
     def add_commit_history(self, time, value):
-        self.commit_history[time] = value
+        """
+        Append a version, commits happen in time order so the versions stay sorted
+        """
+        self.commit_times.append(time)
+        self.commit_values.append(value)
+
+    def get_version_at(self, time):
+        """
+        Find the last version committed at or before time
+
+        :param time: time stamp
+        :return: (commit time, value), or None if there is no such version
+        """
+        idx = bisect_right(self.commit_times, time) - 1
+        if idx < 0:
+            return None
+        return self.commit_times[idx], self.commit_values[idx]
 
     def get_latest_commit(self):
-        v = max(self.commit_history, key=self.commit_history.get)
-        return v
+        return self.commit_values[-1]
+
+    def prune(self, watermark):
+        """
+        Drop the versions no reader at or after watermark can see, the last version committed
+        at or before watermark is kept
 
-    def get_commit_history(self):
-        return self.commit_history
+        :param watermark: begin time of the oldest active read-only transaction
+        :return: number of versions dropped
+        """
+        idx = bisect_right(self.commit_times, watermark) - 1
+        if idx <= 0:
+            return 0
+        del self.commit_times[:idx]
+        del self.commit_values[:idx]
+        return idx
 
-    def clear_commit_history(self):
-        self.commit_history = {}
+    def count_versions(self):
+        return len(self.commit_times)
 
     def get_value(self):
         return self.value
 
     def set_value(self, value):
-        self.value = value
\ No newline at end of file
+        self.value = value
@@ -1,13 +1,22 @@
-import re
-
 class Operation:
-    def __init__(self, operation_type, tid, vid, value, sid, time):
-        self.operation_type = operation_type
+    """
+    One command of the input, stored in slots to keep large traces compact
+
+    :param self.operation_type: OperationType as a plain int
+    :param self.time: tick of the operation, also its index in the trace
+    :param self.writes: ((vid, value), ...) of a write of several variables, None for one variable,
+                        vid and value are the first pair
+    """
+    __slots__ = ("operation_type", "tid", "vid", "value", "sid", "time", "writes")
+
+    def __init__(self, operation_type, tid, vid, value, sid, time, writes=None):
+        self.operation_type = int(operation_type)
         self.tid = tid
         self.vid = vid
         self.value = value
         self.sid = sid
         self.time = time
+        self.writes = writes
 
     def get_type(self):
         return self.operation_type
@@ -24,8 +33,24 @@ class Operation:
     def get_value(self):
         return self.value
 
+    def get_writes(self):
+        """
+        Get the (vid, value) pairs written by the operation
+        """
+        if self.writes is not None:
+            return self.writes
+        return ((self.vid, self.value),)
+
+    def get_vids(self):
+        """
+        Get the variables the operation reads or writes
+        """
+        if self.writes is not None:
+            return [vid for vid, _ in self.writes]
+        return () if self.vid is None else (self.vid,)
+
     def get_time(self):
         return self.time
 
     def set_time(self, time):
-        self.time = time
\ No newline at end of file
+        self.time = time
@@ -1,50 +1,70 @@
+from bisect import bisect_right
 from src.manager.LockManager import LockManager
 from src.manager.DataManager import DataManager
+from src.model.Topology import Topology
 from src.CustomizedConf import SiteStatus
+from src.utils.Metrics import NULL_METRICS
 
 
 class Site:
-    def __init__(self, sid):
+    """
+    A class to represent site
+
+    :param self.fail_times: times the site failed, in ascending order
+    :param self.recover_times: times the site recovered, in ascending order
+    """
+    def __init__(self, sid, topology=None, metrics=NULL_METRICS, log_config=None, fair_locks=True):
         self.sid = sid
-        self.data_manager = DataManager(sid)
-        self.lock_manager = LockManager()
+        log = log_config.open(sid, metrics) if log_config is not None else None
+        self.data_manager = DataManager(sid, topology if topology is not None else Topology(), metrics, log)
+        self.lock_manager = LockManager(metrics, fair_locks)
         self.status = SiteStatus.UP
-        self.snapshots = {}
+        self.fail_times = []
+        self.recover_times = []
 
     def get_status(self):
         return self.status
 
-    def recover(self):
+    def recover(self, time=None):
         self.status = SiteStatus.UP
+        self.recover_times.append(time)
         self.data_manager.recover()
 
-    def fail(self):
+    def fail(self, time=None):
         self.status = SiteStatus.DOWN
+        self.fail_times.append(time)
         self.lock_manager.fail()
         self.data_manager.fail()
 
-    def get_snapshot(self, time_stamp):
-        new_data = {}
-        for i, data in enumerate(self.data_manager.data.values()):
-            if data and self.data_manager.is_available(i + 1):
-                new_data[i + 1] = data.get_value()
+    def close(self):
+        self.data_manager.close()
+
+    def is_up_between(self, start, end):
+        """
+        Check the site did not fail in the interval (start, end]
+
+        :param start: time stamp
+        :param end: time stamp
+        :return: Boolean
+        """
+        idx = bisect_right(self.fail_times, start)
+        return idx == len(self.fail_times) or self.fail_times[idx] > end
 
-        self.snapshots[time_stamp] = deepcopy(new_data)
+    def read_version(self, vid, time_stamp):
+        """
+        Read the version of vid a read-only transaction began at time_stamp can see at this site,
+        the version must be committed before time_stamp and the site must be up since the commit
 
-    def get_snapshot_variable(self, time_stamp, vid):
-        return self.snapshots[time_stamp][vid]
+        :param vid: variable id
+        :param time_stamp: begin time of the read-only transaction
+        :return: (commit time, value), or None if the site can not serve the read
+        """
+        version = self.data_manager.read_at(vid, time_stamp)
+        if version is None or not self.is_up_between(version[0], time_stamp):
+            return None
+        return version
 
     def print_all_sites(self):
         col_title = f"Site {self.sid} ({SiteStatus.UP.name if self.status == SiteStatus.UP else SiteStatus.DOWN.name})"
-        return [col_title] + [val.get_value() for val in self.data_manager.data.values()]
-
-
-def deepcopy(obj):
-    if isinstance(obj, dict):
-        return {k: deepcopy(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [deepcopy(item) for item in obj]
-    elif isinstance(obj, tuple):
-        return tuple([deepcopy(item) for item in obj])
-    else:
-        return obj
\ No newline at end of file
+        num_variables = self.data_manager.topology.num_variables
+        return [col_title] + [self.data_manager.get_value(vid) for vid in range(1, num_variables + 1)]
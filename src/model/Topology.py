@@ -0,0 +1,120 @@
+import json
+from src.CustomizedConf import num_distinct_variables, num_sites, DataType, OperationType
+
+
+def default_placement(vid, num_sites):
+    """
+    Even variables are replicated at all sites, odd variables are at site 1 + (vid mod num_sites)
+
+    :param vid: variable id
+    :param num_sites: number of sites
+    :return: list of site ids
+    """
+    if vid % 2 == 0:
+        return list(range(1, num_sites + 1))
+    return [vid % num_sites + 1]
+
+
+class TopologyError(ValueError):
+    """
+    An operation names a variable or a site that is not in the topology
+    """
+    pass
+
+
+class Topology:
+    """
+    The variables, the sites and where the copies of each variable are placed.
+
+    The placement is either a callable (vid, num_sites) -> site ids or a dict vid -> site ids,
+    variables missing from the dict use default_placement. It is resolved once into the
+    vid -> site ids and site id -> vids indexes.
+
+    :param self.num_variables: number of variables, x1 to xN
+    :param self.num_sites: number of sites, 1 to M
+    :param self.var_sites: vid -> tuple of ids of the sites holding a copy
+    :param self.site_vars: site id -> tuple of vids it holds
+    """
+
+    def __init__(self, num_variables=num_distinct_variables, num_sites=num_sites, placement=None):
+        self.num_variables = num_variables
+        self.num_sites = num_sites
+        self.var_sites = {}
+        self.site_vars = {sid: [] for sid in range(1, num_sites + 1)}
+
+        for vid in range(1, num_variables + 1):
+            if callable(placement):
+                sids = placement(vid, num_sites)
+            elif placement is not None and vid in placement:
+                sids = placement[vid]
+            else:
+                sids = default_placement(vid, num_sites)
+            sids = tuple(sorted(set(sids)))
+            if not sids or sids[0] < 1 or sids[-1] > num_sites:
+                raise ValueError(f"x{vid} must be placed at sites between 1 and {num_sites}, got {list(sids)}")
+            self.var_sites[vid] = sids
+            for sid in sids:
+                self.site_vars[sid].append(vid)
+
+        self.site_vars = {sid: tuple(vids) for sid, vids in self.site_vars.items()}
+
+    @classmethod
+    def from_file(cls, file_name):
+        """
+        Load a topology from a JSON file like {"variables": 20, "sites": 10, "placement": {"1": [2]}}
+
+        :param file_name: path of the config file
+        :return: Topology
+        """
+        with open(file_name, 'r') as f:
+            config = json.load(f)
+        placement = config.get("placement")
+        if placement is not None:
+            placement = {int(vid.lstrip("x")): sids for vid, sids in placement.items()}
+        return cls(config.get("variables", num_distinct_variables), config.get("sites", num_sites), placement)
+
+    def check_operation(self, operation):
+        """
+        Find the variable or the site of an operation that is not in the topology
+
+        :param operation: Operation
+        :return: error message, None if every id of the operation is known
+        """
+        num_variables = self.num_variables
+        for vid in operation.get_vids():
+            if not 1 <= vid <= num_variables:
+                return f"unknown variable x{vid}, the variables are x1 to x{num_variables}"
+        sid = operation.get_sid()
+        if sid is not None and not 1 <= sid <= self.num_sites:
+            return f"unknown site {sid}, the sites are 1 to {self.num_sites}"
+        return None
+
+    def validate_operation(self, operation):
+        """
+        Raise a TopologyError naming the operation if it has an id that is not in the topology
+
+        :param operation: Operation
+        :return: None
+        """
+        error = self.check_operation(operation)
+        if error is not None:
+            name = OperationType(operation.get_type()).name
+            raise TopologyError(f"{name} at tick {operation.get_time()}: {error}")
+
+    def get_sites(self, vid):
+        return self.var_sites[vid]
+
+    def get_variables(self, sid):
+        return self.site_vars[sid]
+
+    def is_replicated(self, vid):
+        return len(self.var_sites[vid]) > 1
+
+    def get_data_type(self, vid):
+        return DataType.REPLICATED if self.is_replicated(vid) else DataType.NONREPLICATED
+
+    def initial_value(self, vid):
+        return 10 * vid
+
+    def table_headers(self):
+        return ["Site"] + [f"x{i}" for i in range(1, self.num_variables + 1)]
@@ -1,16 +1,28 @@
+from array import array
 from src.CustomizedConf import TransactionStatus, TransactionType
 
 
 class Transaction:
     """
        A class to represent transaction
+
+       :param self.operations: ticks of the operations executed by the transaction
+       :param self.sites: ids of the sites the transaction requested locks or wrote at
+       :param self.writes: write set, vid -> value written, applied at the end when the transaction commits
+       :param self.write_sites: vid -> tuple of the ids of the sites the value written is applied at
     """
+    __slots__ = ("tid", "time_stamp", "transaction_type", "transaction_status", "operations", "sites",
+                 "writes", "write_sites")
+
     def __init__(self, tid, time_stamp):
         self.tid = tid
         self.time_stamp = time_stamp
         self.transaction_type = TransactionType.RW
         self.transaction_status = TransactionStatus.ACTIVE
-        self.operations = []
+        self.operations = array('q')
+        self.sites = set()
+        self.writes = {}
+        self.write_sites = {}
 
     def is_read_only(self):
         return self.transaction_type == TransactionType.RO
@@ -22,4 +34,57 @@ class Transaction:
         self.transaction_status = trans_status
 
     def add_operation(self, operation):
-        self.operations.append(operation)
+        self.operations.append(operation.get_time())
+
+    def add_write(self, vid, value, sids):
+        """
+        Add a write to the write set, a later write of vid replaces it
+
+        :param vid: variable id
+        :param value: value written
+        :param sids: tuple of the ids of the up sites holding vid, kept without a copy
+        :return: None
+        """
+        self.writes[vid] = value
+        self.write_sites[vid] = sids
+
+    def read_own_write(self, vid, sid):
+        """
+        Get the value the transaction wrote to vid at a site
+
+        :param vid: variable id
+        :param sid: site id
+        :return: value, None if the transaction did not write vid at the site
+        """
+        value = self.writes.get(vid)
+        # the writes of an active transaction are at every site it wrote at, a failure of one of
+        # them would have aborted it
+        if value is None or self.transaction_status == TransactionStatus.ACTIVE:
+            return value
+        return value if sid in self.write_sites[vid] else None
+
+    def lose_writes(self, sid):
+        """
+        Forget the writes applied at a site that failed
+
+        :param sid: site id
+        :return: None
+        """
+        write_sites = self.write_sites
+        for vid, sids in write_sites.items():
+            if sid in sids:
+                write_sites[vid] = tuple(other for other in sids if other != sid)
+
+    def get_site_writes(self):
+        """
+        Fan the write set out to the sites it is applied at
+
+        :return: sid -> {vid: value}
+        """
+        site_writes = {}
+        writes = self.writes
+        for vid, sids in self.write_sites.items():
+            value = writes[vid]
+            for sid in sids:
+                site_writes.setdefault(sid, {})[vid] = value
+        return site_writes
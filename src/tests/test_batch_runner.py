@@ -0,0 +1,32 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.utils.BatchRunner import run_batch
+
+
+class BatchRunnerTest(unittest.TestCase):
+
+    def test_failing_trace_does_not_stop_the_batch(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        inputs, outputs = os.path.join(directory.name, "in"), os.path.join(directory.name, "out")
+        os.makedirs(inputs)
+        with open(os.path.join(inputs, "bad.txt"), "w") as f:
+            f.write("begin(T1)\nR(T9, x2)\n")
+        with open(os.path.join(inputs, "good.txt"), "w") as f:
+            f.write("begin(T1)\nW(T1, x2, 5)\nend(T1)\n")
+
+        for workers in (1, 2):
+            results = run_batch(inputs, outputs, workers=workers)
+            self.assertEqual([result["status"] for result in results], ["error", "ok"])
+            self.assertIn("non-existing transaction", results[0]["error"])
+            with open(os.path.join(outputs, "good.out")) as f:
+                self.assertIn("Transaction 1 commit", f.read())
+            with open(os.path.join(outputs, "timings.json")) as f:
+                self.assertEqual(json.load(f)["files"], results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from src.manager.LogManager import LogConfig
+
+
+class LogManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_record_is_on_disk_when_appended(self):
+        log = LogConfig(self.directory.name).open(1)
+        log.append(3, {2: 20})
+        self.assertGreater(os.path.getsize(log.log_path), 0)
+        log.close()
+
+    def test_values_beyond_64_bits_are_replayed(self):
+        log = LogConfig(self.directory.name, group_size=4).open(1)
+        log.append(3, {2: 2 ** 70, 4: -2 ** 63 - 1})
+        log.append(5, {2: -1, 6: 0})
+        log.close()
+        checkpoint, commits = LogConfig(self.directory.name).open(1).replay()
+        self.assertIsNone(checkpoint)
+        self.assertEqual(commits, [(1, 3, {2: 2 ** 70, 4: -2 ** 63 - 1}), (2, 5, {2: -1, 6: 0})])
+
+    def test_checkpoint_of_values_beyond_64_bits(self):
+        log = LogConfig(self.directory.name).open(1)
+        checkpoint = log.checkpoint([(2, True, [0, 3], [20, 2 ** 70]), (4, False, [0], [-5])])
+        self.assertEqual(checkpoint.get_value(2), 2 ** 70)
+        self.assertEqual(checkpoint.get_versions(2), ([0, 3], [20, 2 ** 70]))
+        self.assertEqual(checkpoint.get_versions(4), ([0], [-5]))
+        self.assertEqual((checkpoint.is_available(2), checkpoint.is_available(4)), (True, False))
+        checkpoint.close()
+        log.close()
+
+
+
+if __name__ == "__main__":
+    unittest.main()
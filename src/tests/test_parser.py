@@ -0,0 +1,43 @@
+import unittest
+
+from src.CustomizedConf import OperationType
+from src.utils.Parser import ParseError, parse_command
+
+
+class ParserTest(unittest.TestCase):
+
+    def assertErrorAt(self, line, column, message):
+        with self.assertRaises(ParseError) as context:
+            parse_command(line, 1, 3)
+        self.assertEqual((context.exception.line, context.exception.column), (3, column))
+        self.assertEqual(context.exception.message, message)
+
+    def test_parse_write(self):
+        operation = parse_command("W(T1, x2, -5) // comment", 7)
+        self.assertEqual((operation.get_type(), operation.get_tid(), operation.get_vid(), operation.get_value()),
+                         (OperationType.WRITE, 1, 2, -5))
+
+    def test_blank_and_comment_lines(self):
+        self.assertIsNone(parse_command("", 1))
+        self.assertIsNone(parse_command("  // comment\n", 1))
+
+    def test_unexpected_argument_column(self):
+        self.assertErrorAt("fail(T1)", 6, "unexpected argument in fail")
+        self.assertErrorAt("recover( T2 )", 10, "unexpected argument in recover")
+        self.assertErrorAt("begin(T1, x2)", 11, "unexpected argument in begin")
+
+    def test_other_error_columns(self):
+        self.assertErrorAt("foo(T1)", 1, "unknown command 'foo'")
+        self.assertErrorAt("R(T1, x2", 9, "expected ')' in R")
+        self.assertErrorAt("W(T1, x2)", 9, "W expects an integer value")
+
+    def test_missing_id_column(self):
+        self.assertErrorAt("R(T1,x)", 6, "variable id expected after 'x'")
+        self.assertErrorAt("R(T1, xa)", 7, "variable id expected after 'x'")
+        self.assertErrorAt("W(T1, x2, 5, x, 6)", 14, "variable id expected after 'x'")
+        self.assertErrorAt("R(T, x2)", 3, "transaction id expected after 'T'")
+        self.assertErrorAt("end( T )", 6, "transaction id expected after 'T'")
+
+
+if __name__ == "__main__":
+    unittest.main()
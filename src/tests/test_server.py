@@ -0,0 +1,71 @@
+import asyncio
+import json
+import unittest
+
+from src.utils.Server import OperationServer
+
+
+async def request(reader, writer, line):
+    """
+    Send one line and return the responses up to its final status
+    """
+    writer.write((line + "\n").encode())
+    return await read_status(reader)
+
+
+async def read_status(reader):
+    responses = []
+    while True:
+        response = json.loads(await asyncio.wait_for(reader.readline(), 5))
+        responses.append(response)
+        if response.get("status") not in (None, "blocked"):
+            return responses
+
+
+class ServerTest(unittest.TestCase):
+
+    def run_server(self, client):
+        async def main():
+            server = OperationServer()
+            listener = await server.start_tcp("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                await client(server, port)
+                await server.wait_connections()
+        asyncio.run(main())
+
+    def test_unknown_ids_answer_an_error(self):
+        async def client(server, port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            # pipelined, the requests behind the bad ones still get their answers
+            writer.write(b"begin(T1)\nR(T1, x99)\nfail(12)\nR(T5, x2)\nR(T1, x2)\n")
+            responses = []
+            while responses[-1:] != [{"id": 5, "status": "done"}]:
+                responses.append(json.loads(await asyncio.wait_for(reader.readline(), 5)))
+            statuses = {response["id"]: response["status"] for response in responses if "status" in response}
+            self.assertEqual(statuses, {1: "done", 2: "error", 3: "error", 4: "error", 5: "done"})
+            self.assertIn("x99", next(response["error"] for response in responses if response["id"] == 2))
+            writer.close()
+        self.run_server(client)
+
+    def test_disconnect_aborts_open_transactions(self):
+        async def client(server, port):
+            reader1, writer1 = await asyncio.open_connection("127.0.0.1", port)
+            reader2, writer2 = await asyncio.open_connection("127.0.0.1", port)
+            await request(reader1, writer1, "begin(T1)")
+            await request(reader1, writer1, "W(T1, x2, 5)")
+            await request(reader2, writer2, "begin(T2)")
+            writer2.write(b"R(T2, x2)\n")
+            self.assertEqual(json.loads(await asyncio.wait_for(reader2.readline(), 5))["status"], "blocked")
+            # the lock of T1 is released when its client goes away
+            writer1.close()
+            responses = await read_status(reader2)
+            self.assertEqual(responses[-1], {"id": 2, "status": "done"})
+            self.assertEqual(responses[1]["rows"][0][-1], 20)
+            self.assertNotIn(1, server.transaction_manager.transactions)
+            writer2.close()
+        self.run_server(client)
+
+
+if __name__ == "__main__":
+    unittest.main()
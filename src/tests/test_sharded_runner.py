@@ -0,0 +1,89 @@
+import io
+import unittest
+
+from src.model.Topology import TopologyError
+from src.utils.FileRunner import run
+from src.utils.OutputSink import TextSink
+from src.utils.Parser import parse_command
+from src.utils.ShardedRunner import run_sharded
+
+# x2 is in the first of two shards and x12 in the second one, T3 gives the end of T1 the ticks to
+# be retried after the abort of T2 at the end of an epoch
+SPANNING_DEADLOCK = """
+    begin(T1)
+    begin(T2)
+    W(T1, x2, 1)
+    W(T2, x12, 2)
+    W(T1, x12, 3)
+    W(T2, x2, 4)
+    end(T1)
+    end(T2)
+    begin(T3)
+    end(T3)
+    dump()
+"""
+
+
+def parse(trace):
+    operations = (parse_command(line, tick) for tick, line in enumerate(trace.strip().splitlines()))
+    return [operation for operation in operations if operation is not None]
+
+
+def run_trace(trace, **kwargs):
+    """
+    Run the lines of a trace, sharded if kwargs are given, and return the text output
+    """
+    stream = io.StringIO()
+    if kwargs:
+        run_sharded(parse(trace), TextSink(stream), **kwargs)
+    else:
+        run(parse(trace), TextSink(stream))
+    return stream.getvalue().splitlines()
+
+
+class ShardedRunnerTest(unittest.TestCase):
+
+    def test_local_transactions_match_serial_run(self):
+        trace = """
+            begin(T1)
+            begin(T2)
+            W(T1, x2, 5)
+            R(T2, x2)
+            W(T2, x14, 7)
+            end(T1)
+            end(T2)
+            dump()
+        """
+        for epoch in (1, 3, 64):
+            self.assertEqual(run_trace(trace, num_shards=2, workers=1, epoch=epoch), run_trace(trace))
+
+    def test_spanning_transaction_commits_in_every_shard(self):
+        output = run_trace("""
+            begin(T1)
+            W(T1, x2, 5, x14, 7)
+            end(T1)
+            dump()
+        """, num_shards=2, workers=1, epoch=8)
+        self.assertEqual(output.count("Transaction 1 commit"), 1)
+        self.assertIn(" x2=5 ", output[-1])
+        self.assertIn(" x14=7 ", output[-1])
+
+    def test_deadlock_across_shards_is_broken(self):
+        for epoch in (1, 4):
+            output = run_trace(SPANNING_DEADLOCK, num_shards=2, workers=1, epoch=epoch)
+            self.assertEqual(output.count("Transaction 2 aborted"), 1)
+            self.assertEqual(output.count("Transaction 1 commit"), 1)
+            self.assertIn(" x2=1 ", output[-1])
+            self.assertIn(" x12=3 ", output[-1])
+
+    def test_unknown_ids_raise(self):
+        for line in ("R(T1, x21)", "fail(11)"):
+            with self.assertRaises(TopologyError):
+                run_trace(f"begin(T1)\n{line}", num_shards=2, workers=1)
+
+    def test_worker_processes(self):
+        self.assertEqual(run_trace(SPANNING_DEADLOCK, num_shards=2, workers=2, epoch=1), run_trace(SPANNING_DEADLOCK))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+from src.model.Topology import Topology
+from src.utils.Parser import parse_command
+from src.utils.TraceRecorder import TraceError, TraceReader, TraceWriter, encode_operation
+
+
+class TraceRecorderTest(unittest.TestCase):
+
+    def test_large_ids_and_ticks_are_recorded(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "run.trace")
+        writer = TraceWriter(path, Topology())
+        operation = parse_command("W(T5000000000, x2, 7, x4, -8)", 2 ** 40)
+        writer.operation(operation)
+        writer.close()
+        recorded = TraceReader(path).operations[0]
+        self.assertEqual((recorded.tid, recorded.time, recorded.get_writes()),
+                         (5000000000, 2 ** 40, ((2, 7), (4, -8))))
+
+    def test_value_out_of_range_raises(self):
+        for line in ("W(T1, x2, 9223372036854775808)", "W(T1, x2, -9223372036854775808)",
+                     "W(T1, x2, 1, x4, 99999999999999999999)"):
+            with self.assertRaisesRegex(TraceError, "can be recorded"):
+                encode_operation(parse_command(line, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import unittest
+
+from src.CustomizedConf import SiteStatus
+from src.manager.OptimisticTransactionManager import OptimisticTransactionManager
+from src.model.Topology import TopologyError
+from src.utils.FileRunner import run
+from src.utils.OutputSink import TextSink
+from src.utils.Parser import parse_command
+
+
+def run_trace(trace):
+    """
+    Run the lines of a trace and return the text output
+    """
+    stream = io.StringIO()
+    operations = (parse_command(line, tick) for tick, line in enumerate(trace.strip().splitlines(), 1))
+    run((operation for operation in operations if operation is not None), TextSink(stream))
+    return stream.getvalue().splitlines()
+
+
+class TransactionManagerTest(unittest.TestCase):
+
+    def test_blocked_read_is_queued_at_one_site(self):
+        transaction_manager = run([], TextSink(io.StringIO()))
+        for tick, line in enumerate(["begin(T1)", "begin(T2)", "W(T1, x2, 5)", "R(T2, x2)"], 1):
+            transaction_manager.execute_operation(parse_command(line, tick))
+        queued = [site.sid for site in transaction_manager.sites if 2 in site.lock_manager.trans_requests]
+        self.assertEqual(queued, [1])
+
+    def test_read_own_write(self):
+        output = run_trace("""
+            begin(T1)
+            W(T1, x2, 5)
+            R(T1, x2)
+            end(T1)
+        """)
+        self.assertIn("Transaction=1 Site=1 x2=5", output)
+        self.assertIn("Transaction 1 commit", output)
+
+    def test_operations_of_aborted_transaction_are_ignored(self):
+        output = run_trace("""
+            begin(T1)
+            begin(T2)
+            R(T2, x2)
+            W(T1, x2, 202)
+            W(T2, x2, 302)
+            R(T2, x4)
+            end(T2)
+            end(T1)
+        """)
+        self.assertIn("Transaction 2 aborted", output)
+        self.assertIn("Transaction 2 is not running, READ ignored", output)
+        self.assertIn("Transaction 2 is not running, END ignored", output)
+        self.assertIn("Transaction 1 commit", output)
+
+    def test_operation_of_unknown_transaction_raises(self):
+        with self.assertRaisesRegex(KeyError, "READ in a non-existing transaction"):
+            run_trace("""
+                begin(T1)
+                R(T2, x2)
+            """)
+
+    def test_operation_after_end_of_aborted_transaction_raises(self):
+        with self.assertRaisesRegex(KeyError, "WRITE in a non-existing transaction"):
+            run_trace("""
+                begin(T1)
+                W(T1, x1, 5)
+                fail(2)
+                end(T1)
+                W(T1, x2, 5)
+            """)
+
+    def test_failed_validation_aborts_like_other_aborts(self):
+        stream = io.StringIO()
+        lines = ["begin(T1)", "begin(T2)", "R(T1, x2)", "W(T2, x2, 5)", "end(T2)", "W(T1, x4, 6)", "end(T1)"]
+        transaction_manager = run((parse_command(line, tick) for tick, line in enumerate(lines, 1)),
+                                  TextSink(stream), manager_class=OptimisticTransactionManager)
+        output = stream.getvalue().splitlines()
+        self.assertIn("Transaction 2 commit", output)
+        self.assertIn("Transaction 1 aborted", output)
+        self.assertEqual((transaction_manager.transactions, transaction_manager.aborted,
+                          transaction_manager.read_sets), ({}, set(), {}))
+
+    def test_unknown_ids_raise(self):
+        for line, message in (("R(T1, x0)", "READ at tick 2: unknown variable x0"),
+                              ("W(T1, x2, 5, x21, 6)", "WRITE at tick 2: unknown variable x21"),
+                              ("fail(0)", "FAIL at tick 2: unknown site 0"),
+                              ("recover(11)", "RECOVER at tick 2: unknown site 11")):
+            with self.assertRaisesRegex(TopologyError, message):
+                run_trace(f"begin(T1)\n{line}")
+
+    def test_failure_of_unknown_site_changes_nothing(self):
+        transaction_manager = run([], TextSink(io.StringIO()))
+        with self.assertRaises(TopologyError):
+            transaction_manager.execute_operation(parse_command("fail(0)", 1))
+        self.assertEqual([site.sid for site in transaction_manager.sites if site.status != SiteStatus.UP], [])
+        self.assertEqual(transaction_manager.tick, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
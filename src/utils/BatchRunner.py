@@ -0,0 +1,81 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.FileRunner import run_by_file
+from src.utils.Metrics import Metrics, NULL_METRICS
+from src.utils.Parser import ParseError
+
+
+def expand_inputs(pattern):
+    """
+    Get the trace files of a directory or a glob pattern, sorted by path
+
+    :param pattern: directory, its *.txt files are taken, or glob pattern
+    :return: list of paths
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.txt")
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def output_path(input_path, output_dir):
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(input_path))[0] + ".out")
+
+
+def run_job(job):
+    """
+    Run one trace file in a fresh transaction manager and sites
+
+    :param job: (input path, output path, output format, topology, collect metrics)
+    :return: dict with the input, the output, the status and the seconds it took
+    """
+    input_path, output, output_format, topology, stats = job
+    result = {"input": input_path, "output": output, "status": "ok"}
+    start = time.perf_counter()
+    try:
+        run_by_file(input_path, output, output_format, topology, Metrics() if stats else NULL_METRICS)
+    except ParseError as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    except Exception as e:
+        # one failing trace does not stop the batch
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def run_batch(pattern, output_dir, output_format="table", topology=None, workers=None, stats=False):
+    """
+    Run every trace file matched by pattern in a process pool, each output is written to
+    output_dir/<name>.out and the per-file results to output_dir/timings.json, both in input order
+
+    :param pattern: directory or glob pattern of the trace files
+    :param output_dir: directory of the outputs
+    :param output_format: name of the output sink, see OutputSink.SINKS
+    :param topology: Topology of the simulation, the default one if None
+    :param workers: number of worker processes, the number of CPUs if None
+    :param stats: collect metrics and output them at the end of each trace
+    :return: list of per-file results
+    """
+    inputs = expand_inputs(pattern)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, output_path(path, output_dir), output_format, topology, stats) for path in inputs]
+    if len({job[1] for job in jobs}) != len(jobs):
+        raise ValueError(f"{pattern} matches several files with the same name")
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [run_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_job, jobs))
+    seconds = time.perf_counter() - start
+
+    with open(os.path.join(output_dir, "timings.json"), "w") as f:
+        json.dump({"workers": workers or os.cpu_count(), "seconds": round(seconds, 6), "files": results},
+                  f, indent=2)
+        f.write("\n")
+    return results
@@ -0,0 +1,186 @@
+import mmap
+import os
+import struct
+from array import array
+
+# magic, format version, sequence number of the last log record covered, number of variables,
+# offset and number of the wide values
+HEADER = struct.Struct("<4sIQIQI")
+# one variable: vid, offset of its versions, number of versions, flags
+ENTRY = struct.Struct("<qQII")
+# one version: commit time, value or index of a wide value
+VERSION = struct.Struct("<qq")
+MAGIC = b"RCCK"
+FORMAT_VERSION = 2
+# flags of a variable, the values of a WIDE variable do not all fit in 64 bits, its versions hold
+# the indexes of its values among the wide values
+AVAILABLE, WIDE = 1, 2
+INT64_MIN, INT64_MAX = -1 << 63, (1 << 63) - 1
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def write_checkpoint(path, lsn, entries):
+    """
+    Write a checkpoint atomically: to a temporary file, fsync'd, then renamed over path.
+
+    The file is the header, the index of the variables sorted by vid, the versions of every
+    variable as (commit time, value) pairs in commit order and the wide values: the offsets of
+    their ends, then the values as signed little endian integers of any length.
+
+    :param path: checkpoint file
+    :param lsn: sequence number of the last log record the checkpoint covers
+    :param entries: (vid, read availability, commit times, values) sorted by vid
+    :return: size of the file in bytes
+    """
+    index, versions = [], array("q")
+    wide, ends = [], array("Q")
+    offset = 0
+    for vid, available, times, values in entries:
+        flags = AVAILABLE if available else 0
+        if any(not INT64_MIN <= value <= INT64_MAX for value in values):
+            flags |= WIDE
+            first = len(wide)
+            for value in values:
+                wide.append(value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True))
+                ends.append(ends[-1] + len(wide[-1]) if ends else len(wide[-1]))
+            values = range(first, len(wide))
+        index.append(ENTRY.pack(vid, offset, len(times), flags))
+        for time, value in zip(times, values):
+            versions.append(time)
+            versions.append(value)
+        offset += len(times) * VERSION.size
+
+    base = HEADER.size + len(index) * ENTRY.size
+    wide_offset = base + offset
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, lsn, len(index), wide_offset, len(wide)))
+        f.write(b"".join(index))
+        f.write(versions.tobytes())
+        f.write(ends.tobytes())
+        f.write(b"".join(wide))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return wide_offset + len(ends) * ends.itemsize + (ends[-1] if ends else 0)
+
+
+class CheckpointFile:
+    """
+    A checkpoint opened with mmap, nothing is decoded until a variable is looked up.
+
+    A lookup is a binary search of the index in the mapping, the versions of a variable are only
+    copied out when its DataCopy is materialised.
+
+    :param self.lsn: sequence number of the last log record the checkpoint covers
+    :param self.count: number of variables in the checkpoint
+    :param self.wide_offset: offset of the ends of the wide values, followed by the values
+    :param self.wide_count: number of wide values
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise CheckpointError(f"{path} is truncated")
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.lsn, self.count, self.wide_offset, self.wide_count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.buffer.close()
+            raise CheckpointError(f"{path} is not a checkpoint of version {FORMAT_VERSION}")
+        self.versions_offset = HEADER.size + self.count * ENTRY.size
+        self.wide_data_offset = self.wide_offset + self.wide_count * 8
+        if size < self.versions_offset or size < self.wide_data_offset \
+                or self.wide_count and size < self.wide_data_offset + self.get_wide_end(self.wide_count - 1):
+            self.buffer.close()
+            raise CheckpointError(f"{path} is truncated")
+
+    def find(self, vid):
+        """
+        Find the index entry of vid
+
+        :param vid: variable id
+        :return: (offset of the versions, number of versions, flags), None if absent
+        """
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_vid = ENTRY.unpack_from(self.buffer, HEADER.size + mid * ENTRY.size)[0]
+            if entry_vid < vid:
+                lo = mid + 1
+            elif entry_vid > vid:
+                hi = mid
+            else:
+                return ENTRY.unpack_from(self.buffer, HEADER.size + mid * ENTRY.size)[1:]
+        return None
+
+    def __contains__(self, vid):
+        return self.find(vid) is not None
+
+    def get_wide_end(self, index):
+        return struct.unpack_from("<Q", self.buffer, self.wide_offset + index * 8)[0]
+
+    def get_wide(self, index):
+        """
+        Decode the wide value of the given index
+        """
+        start = self.get_wide_end(index - 1) if index else 0
+        end = self.get_wide_end(index)
+        data = self.buffer[self.wide_data_offset + start:self.wide_data_offset + end]
+        return int.from_bytes(data, "little", signed=True)
+
+    def get_value(self, vid):
+        """
+        Get the last committed value of vid, None if it is not in the checkpoint
+        """
+        entry = self.find(vid)
+        if entry is None:
+            return None
+        offset, count, flags = entry
+        value = VERSION.unpack_from(self.buffer, self.versions_offset + offset + (count - 1) * VERSION.size)[1]
+        return self.get_wide(value) if flags & WIDE else value
+
+    def is_available(self, vid):
+        """
+        Get the read availability of vid saved with the checkpoint, None if it is not in the checkpoint
+        """
+        entry = self.find(vid)
+        return None if entry is None else bool(entry[2] & AVAILABLE)
+
+    def get_versions(self, vid):
+        """
+        Get the versions of vid
+
+        :param vid: variable id
+        :return: (commit times, values) lists, None if vid is not in the checkpoint
+        """
+        entry = self.find(vid)
+        if entry is None:
+            return None
+        offset, count, flags = entry
+        start = self.versions_offset + offset
+        pairs = array("q")
+        pairs.frombytes(self.buffer[start:start + count * VERSION.size])
+        values = pairs[1::2].tolist()
+        if flags & WIDE:
+            values = [self.get_wide(index) for index in values]
+        return pairs[0::2].tolist(), values
+
+    def vids(self):
+        """
+        Iterate over the variables of the checkpoint in ascending order
+        """
+        for i in range(self.count):
+            yield ENTRY.unpack_from(self.buffer, HEADER.size + i * ENTRY.size)[0]
+
+    def close(self):
+        self.buffer.close()
@@ -1,126 +1,51 @@
-from src.model.Operation import Operation
-from src.CustomizedConf import OperationType
+import sys
+from src.utils.Parser import parse_command
 
 
 class FileLoader(object):
+    """
+    Load operations from an input file, "-" reads from stdin.
+
+    Lines are read and parsed one at a time, iter_operations yields each operation as soon as
+    its line is read so the whole trace never has to be held in memory. A malformed line raises
+    a ParseError with its line and column.
+    """
     def __init__(self, file_name):
-        self.lines = []
+        self.file_name = file_name
         self.operations = []
-        with open(file_name, 'r') as f:
-            for line in f.readlines():
+
+    def read_lines(self):
+        """
+        Yield the numbered lines of the input until the "===" separator
+
+        :return: generator of (line number, line)
+        """
+        f = sys.stdin if self.file_name == "-" else open(self.file_name, 'r')
+        try:
+            for lineno, line in enumerate(f, 1):
                 if line.startswith("==="):
                     break
-                if not line.startswith("//"):
-                    line.replace(' ', '')
-                    self.lines.append(line.strip())
+                yield lineno, line
+        finally:
+            if f is not sys.stdin:
+                f.close()
 
-    # operation_type, Tid, vid, value, sid, time
-    def write_to_operations(self):
+    def iter_operations(self):
+        """
+        Parse the input lazily, blank and comment lines are skipped
+
+        :return: generator of Operation
+        """
         time = 0
-        for line in self.lines:
-            if line.find("beginRO") != -1:
-                line = (line.split('('))[1]
-                line = line.replace(')', '')
-                line = line[1:]
-                op = Operation(OperationType.BEGINRO, int(line), None, None, None, time)
-                self.operations.append(op)
-                time += 1
-                continue
-            if line.find("begin") != -1:
-                line = line.split("(")[1]
-                line = line.replace(')', '')
-                line = line[1:]
-                op = Operation(OperationType.BEGIN, int(line), None, None, None, time)
-                self.operations.append(op)
-                time += 1
-                continue
-            if line.find("W") != -1:
-                line = line.split("(")[1]
-                line = line.replace(')', '')
-                values = line.split(",")
-                values[0] = (values[0])[1:]
-                values[1] = (values[1]).split("x")[1]
-                op = Operation(OperationType.WRITE, int(values[0]), int(values[1]), int(values[2]), None, time)
-                self.operations.append(op)
-                time += 1
-                continue
-            if line.find("R") != -1:
-                line = line.split("(")[1]
-                line = line.replace(')', '')
-                values = line.split(",")
-                values[0] = (values[0])[1:]
-                values[1] = (values[1]).split("x")[1]
-                op = Operation(OperationType.READ, int(values[0]), int(values[1]), None, None, time)
-                self.operations.append(op)
+        for lineno, line in self.read_lines():
+            op = parse_command(line, time, lineno)
+            if op is not None:
+                yield op
                 time += 1
-                continue
-            if line.find("fail") != -1:
-                line = line.split("(")[1]
-                line = line.replace(')', '')
-                op = Operation(OperationType.FAIL, None, None, None, int(line), time)
-                self.operations.append(op)
-                time += 1
-                continue
-            if line.find("end") != -1:
-                line = line.split("(")[1]
-                line = line.replace(')', '')
-                line = line[1:]
-                op = Operation(OperationType.END, int(line), None, None, None, time)
-                self.operations.append(op)
-                time += 1
-                continue
-            if line.find("recover") != -1:
-                line = line.split("(")[1]
-                line = line.replace(')', '')
-                op = Operation(OperationType.RECOVER, None, None, None, int(line), time)
-                self.operations.append(op)
-                time += 1
-                continue
-            if line.find("dump") != -1:
-                op = Operation(OperationType.DUMP, None, None, None, None, time)
-                self.operations.append(op)
-                time += 1
-                continue
 
-    def parse_line(self, line, tick):
-        if line.find("beginRO") != -1:
-            line = (line.split('('))[1]
-            line = line.replace(')', '')
-            line = line[1:]
-            op = operation(OperationType.BEGINRO, int(line), None, None, None, tick)
-        elif line.find("begin") != -1:
-            line = line.split("(")[1]
-            line = line.replace(')', '')
-            line = line[1:]
-            op = operation(OperationType.BEGIN, int(line), None, None, None, tick)
-        elif line.find("W") != -1:
-            line = line.split("(")[1]
-            line = line.replace(')', '')
-            values = line.split(",")
-            values[0] = (values[0])[1:]
-            values[1] = (values[1]).split("x")[1]
-            op = operation(OperationType.WRITE, int(values[0]), int(values[1]), int(values[2]), None, tick)
-        elif line.find("R") != -1:
-            line = line.split("(")[1]
-            line = line.replace(')', '')
-            values = line.split(",")
-            values[0] = (values[0])[1:]
-            values[1] = (values[1]).split("x")[1]
-            op = operation(OperationType.READ, int(values[0]), int(values[1]), None, None, tick)
-        elif line.find("fail") != -1:
-            line = line.split("(")[1]
-            line = line.replace(')', '')
-            op = operation(OperationType.FAIL, None, None, None, int(line), tick)
-        elif line.find("end") != -1:
-            line = line.split("(")[1]
-            line = line.replace(')', '')
-            line = line[1:]
-            op = operation(OperationType.END, int(line), None, None, None, tick)
-        elif line.find("recover") != -1:
-            line = line.split("(")[1]
-            line = line.replace(')', '')
-            op = operation(OperationType.RECOVER, None, None, None, int(line), tick)
-        elif line.find("dump") != -1:
-            op = operation(OperationType.DUMP, None, None, None, None, tick)
+    # operation_type, Tid, vid, value, sid, time
+    def write_to_operations(self):
+        self.operations = list(self.iter_operations())
 
-        return op
+    def parse_line(self, line, tick):
+        return parse_command(line, tick)
@@ -1,45 +1,91 @@
 import sys
 from src.manager.TransactionManager import TransactionManager
 from src.utils.FileLoader import *
-from model.Site import Site
+from src.model.Site import Site
+from src.model.Topology import Topology
+from src.utils.OutputSink import create_sink
+from src.utils.Metrics import NULL_METRICS
 
 
-def init_sites():
+def init_sites(topology=None, metrics=NULL_METRICS, log_config=None, fair_locks=True):
     """
     Initialize sites and return list of sites
 
+    :param topology: Topology of the simulation, the default one if None
+    :param metrics: Metrics shared by the sites
+    :param log_config: LogConfig of the write-ahead logs, None keeps the data only in memory
+    :param fair_locks: queue refused lock requests, see LockManager
     :return: list of sites
     """
-    return [Site(idx) for idx in range(1, 10 + 1)]
+    topology = topology if topology is not None else Topology()
+    return [Site(idx, topology, metrics, log_config, fair_locks) for idx in range(1, topology.num_sites + 1)]
 
 
-def run(operations):
+def run(operations, sink=None, topology=None, manager_class=TransactionManager, metrics=NULL_METRICS,
+        log_config=None, fair_locks=True, deadlock_policy=None):
     """
-    Run the program and save the result
+    Run the program and save the result, operations are consumed one at a time as they arrive
 
-    :param operations: possible operations
-    :return: None
+    :param operations: iterable of operations, e.g. a generator from FileLoader.iter_operations
+    :param sink: OutputSink receiving the results, pretty tables on stdout by default
+    :param topology: Topology of the simulation, the default one if None
+    :param manager_class: TransactionManager or a subclass of it
+    :param metrics: Metrics of the run, output at the end when enabled
+    :param log_config: LogConfig of the write-ahead logs, None keeps the data only in memory
+    :param fair_locks: queue refused lock requests, see LockManager
+    :param deadlock_policy: DeadlockPolicy, detection after every read and write if None
+    :return: the transaction manager after the run
     """
-    transaction_manager = TransactionManager()
-    transaction_manager.get_all_sites(init_sites())
+    topology = topology if topology is not None else Topology()
+    transaction_manager = manager_class(sink, topology, metrics)
+    if deadlock_policy is not None:
+        transaction_manager.set_deadlock_policy(deadlock_policy)
+    transaction_manager.get_all_sites(init_sites(topology, metrics, log_config, fair_locks))
+
+    try:
+        time_stamp = 0
+        for operation in operations:
+            # time_stamp starts from 1
+            time_stamp += 1
+            transaction_manager.execute_operation(operation)
 
-    time_stamp = 0
-    for operation in operations:
-        # time_stamp starts from 1
-        time_stamp += 1
-        transaction_manager.execute_operation(operation)
+        while transaction_manager.waiting_list:
+            time_stamp += 1
+            op = transaction_manager.waiting_list.pop_first()
+            op.set_time(time_stamp)
+            transaction_manager.set_tick(time_stamp)
+            transaction_manager.retry()
 
-    while transaction_manager.waiting_list:
-        time_stamp += 1
-        op = transaction_manager.waiting_list.pop(0)
-        op.set_time(time_stamp)
-        transaction_manager.retry()
+        if metrics.enabled:
+            transaction_manager.execute_stats()
+    finally:
+        transaction_manager.sink.flush()
+        for site in transaction_manager.sites:
+            site.close()
+    return transaction_manager
 
 
-def run_by_file(input, output):
+def run_by_file(input, output, output_format="table", topology=None, metrics=NULL_METRICS, log_config=None,
+                deadlock_policy=None, manager_class=TransactionManager):
+    """
+    Stream the operations of input through the simulator
+
+    :param input: input file, "-" or None reads from stdin
+    :param output: output file, "-" or None writes to stdout
+    :param output_format: name of the output sink, see OutputSink.SINKS
+    :param topology: Topology of the simulation, the default one if None
+    :param metrics: Metrics of the run, output at the end when enabled
+    :param log_config: LogConfig of the write-ahead logs, None keeps the data only in memory
+    :param deadlock_policy: DeadlockPolicy, detection after every read and write if None
+    :param manager_class: TransactionManager or a subclass of it, e.g. OptimisticTransactionManager
+    :return: None
+    """
+    loader = FileLoader(input or "-")
+    if output is None or output == "-":
+        run(loader.iter_operations(), create_sink(output_format, sys.stdout), topology, manager_class, metrics,
+            log_config=log_config, deadlock_policy=deadlock_policy)
+        return
+
     with open(output, "w") as f:
-        sys.stdout = f
-        loader = FileLoader(input)
-        loader.write_to_operations()
-        ops = loader.operations
-        run(ops)
+        run(loader.iter_operations(), create_sink(output_format, f), topology, manager_class, metrics,
+            log_config=log_config, deadlock_policy=deadlock_policy)
@@ -0,0 +1,118 @@
+from time import perf_counter
+
+
+class Histogram:
+    """
+    Distribution of non-negative values in power of two buckets
+
+    :param self.buckets: bucket -> number of values, bucket b holds the values in [2^(b-1), 2^b)
+    """
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        bucket = int(value).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile, within the minimum and the maximum
+
+        :param p: percentile between 0 and 100
+        :return: value
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, max(self.min, (1 << bucket) - 1))
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """
+    A registry of counters, histograms and timers shared by the managers of a run.
+
+    Timers are histograms of microseconds: start = metrics.start() ... metrics.stop(name, start).
+
+    :param self.counters: name -> count
+    :param self.histograms: name -> Histogram
+    """
+    enabled = True
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def start(self):
+        return perf_counter()
+
+    def stop(self, name, start):
+        self.observe(name, (perf_counter() - start) * 1e6)
+
+    def snapshot(self):
+        """
+        Get every metric, JSON serializable
+
+        :return: dict
+        """
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": {name: self.histograms[name].summary() for name in sorted(self.histograms)},
+        }
+
+
+class NullMetrics(Metrics):
+    """
+    Discard every metric, the default so that the hot paths only pay for an empty call
+    """
+    enabled = False
+
+    def incr(self, name, n=1):
+        pass
+
+    def observe(self, name, value):
+        pass
+
+    def start(self):
+        return 0
+
+    def stop(self, name, start):
+        pass
+
+
+NULL_METRICS = NullMetrics()
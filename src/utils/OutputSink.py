@@ -0,0 +1,154 @@
+import json
+from prettytable import PrettyTable
+
+
+class OutputSink:
+    """
+    Destination of the results printed by the transaction manager.
+
+    Results are formatted into a buffer and written to the stream in batches of buffer_size
+    records, call flush() once the run is over.
+
+    :param self.stream: file-like object the results are written to
+    :param self.buffer: formatted records not written yet
+    """
+
+    def __init__(self, stream, buffer_size=256):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def table(self, headers, rows):
+        """
+        Output a table
+
+        :param headers: table headers
+        :param rows: table rows
+        :return: None
+        """
+        self.write(self.format_table(headers, rows))
+
+    def message(self, text):
+        """
+        Output a single line message
+
+        :param text: message
+        :return: None
+        """
+        self.write(self.format_message(text))
+
+    def format_table(self, headers, rows):
+        raise NotImplementedError
+
+    def format_message(self, text):
+        return text + "\n"
+
+    def write(self, text):
+        self.buffer.append(text)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write("".join(self.buffer))
+            self.buffer = []
+        self.stream.flush()
+
+
+class PrettyTableSink(OutputSink):
+    """
+    Render every table with PrettyTable, the original output format
+    """
+
+    def format_table(self, headers, rows):
+        table = PrettyTable()
+        table.field_names = headers
+        for row in rows:
+            table.add_row(row)
+        return table.get_string() + "\n"
+
+
+class TextSink(OutputSink):
+    """
+    Render every table row as one compact line, e.g. "Transaction=1 Site=2 x2=20"
+    """
+
+    def format_table(self, headers, rows):
+        return "".join(" ".join(f"{header}={value}" for header, value in zip(headers, row)) + "\n"
+                       for row in rows)
+
+
+class JsonLinesSink(OutputSink):
+    """
+    Render every table and message as one JSON object per line
+    """
+
+    def format_table(self, headers, rows):
+        return json.dumps({"type": "table", "headers": headers, "rows": rows}, default=str) + "\n"
+
+    def format_message(self, text):
+        return json.dumps({"type": "message", "text": text}) + "\n"
+
+
+class NullSink(OutputSink):
+    """
+    Discard every result, used for benchmarking
+    """
+
+    def __init__(self, stream=None, buffer_size=256):
+        super().__init__(stream, buffer_size)
+
+    def table(self, headers, rows):
+        pass
+
+    def message(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+class RecordingSink(OutputSink):
+    """
+    Keep every result as a (key, index, headers, rows) record, or (key, index, None, text) for a
+    message, so the results of several transaction managers can be merged. The caller sets key
+    before each step, and sets muted while the results are reported by another manager.
+    """
+
+    def __init__(self, stream=None, buffer_size=256):
+        super().__init__(stream, buffer_size)
+        self.key = ()
+        self.muted = False
+        self.records = []
+
+    def table(self, headers, rows):
+        if not self.muted:
+            self.records.append((self.key, len(self.records), headers, rows))
+
+    def message(self, text):
+        if not self.muted:
+            self.records.append((self.key, len(self.records), None, text))
+
+    def flush(self):
+        pass
+
+
+SINKS = {
+    "table": PrettyTableSink,
+    "text": TextSink,
+    "jsonl": JsonLinesSink,
+    "null": NullSink,
+}
+
+
+def create_sink(output_format, stream):
+    """
+    Create the output sink of the given format
+
+    :param output_format: one of SINKS
+    :param stream: file-like object
+    :return: OutputSink
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format {output_format}, expected one of {', '.join(SINKS)}")
+    return SINKS[output_format](stream)
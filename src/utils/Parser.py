@@ -0,0 +1,183 @@
+import re
+from src.model.Operation import Operation
+from src.CustomizedConf import OperationType
+
+# command name -> (operation type, arguments of the command)
+SIGNATURES = {
+    "begin": (OperationType.BEGIN, ("tid",)),
+    "beginRO": (OperationType.BEGINRO, ("tid",)),
+    "end": (OperationType.END, ("tid",)),
+    "R": (OperationType.READ, ("tid", "vid")),
+    "W": (OperationType.WRITE, ("tid", "vid", "value")),
+    "fail": (OperationType.FAIL, ("sid",)),
+    "recover": (OperationType.RECOVER, ("sid",)),
+    "dump": (OperationType.DUMP, ()),
+    "stats": (OperationType.STATS, ()),
+}
+
+ARGUMENTS = ("tid", "vid", "value", "sid")
+
+# command name -> the command takes more "x<vid>, <value>" pairs after its arguments
+REPEATED = {"W"}
+
+# more "x<vid>, <value>" pairs of a write of several variables
+PAIRS = r"(?:[ \t]*,[ \t]*x\d+[ \t]*,[ \t]*-?\d+)*"
+PAIR = re.compile(r"x(\d+)[ \t]*,[ \t]*(-?\d+)")
+
+ARGUMENT_PATTERNS = {
+    "tid": r"T(?P<{}_tid>\d+)",
+    "vid": r"x(?P<{}_vid>\d+)",
+    "value": r"(?P<{}_value>-?\d+)",
+    "sid": r"(?P<{}_sid>\d+)",
+}
+
+USAGE = {
+    "tid": "a transaction like T1",
+    "vid": "a variable like x1",
+    "value": "an integer value",
+    "sid": "a site id",
+}
+
+
+def build_grammar():
+    """
+    Build one alternation with a named group per command, so a single match both classifies the
+    line and captures its arguments. match.lastgroup is the name of the command.
+    """
+    alternatives = []
+    for name, (_, arguments) in SIGNATURES.items():
+        args = r"[ \t]*,[ \t]*".join(ARGUMENT_PATTERNS[a].format(name) for a in arguments)
+        if name in REPEATED:
+            args += rf"(?P<{name}_writes>{PAIRS})"
+        alternatives.append(rf"(?P<{name}>{name}[ \t]*\([ \t]*{args}[ \t]*\))")
+    # beginRO has to be tried before begin
+    alternatives.sort(key=lambda alternative: alternative.startswith("(?P<begin>"))
+    return re.compile(r"[ \t]*(?:" + "|".join(alternatives) + r")?[ \t]*(?://.*)?\r?\n?\Z")
+
+
+GRAMMAR = build_grammar()
+
+# command name -> (operation type, group index of tid, vid, value, sid and writes or None)
+GROUPS = {
+    name: (int(operation_type), *(GRAMMAR.groupindex.get(f"{name}_{a}") for a in ARGUMENTS + ("writes",)))
+    for name, (operation_type, _) in SIGNATURES.items()
+}
+
+# A lenient pattern only used to locate the error of a line the grammar rejects, the groups of
+# the arguments start at their first character so they give the column of an error
+COMMAND = re.compile(r"""
+    [ \t]*
+    (?:
+        (?P<name>[A-Za-z]+)
+        [ \t]*(?P<open>\()?[ \t]*
+        (?P<tid>T\d+)?
+        (?:[ \t]*,[ \t]*(?P<vid>x\d+))?
+        (?:[ \t]*,[ \t]*(?P<value>-?\d+))?
+        (?P<writes>(?:[ \t]*,[ \t]*x\d+[ \t]*,[ \t]*-?\d+)*)
+        (?P<sid>\d+)?
+        [ \t]*(?P<close>\))?
+    )?
+    [ \t]*(?P<comment>//.*)?
+    \r?\n?
+""", re.VERBOSE)
+
+# a T or an x without its id where the lenient pattern stopped, e.g. "R(T1, x)"
+MISSING_ID = re.compile(r"(?:[ \t]*,)?[ \t]*(?P<prefix>[Tx])(?!\d)")
+ID_NAMES = {"T": "transaction", "x": "variable"}
+
+
+class ParseError(ValueError):
+    """
+    An invalid command in the input
+
+    :param self.line: line number, starting from 1
+    :param self.column: column number, starting from 1
+    """
+    def __init__(self, message, line, column):
+        self.message = message
+        self.line = line
+        self.column = column
+        super().__init__(f"line {line}, column {column}: {message}")
+
+
+def parse_command(line, tick, lineno=None):
+    """
+    Parse one line of the operation language, e.g. "W(T1, x2, 101) // comment". A write of
+    several variables lists more pairs, e.g. "W(T1, x2, 101, x4, 102)".
+
+    :param line: the input line
+    :param tick: time of the operation
+    :param lineno: line number used in error messages
+    :return: Operation, or None for a blank or comment line
+    """
+    match = GRAMMAR.match(line)
+    if match is None:
+        raise locate_error(line, lineno)
+    name = match.lastgroup
+    if name is None:
+        return None
+    operation_type, tid, vid, value, sid, writes = GROUPS[name]
+    group = match.group
+    operation = Operation(operation_type,
+                          int(group(tid)) if tid else None,
+                          int(group(vid)) if vid else None,
+                          int(group(value)) if value else None,
+                          int(group(sid)) if sid else None,
+                          tick)
+    if writes and group(writes):
+        pairs = parse_writes(operation.vid, operation.value, group(writes))
+        operation.vid, operation.value = pairs[0]
+        if len(pairs) > 1:
+            operation.writes = pairs
+    return operation
+
+
+def parse_writes(vid, value, pairs):
+    """
+    Collect the pairs of a write of several variables, a variable written twice keeps its last
+    value at the position of its first write
+
+    :param vid: first variable
+    :param value: first value
+    :param pairs: text of the other pairs
+    :return: tuple of (vid, value)
+    """
+    writes = {vid: value}
+    for other_vid, other_value in PAIR.findall(pairs):
+        writes[int(other_vid)] = int(other_value)
+    return tuple(writes.items())
+
+
+def locate_error(line, lineno):
+    """
+    Find the first invalid column of a line rejected by the grammar
+
+    :param line: the input line
+    :param lineno: line number
+    :return: ParseError
+    """
+    match = COMMAND.match(line)
+    name = match.group("name")
+    if name is not None and name not in SIGNATURES:
+        return ParseError(f"unknown command {name!r}", lineno, match.start("name") + 1)
+    end = match.end()
+    if end != len(line):
+        missing = MISSING_ID.match(line, end)
+        if missing is not None and name is not None:
+            prefix = missing.group("prefix")
+            return ParseError(f"{ID_NAMES[prefix]} id expected after {prefix!r}", lineno, missing.start("prefix") + 1)
+        return ParseError(f"unexpected {line[end]!r}", lineno, end + 1)
+    if match.group("open") is None:
+        return ParseError(f"expected '(' after {name}", lineno, match.end("name") + 1)
+    if match.group("close") is None:
+        column = match.start("comment") if match.group("comment") else len(line.rstrip("\r\n"))
+        return ParseError(f"expected ')' in {name}", lineno, column + 1)
+
+    arguments = SIGNATURES[name][1]
+    for argument in ARGUMENTS:
+        if match.group(argument) is not None and argument not in arguments:
+            return ParseError(f"unexpected argument in {name}", lineno, match.start(argument) + 1)
+    if match.group("writes") and name not in REPEATED:
+        return ParseError(f"unexpected argument in {name}", lineno, match.start("writes") + 1)
+    missing = next(a for a in arguments if match.group(a) is None)
+    return ParseError(f"{name} expects {USAGE[missing]}", lineno, match.start("close") + 1)
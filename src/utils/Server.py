@@ -0,0 +1,364 @@
+import asyncio
+import json
+from src.CustomizedConf import AbortType, OperationType
+from src.manager.TransactionManager import TransactionManager
+from src.model.Topology import Topology
+from src.utils.FileRunner import init_sites
+from src.utils.OutputSink import OutputSink
+from src.utils.Parser import ParseError, parse_command
+
+DONE, BLOCKED, ABORTED, ERROR = "done", "blocked", "aborted", "error"
+
+BEGIN_OPERATIONS = (OperationType.BEGIN, OperationType.BEGINRO)
+
+
+class Request:
+    """
+    One operation sent by a client
+
+    :param self.connection: Connection the operation came from
+    :param self.rid: number of the request on its connection, starting from 1
+    :param self.future: resolved with DONE or ABORTED once the operation is no longer blocked
+    """
+    __slots__ = ("connection", "rid", "future")
+
+    def __init__(self, connection, rid, future):
+        self.connection = connection
+        self.rid = rid
+        self.future = future
+
+
+class RoutingSink(OutputSink):
+    """
+    Send every result as a JSON line to the connection of the request being executed
+    """
+
+    def __init__(self):
+        super().__init__(None)
+        self.request = None
+
+    def table(self, headers, rows):
+        self.request.connection.send({"id": self.request.rid, "type": "table", "headers": headers, "rows": rows})
+
+    def message(self, text):
+        self.request.connection.send({"id": self.request.rid, "type": "message", "text": text})
+
+    def flush(self):
+        pass
+
+
+class ServerTransactionManager(TransactionManager):
+    """
+    A transaction manager whose blocked operations are awaitables of the clients.
+
+    The results of a retried operation go to the client that sent it, its future is resolved
+    when the retry succeeds or its transaction aborts.
+
+    :param self.requests: id of a blocked operation -> Request
+    :param self.owners: tid -> Request of the last operation of the transaction
+    """
+
+    def __init__(self, topology=None):
+        super().__init__(RoutingSink(), topology)
+        self.requests = {}
+        self.owners = {}
+
+    def submit(self, operation, request):
+        """
+        Execute a new operation of a client
+
+        :param operation: the operation
+        :param request: Request of the operation
+        :return: None
+        """
+        tid = operation.get_tid()
+        self.sink.request = request
+        if tid is not None:
+            self.owners[tid] = request
+        self.requests[id(operation)] = request
+        if self.execute_operation(operation):
+            self.resolve(operation, DONE)
+        elif not request.future.done():
+            request.connection.send({"id": request.rid, "status": BLOCKED})
+        if tid is not None and tid not in self.transactions:
+            self.owners.pop(tid, None)
+        self.finish_tick()
+
+    def finish_tick(self):
+        """
+        Retry the operations woken by the last operation and break the cycles they form right away
+        instead of at the next operation, so a quiet server still makes progress
+
+        :return: None
+        """
+        while True:
+            self.resolve_deadlock()
+            if not self.waiting_list.ready and not self.waiting_list.changed_trans:
+                return
+            self.set_tick(self.tick + 1)
+            self.retry()
+
+    def abort_transactions(self, tids):
+        """
+        Abort the running transactions of a client that closed its connection, their locks are
+        released and the operations they blocked are retried
+
+        :param tids: tids begun by the client
+        :return: None
+        """
+        for tid in sorted(tids):
+            if tid in self.transactions:
+                self.abort(tid, AbortType.DISCONNECTED)
+            # no end will come to ignore the rest of the transaction
+            self.aborted.discard(tid)
+        self.finish_tick()
+
+    def resolve(self, operation, status):
+        request = self.requests.pop(id(operation), None)
+        if request is not None and not request.future.done():
+            request.future.set_result(status)
+
+    def assign_task(self, operation, is_retry=False):
+        if is_retry:
+            self.sink.request = self.requests[id(operation)]
+        is_succeed = super().assign_task(operation, is_retry)
+        if is_succeed and is_retry:
+            self.resolve(operation, DONE)
+        return is_succeed
+
+    def abort(self, tid, abort_type=AbortType.DEADLOCK):
+        # the abort is reported to the client of the transaction
+        request = self.sink.request
+        blocked = self.waiting_list.get_operations(tid)
+        self.sink.request = self.owners.pop(tid, request)
+        super().abort(tid, abort_type)
+        self.sink.request = request
+        for operation in blocked:
+            self.resolve(operation, ABORTED)
+
+
+class Connection:
+    """
+    A client connection, lines are read and executed as they arrive and the results are written
+    back as JSON lines tagged with the request number.
+
+    Reading stops while max_pipeline requests are unfinished or max_buffer lines wait to be
+    written, so a slow client only slows itself down.
+
+    :param self.outbox: JSON lines waiting to be written
+    :param self.in_flight: number of unfinished requests
+    :param self.capacity: set when another request can be read
+    :param self.tids: tids begun by the client and not ended yet, aborted when it disconnects
+    """
+
+    def __init__(self, server, reader, writer, max_pipeline=64, max_buffer=1024):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.max_pipeline = max_pipeline
+        self.max_buffer = max_buffer
+        self.outbox = asyncio.Queue()
+        self.in_flight = 0
+        self.capacity = asyncio.Event()
+        self.capacity.set()
+        self.tids = set()
+
+    def send(self, response):
+        self.outbox.put_nowait(json.dumps(response, default=str) + "\n")
+        self.update_capacity()
+
+    def update_capacity(self):
+        if self.in_flight < self.max_pipeline and self.outbox.qsize() < self.max_buffer:
+            self.capacity.set()
+        else:
+            self.capacity.clear()
+
+    async def serve(self):
+        sender = asyncio.ensure_future(self.write_responses())
+        waiters = set()
+        rid = 0
+        try:
+            while True:
+                await self.capacity.wait()
+                line = await self.reader.readline()
+                if not line:
+                    break
+                rid += 1
+                waiter = self.server.submit(self, rid, line.decode())
+                if waiter is not None:
+                    waiters.add(waiter)
+                    waiter.add_done_callback(waiters.discard)
+                # let the other connections run between the lines of a pipeline
+                await asyncio.sleep(0)
+        except ConnectionError:
+            pass
+        finally:
+            # the client is gone, its transactions would hold their locks forever
+            self.server.disconnect(self)
+            for waiter in waiters:
+                waiter.cancel()
+            self.outbox.put_nowait(None)
+            await sender
+
+    async def complete(self, request):
+        """
+        Wait for a blocked request and send its status
+
+        :param request: Request
+        :return: None
+        """
+        status = await request.future
+        self.send({"id": request.rid, "status": status})
+        self.in_flight -= 1
+        self.update_capacity()
+
+    async def write_responses(self):
+        while True:
+            line = await self.outbox.get()
+            if line is None:
+                break
+            self.writer.write(line.encode())
+            if self.outbox.empty():
+                try:
+                    await self.writer.drain()
+                except ConnectionError:
+                    break
+            self.update_capacity()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class OperationServer:
+    """
+    An asyncio TCP or Unix socket server executing the operations of many clients on one
+    transaction manager, one line per operation in the input language of the simulator.
+
+    Every operation gets a tick when it arrives. For each request the client receives its
+    results, e.g. {"id": 3, "type": "table", ...}, then {"id": 3, "status": "done"}. A blocked
+    request first gets {"status": "blocked"} and its final status once a retry succeeds or its
+    transaction aborts. Requests of one connection can be pipelined.
+    """
+
+    def __init__(self, topology=None, max_pipeline=64, max_buffer=1024):
+        self.topology = topology if topology is not None else Topology()
+        self.transaction_manager = ServerTransactionManager(self.topology)
+        self.transaction_manager.get_all_sites(init_sites(self.topology))
+        self.max_pipeline = max_pipeline
+        self.max_buffer = max_buffer
+        self.tick = 0
+        self.handlers = set()
+
+    async def handle_connection(self, reader, writer):
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        try:
+            await Connection(self, reader, writer, self.max_pipeline, self.max_buffer).serve()
+        finally:
+            self.handlers.discard(handler)
+
+    async def wait_connections(self):
+        """
+        Wait until every open connection is closed by its client
+
+        :return: None
+        """
+        if self.handlers:
+            await asyncio.wait(set(self.handlers))
+
+    def submit(self, connection, rid, line):
+        """
+        Parse and execute one line of a client
+
+        :param connection: Connection
+        :param rid: request number
+        :param line: the line
+        :return: awaitable completing the request, None if it is already complete
+        """
+        try:
+            operation = parse_command(line, self.tick)
+        except ParseError as e:
+            connection.send({"id": rid, "status": ERROR, "error": e.message, "column": e.column})
+            return None
+        if operation is None:
+            connection.send({"id": rid, "status": DONE})
+            return None
+        error = self.check_operation(operation)
+        if error is not None:
+            connection.send({"id": rid, "status": ERROR, "error": error})
+            return None
+
+        request = Request(connection, rid, asyncio.get_running_loop().create_future())
+        connection.in_flight += 1
+        tid, transaction_manager = operation.get_tid(), self.transaction_manager
+        if operation.get_type() in BEGIN_OPERATIONS:
+            connection.tids.add(tid)
+        transaction_manager.submit(operation, request)
+        if operation.get_type() == OperationType.END and tid not in transaction_manager.transactions:
+            connection.tids.discard(tid)
+        self.tick = transaction_manager.tick + 1
+        return asyncio.ensure_future(connection.complete(request))
+
+    def check_operation(self, operation):
+        """
+        Check the ids of an operation before it is executed, the transaction manager raises for a
+        variable, a site or a transaction that does not exist
+
+        :param operation: Operation
+        :return: error message, None if the operation can be executed
+        """
+        transaction_manager = self.transaction_manager
+        error = self.topology.check_operation(operation)
+        if error is not None:
+            return error
+        tid = operation.get_tid()
+        if tid is None:
+            return None
+        if operation.get_type() in BEGIN_OPERATIONS:
+            if tid in transaction_manager.transactions or tid in transaction_manager.aborted:
+                return f"transaction T{tid} is already running"
+        elif tid not in transaction_manager.transactions and tid not in transaction_manager.aborted:
+            return f"transaction T{tid} is not running"
+        return None
+
+    def disconnect(self, connection):
+        """
+        Abort the transactions a client left running when its connection closed
+
+        :param connection: Connection
+        :return: None
+        """
+        if connection.tids:
+            self.transaction_manager.abort_transactions(connection.tids)
+            connection.tids.clear()
+            self.tick = self.transaction_manager.tick + 1
+
+    async def start_tcp(self, host="127.0.0.1", port=7878):
+        return await asyncio.start_server(self.handle_connection, host, port, limit=1 << 16)
+
+    async def start_unix(self, path):
+        return await asyncio.start_unix_server(self.handle_connection, path, limit=1 << 16)
+
+
+def serve(host="127.0.0.1", port=7878, unix=None, topology=None):
+    """
+    Run a server until it is interrupted
+
+    :param host: TCP host
+    :param port: TCP port
+    :param unix: Unix socket path, used instead of TCP if given
+    :param topology: Topology of the simulation, the default one if None
+    :return: None
+    """
+    async def main():
+        server = OperationServer(topology)
+        listener = await (server.start_unix(unix) if unix else server.start_tcp(host, port))
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
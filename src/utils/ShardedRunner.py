@@ -0,0 +1,404 @@
+import copy
+import os
+import sys
+from multiprocessing import Pipe, Process
+from src.CustomizedConf import AbortType, OperationType
+from src.DeadLockDetector import DeadLockDetector
+from src.manager.ShardTransactionManager import ShardTransactionManager, DEADLOCK, DECIDE, EXECUTE
+from src.model.Operation import Operation
+from src.model.Topology import Topology
+from src.utils.FileLoader import FileLoader
+from src.utils.FileRunner import init_sites
+from src.utils.Metrics import NULL_METRICS
+from src.utils.OutputSink import RecordingSink, create_sink
+
+# commands every shard executes
+GLOBAL_OPERATIONS = (OperationType.FAIL, OperationType.RECOVER, OperationType.DUMP, OperationType.STATS)
+DATA_OPERATIONS = (OperationType.READ, OperationType.WRITE)
+TRANSACTION_OPERATIONS = (OperationType.BEGIN, OperationType.BEGINRO, OperationType.END)
+
+# actions of a message to a worker
+RUN, RETRY, REPORT, RECORDS = 0, 1, 2, 3
+
+
+def shard_of(vid, num_variables, num_shards):
+    """
+    Shard of a variable, the variables are split into num_shards contiguous ranges
+    """
+    return (vid - 1) * num_shards // num_variables
+
+
+class ShardPlan:
+    """
+    The shards every transaction reads or writes.
+
+    A transaction runs in each shard it touches, its begin and end are executed by all of them
+    and a write of several variables is cut into one write per shard. A transaction reading and
+    writing nothing runs in the first shard.
+
+    :param self.trans_shards: tid -> sorted tuple of the shards the transaction touches
+    :param self.begin_ticks: tid -> tick of its begin, to pick the youngest transaction of a cycle
+    :param self.spanning: tids of the transactions touching several shards
+    """
+
+    def __init__(self, operations, topology, num_shards):
+        self.num_variables = topology.num_variables
+        self.num_shards = min(num_shards, topology.num_variables)
+        shards = {}
+        self.begin_ticks = {}
+        for operation in operations:
+            topology.validate_operation(operation)
+            tid = operation.get_tid()
+            if operation.get_type() in (OperationType.BEGIN, OperationType.BEGINRO):
+                self.begin_ticks[tid] = operation.get_time()
+            for vid in operation.get_vids():
+                shards.setdefault(tid, set()).add(self.shard_of(vid))
+        self.trans_shards = {tid: tuple(sorted(trans_shards)) for tid, trans_shards in shards.items()}
+        self.spanning = frozenset(tid for tid, trans_shards in self.trans_shards.items() if len(trans_shards) > 1)
+
+    def shard_of(self, vid):
+        return shard_of(vid, self.num_variables, self.num_shards)
+
+    def shards_of_trans(self, tid):
+        return self.trans_shards.get(tid, (0,))
+
+    def get_spanning(self, shard):
+        """
+        Get the transactions spanning a shard and others
+
+        :param shard: index of the shard
+        :return: dict tid -> home shard, the first one the transaction touches
+        """
+        return {tid: shards[0] for tid, shards in self.trans_shards.items() if len(shards) > 1 and shard in shards}
+
+    def split(self, operations):
+        """
+        Split the operations by shard, the global commands go to every shard
+
+        :param operations: list of operations
+        :return: list of lists of operations
+        """
+        shards = [[] for _ in range(self.num_shards)]
+        for operation in operations:
+            operation_type = operation.get_type()
+            if operation_type in GLOBAL_OPERATIONS:
+                for shard in shards:
+                    shard.append(operation)
+            elif operation_type in TRANSACTION_OPERATIONS:
+                # every shard blocks and retries its own copy
+                for index, shard in enumerate(self.shards_of_trans(operation.get_tid())):
+                    shards[shard].append(operation if index == 0 else copy.copy(operation))
+            elif operation_type == OperationType.WRITE and operation.writes is not None:
+                shard_writes = {}
+                for vid, value in operation.get_writes():
+                    shard_writes.setdefault(self.shard_of(vid), []).append((vid, value))
+                for shard, writes in shard_writes.items():
+                    (vid, value), writes = writes[0], tuple(writes) if len(writes) > 1 else None
+                    shards[shard].append(Operation(operation_type, operation.get_tid(), vid, value, None,
+                                                   operation.get_time(), writes))
+            else:
+                shards[self.shard_of(operation.get_vid())].append(operation)
+        return shards
+
+
+class ShardWorker:
+    """
+    Runs the transaction managers of some shards, driven by the messages of run_sharded
+
+    :param self.kinds: operation type of every tick
+    :param self.managers: ShardTransactionManager of every shard of the worker
+    :param self.operations: iterator over the operations of every shard
+    :param self.next_operations: next operation of every shard, None after the last one
+    :param self.data_kinds: operation types of the ticks deadlocks are checked at
+    """
+
+    def __init__(self, jobs, kinds, topology):
+        """
+        :param jobs: list of (shard, operations of the shard, spanning transactions of the shard)
+        :param kinds: operation type of every tick
+        :param topology: Topology of the simulation
+        """
+        self.kinds = kinds
+        self.data_kinds = bytes(DATA_OPERATIONS)
+        self.managers, self.operations, self.next_operations = [], [], []
+        for shard, operations, spanning in jobs:
+            transaction_manager = ShardTransactionManager(RecordingSink(), topology, shard, spanning)
+            transaction_manager.get_all_sites(init_sites(topology))
+            self.managers.append(transaction_manager)
+            self.operations.append(iter(operations))
+            self.next_operations.append(next(self.operations[-1], None))
+
+    def handle(self, message):
+        """
+        Apply the decisions of the coordinator at the boundary tick and do the action
+
+        :param message: (decisions, boundary tick, action), the action is (RUN, first tick, end tick),
+            (RETRY, tick, arrival tick of the operation to drop or None), (REPORT,) or (RECORDS,)
+        :return: list of the reports, or of the records, of every shard
+        """
+        decisions, boundary, action = message
+        for transaction_manager in self.managers:
+            if decisions:
+                transaction_manager.set_tick(boundary)
+                for decision in decisions:
+                    transaction_manager.apply_decision(*decision)
+
+        if action[0] == RUN:
+            for tick in range(action[1], action[2]):
+                self.run_tick(tick)
+        elif action[0] == RETRY:
+            for transaction_manager in self.managers:
+                if action[2] is not None:
+                    transaction_manager.drop_blocked(action[2])
+                transaction_manager.set_tick(action[1])
+                transaction_manager.retry()
+                transaction_manager.retried = action[1]
+        elif action[0] == RECORDS:
+            return [transaction_manager.sink.records for transaction_manager in self.managers]
+        return [transaction_manager.report() for transaction_manager in self.managers]
+
+    def run_tick(self, tick):
+        check_deadlock = self.kinds[tick] in self.data_kinds
+        for index, transaction_manager in enumerate(self.managers):
+            operation = self.next_operations[index]
+            if operation is not None and operation.get_time() == tick:
+                transaction_manager.execute_operation(operation)
+                self.next_operations[index] = next(self.operations[index], None)
+            else:
+                transaction_manager.pass_tick(tick, check_deadlock)
+
+
+def serve_worker(connection, jobs, kinds, topology):
+    """
+    Answer the messages of run_sharded in a worker process until None is received
+    """
+    worker = ShardWorker(jobs, kinds, topology)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        connection.send(worker.handle(message))
+    connection.close()
+
+
+class Coordinator:
+    """
+    Decides the end of the transactions spanning several shards at the end of every epoch.
+
+    A spanning transaction commits once every shard it touches has prepared it, unless one of them
+    lost its writes to a site failure. It aborts when one shard aborted it. The wait-for edges of
+    all shards are joined into one graph, and a cycle through a spanning transaction is broken by
+    aborting its youngest transaction as the serial manager does. The other cycles are broken by
+    their shard.
+
+    :param self.plan: ShardPlan of the run
+    :param self.added: wait-for edges were added since the last search of a cycle
+    :param self.metrics: disabled Metrics of the wait-for graph
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.added = False
+        self.metrics = NULL_METRICS
+
+    def decide(self, reports, boundary, check_deadlock):
+        """
+        Decide from the reports of every shard at the end of an epoch
+
+        :param reports: report of every shard, see ShardTransactionManager.report
+        :param boundary: last tick of the epoch, the decisions are applied at it
+        :param check_deadlock: the epoch had a read or a write
+        :return: list of (key, tid, committed, abort type) sorted by key
+        """
+        votes, aborts = {}, {}
+        graph = DeadLockDetector(self)
+        for prepared, local_aborts, edges, added, _ in reports:
+            for tid, vote in prepared.items():
+                votes.setdefault(tid, []).append(vote)
+            for key, tid, abort_type in local_aborts:
+                if tid not in aborts or key < aborts[tid][0]:
+                    aborts[tid] = (key, abort_type)
+            for tid, holders in edges.items():
+                graph.add_wait(tid, holders)
+            self.added = self.added or added
+
+        decisions = []
+        for tid, (key, abort_type) in aborts.items():
+            decisions.append((self.decision_key(key, boundary), tid, False, abort_type))
+        for tid, tid_votes in votes.items():
+            if tid in aborts or len(tid_votes) < len(self.plan.shards_of_trans(tid)):
+                continue
+            key = max(key for key, _ in tid_votes)
+            committed = all(active for _, active in tid_votes)
+            decisions.append((self.decision_key(key, boundary), tid, committed, AbortType.SITE_FAILURE))
+
+        if check_deadlock and self.added:
+            for decision in decisions:
+                graph.remove_transaction(decision[1])
+            graph.set_changed(self.plan.spanning & graph.waits_for.keys())
+            while graph.deadlock():
+                cycle = graph.getcycle()
+                tid = max(cycle, key=lambda tid: self.plan.begin_ticks[tid])
+                graph.remove_transaction(tid)
+                decisions.append(((boundary, DEADLOCK, cycle[0]), tid, False, AbortType.DEADLOCK))
+            self.added = False
+        decisions.sort(key=lambda decision: decision[0])
+        return decisions
+
+    @staticmethod
+    def decision_key(key, boundary):
+        """
+        Key of the report of a decision, the key of the end if it was executed at the boundary so
+        the decision is output where the serial run outputs it
+        """
+        return key if key[0] == boundary else (boundary, DECIDE, key)
+
+
+def split_epochs(kinds, epoch):
+    """
+    Split the ticks into epochs of at most epoch ticks, an epoch also ends before every global
+    command so the shards fail, recover and dump with every decision taken
+
+    :return: generator of (first tick, end tick)
+    """
+    start = 0
+    for tick, kind in enumerate(kinds):
+        if tick > start and (tick - start == epoch or kind in GLOBAL_OPERATIONS):
+            yield start, tick
+            start = tick
+    if start < len(kinds):
+        yield start, len(kinds)
+
+
+def merge(shard_records, plan, kinds, sink):
+    """
+    Output the recorded results of every shard in the serial order, the results of a global
+    command are taken from the first shard except dump whose columns come from the shard holding
+    each variable
+
+    :return: None
+    """
+    records = sorted((key, shard, index, headers, body)
+                     for shard, shard_records_ in enumerate(shard_records)
+                     for key, index, headers, body in shard_records_)
+    dumps = {}
+    for key, shard, index, headers, body in records:
+        if key[1] == EXECUTE and key[0] < len(kinds) and kinds[key[0]] == OperationType.DUMP:
+            dumps.setdefault(key[0], {})[shard] = body
+
+    for key, shard, index, headers, body in records:
+        tick, phase = key[0], key[1]
+        if phase == EXECUTE and tick < len(kinds) and kinds[tick] in GLOBAL_OPERATIONS:
+            if shard != 0:
+                continue
+            if kinds[tick] == OperationType.DUMP:
+                columns = [0] + [plan.shard_of(vid) for vid in range(1, len(headers))]
+                body = [[dumps[tick][columns[j]][i][j] for j in range(len(headers))] for i in range(len(body))]
+        if headers is None:
+            sink.message(body)
+        else:
+            sink.table(headers, body)
+
+
+def run_sharded(operations, sink, topology=None, num_shards=4, workers=None, epoch=64):
+    """
+    Run the operations with the variables split into shards, each with its own sites and lock
+    tables. The shards run in parallel processes for an epoch of ticks, then the transactions
+    spanning several shards are committed or aborted together and the deadlocks across shards are
+    broken. Without spanning transactions the output is the one of the serial run. A spanning
+    transaction keeps its locks until the end of the epoch its last shard prepared it in, so the
+    operations waiting for it run later than in the serial run.
+
+    :param operations: list of operations
+    :param sink: OutputSink receiving the results
+    :param topology: Topology of the simulation, the default one if None
+    :param num_shards: number of shards
+    :param workers: number of worker processes, the number of CPUs if None
+    :param epoch: maximum number of ticks the shards run between two decisions
+    :return: None
+    """
+    topology = topology if topology is not None else Topology()
+    operations = list(operations)
+    plan = ShardPlan(operations, topology, num_shards)
+    kinds = bytes(operation.get_type() for operation in operations)
+    jobs = [(shard, shard_operations, plan.get_spanning(shard))
+            for shard, shard_operations in enumerate(plan.split(operations))]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    # shard i runs in worker i mod workers
+    worker_jobs = [jobs[index::workers] for index in range(workers)]
+
+    connections, processes = [], []
+    if workers == 1:
+        local_worker = ShardWorker(worker_jobs[0], kinds, topology)
+    else:
+        for index in range(workers):
+            connection, child = Pipe()
+            process = Process(target=serve_worker, args=(child, worker_jobs[index], kinds, topology), daemon=True)
+            process.start()
+            child.close()
+            connections.append(connection)
+            processes.append(process)
+
+    def call(message):
+        if workers == 1:
+            results = [local_worker.handle(message)]
+        else:
+            for connection in connections:
+                connection.send(message)
+            results = [connection.recv() for connection in connections]
+        # back in shard order
+        by_shard = [None] * len(jobs)
+        for index, result in enumerate(results):
+            by_shard[index::workers] = result
+        return by_shard
+
+    try:
+        coordinator = Coordinator(plan)
+        data_kinds = bytes(DATA_OPERATIONS)
+        decisions, boundary = [], None
+        for start, end in split_epochs(kinds, epoch):
+            if kinds[start] in GLOBAL_OPERATIONS:
+                # the transactions ended by the retries of the tick are decided before the command
+                reports = call((decisions, boundary, (RETRY, start, None)))
+                decisions, boundary = coordinator.decide(reports, start, False), start
+            reports = call((decisions, boundary, (RUN, start, end)))
+            boundary = end - 1
+            decisions = coordinator.decide(reports, boundary, any(kind in data_kinds for kind in kinds[start:end]))
+
+        # drop the oldest blocked operation of all shards each tick like FileRunner.run does
+        tick = len(operations)
+        while True:
+            reports = call((decisions, boundary, (REPORT,)))
+            oldest = [report[4] for report in reports if report[4] is not None]
+            if not oldest:
+                break
+            tick += 1
+            reports = call(([], None, (RETRY, tick, min(oldest))))
+            decisions, boundary = coordinator.decide(reports, tick, False), tick
+
+        merge(call(([], None, (RECORDS,))), plan, kinds, sink)
+    finally:
+        for connection in connections:
+            connection.send(None)
+            connection.close()
+        for process in processes:
+            process.join()
+        sink.flush()
+
+
+def run_sharded_by_file(input, output, output_format="table", topology=None, num_shards=4, workers=None, epoch=64):
+    """
+    Load the whole input and run it sharded, see run_sharded
+
+    :param input: input file, "-" or None reads from stdin
+    :param output: output file, "-" or None writes to stdout
+    :param output_format: name of the output sink, see OutputSink.SINKS
+    :return: None
+    """
+    operations = list(FileLoader(input or "-").iter_operations())
+    if output is None or output == "-":
+        run_sharded(operations, create_sink(output_format, sys.stdout), topology, num_shards, workers, epoch)
+        return
+
+    with open(output, "w") as f:
+        run_sharded(operations, create_sink(output_format, f), topology, num_shards, workers, epoch)
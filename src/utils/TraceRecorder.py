@@ -0,0 +1,297 @@
+import json
+import struct
+import sys
+import zlib
+from functools import partial
+from src.CustomizedConf import AbortType, OperationType, TransactionStatus
+from src.manager.DeadlockPolicy import Detection, create_policy
+from src.manager.TransactionManager import TransactionManager
+from src.model.Operation import Operation
+from src.model.Topology import Topology
+from src.utils.FileLoader import FileLoader
+from src.utils.FileRunner import run
+from src.utils.Metrics import NULL_METRICS
+from src.utils.OutputSink import NullSink, create_sink
+
+# magic, format version, length of the JSON settings that follow
+HEADER = struct.Struct("<4sII")
+# operation: tag, type, time, tid, vid, value, sid, number of the other (vid, value) pairs
+OPERATION = struct.Struct("<BBQqqqqI")
+# one more pair of a write of several variables
+PAIR = struct.Struct("<qq")
+# decision: kind, operation or abort type, tick, tid, vid
+DECISION = struct.Struct("<BBQqq")
+MAGIC = b"RCTR"
+FORMAT_VERSION = 2
+
+# first byte of a record
+OPERATION_TAG, DONE, BLOCKED, ABORTED, COMMITTED = range(5)
+DECISION_NAMES = {DONE: "done", BLOCKED: "blocked", ABORTED: "aborted", COMMITTED: "committed"}
+
+# None in the integer fields
+NONE = -2 ** 63
+
+
+class TraceError(Exception):
+    pass
+
+
+class TraceDivergence(Exception):
+    """
+    The replayed run made another decision than the recorded one
+
+    :param self.index: number of the decisions that matched before it
+    :param self.expected: recorded decision, None if the trace has no more decisions
+    :param self.actual: decision of the replay, None if it made no more decisions
+    """
+    def __init__(self, index, expected, actual):
+        self.index = index
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"decision {index + 1}: expected {format_decision(expected)}, "
+                         f"got {format_decision(actual)}")
+
+
+def format_decision(decision):
+    if decision is None:
+        return "nothing"
+    kind, detail, tick, tid, vid = decision
+    text = f"{DECISION_NAMES[kind]} at tick {tick}"
+    if tid != NONE:
+        text += f" T{tid}"
+    if vid != NONE:
+        text += f" x{vid}"
+    if kind == ABORTED:
+        return text + f" ({AbortType(detail).name})"
+    if kind != COMMITTED:
+        return text + f" ({OperationType(detail).name})"
+    return text
+
+
+def encode_operation(operation):
+    """
+    Pack an operation with its pairs if it writes several variables, its ids and values must be
+    64-bit integers
+
+    :return: bytes
+    """
+    tid, vid, value, sid = operation.tid, operation.vid, operation.value, operation.sid
+    pairs = operation.writes[1:] if operation.writes is not None else ()
+    # the smallest 64-bit integer is taken by None
+    if NONE not in (tid, vid, value, sid) and all(NONE not in pair for pair in pairs):
+        try:
+            return OPERATION.pack(OPERATION_TAG, operation.operation_type, operation.time,
+                                  NONE if tid is None else tid, NONE if vid is None else vid,
+                                  NONE if value is None else value, NONE if sid is None else sid,
+                                  len(pairs)) + b"".join(PAIR.pack(*pair) for pair in pairs)
+        except struct.error:
+            pass
+    raise TraceError(f"operation at tick {operation.time}: only ids and values between {NONE + 1} and "
+                     f"{-NONE - 1} can be recorded")
+
+
+class TraceWriter:
+    """
+    Write the operations of a run and the decisions of the engine to a binary trace.
+
+    The trace is a header with the settings of the run, the topology, the lock mode and the
+    deadlock policy, as JSON, followed by operation and decision records in the order of the run. Records are
+    buffered and written in zlib compressed blocks.
+
+    :param self.buffer: encoded records not written yet
+    """
+
+    def __init__(self, path, topology, fair_locks=True, deadlock_policy=None, buffer_size=1 << 16):
+        self.file = open(path, "wb")
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.compressor = zlib.compressobj(1)
+        settings = json.dumps({
+            "variables": topology.num_variables,
+            "sites": topology.num_sites,
+            "placement": {str(vid): list(sids) for vid, sids in topology.var_sites.items()},
+            "fair_locks": fair_locks,
+            "deadlock": (deadlock_policy if deadlock_policy is not None else Detection()).get_settings(),
+        }).encode()
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(settings)) + settings)
+
+    def operation(self, operation):
+        self.buffer += encode_operation(operation)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def decision(self, kind, detail, tick, tid, vid):
+        self.buffer += DECISION.pack(kind, detail, tick, tid, vid)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.compressor.compress(self.buffer))
+        self.buffer = bytearray()
+
+    def close(self):
+        self.flush()
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+
+class TraceReader:
+    """
+    Read a binary trace written by TraceWriter
+
+    :param self.topology: Topology of the recorded run
+    :param self.fair_locks: lock mode of the recorded run
+    :param self.deadlock_policy: a new DeadlockPolicy like the one of the recorded run
+    :param self.operations: recorded operations in input order
+    :param self.decisions: recorded decisions in run order, (kind, detail, tick, tid, vid)
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise TraceError(f"{path}: not a trace")
+        magic, version, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise TraceError(f"{path}: not a trace of format {FORMAT_VERSION}")
+        settings = json.loads(data[HEADER.size:HEADER.size + length])
+        placement = {int(vid): sids for vid, sids in settings["placement"].items()}
+        self.topology = Topology(settings["variables"], settings["sites"], placement)
+        self.fair_locks = settings["fair_locks"]
+        deadlock = settings["deadlock"]
+        self.deadlock_policy = create_policy(deadlock["policy"], deadlock.get("interval", 1))
+        self.operations, self.decisions = [], []
+        try:
+            self.read_records(zlib.decompress(data[HEADER.size + length:]))
+        except (struct.error, zlib.error):
+            raise TraceError(f"{path}: truncated trace")
+
+    def read_records(self, data):
+        offset = 0
+        operation_size, decision_size = OPERATION.size, DECISION.size
+        unpack_operation, unpack_decision = OPERATION.unpack_from, DECISION.unpack_from
+        operations, decisions = self.operations, self.decisions
+        end = len(data)
+        while offset < end:
+            if data[offset] != OPERATION_TAG:
+                decisions.append(unpack_decision(data, offset))
+                offset += decision_size
+                continue
+            _, operation_type, time, tid, vid, value, sid, count = unpack_operation(data, offset)
+            offset += operation_size
+            operation = Operation(operation_type, None if tid == NONE else tid, None if vid == NONE else vid,
+                                  None if value == NONE else value, None if sid == NONE else sid, time)
+            if count:
+                pairs = [(vid, value)]
+                for _ in range(count):
+                    pairs.append(PAIR.unpack_from(data, offset))
+                    offset += PAIR.size
+                operation.writes = tuple(pairs)
+            operations.append(operation)
+
+
+class TracingTransactionManager(TransactionManager):
+    """
+    A transaction manager reporting its decisions: an operation done or blocked, with the tick
+    and the transaction, an abort with its reason and a commit with its tick.
+
+    :param self.on_decision: callable(kind, detail, tick, tid, vid)
+    :param self.on_operation: callable(operation) invoked for every new operation, or None
+    """
+
+    def __init__(self, sink=None, topology=None, metrics=NULL_METRICS, on_decision=None, on_operation=None):
+        super().__init__(sink, topology, metrics)
+        self.on_decision = on_decision
+        self.on_operation = on_operation
+
+    def execute_operation(self, operations):
+        if self.on_operation is not None:
+            self.on_operation(operations)
+        return super().execute_operation(operations)
+
+    def assign_task(self, operation, is_retry=False):
+        is_succeed = super().assign_task(operation, is_retry)
+        tid, vid = operation.get_tid(), operation.get_vid()
+        self.on_decision(DONE if is_succeed else BLOCKED, operation.get_type(), self.tick,
+                         NONE if tid is None else tid, NONE if vid is None else vid)
+        return is_succeed
+
+    def abort(self, tid, abort_type=AbortType.DEADLOCK):
+        super().abort(tid, abort_type)
+        self.on_decision(ABORTED, abort_type.value, self.tick, tid, NONE)
+
+    def execute_end(self, operation, is_retry=False):
+        tid = operation.get_tid()
+        trans = self.transactions.get(tid)
+        is_aborted = trans is not None and trans.transaction_status == TransactionStatus.ABORTED
+        is_succeed = super().execute_end(operation, is_retry)
+        if is_succeed and not is_aborted:
+            self.on_decision(COMMITTED, 0, self.tick, tid, NONE)
+        return is_succeed
+
+
+class DecisionChecker:
+    """
+    Compare the decisions of a replay with the recorded ones, a TraceDivergence is raised at the
+    first difference
+
+    :param self.index: number of the decisions matched so far
+    """
+
+    def __init__(self, decisions):
+        self.decisions = decisions
+        self.index = 0
+
+    def __call__(self, kind, detail, tick, tid, vid):
+        actual = (kind, detail, tick, tid, vid)
+        expected = self.decisions[self.index] if self.index < len(self.decisions) else None
+        if actual != expected:
+            raise TraceDivergence(self.index, expected, actual)
+        self.index += 1
+
+    def finish(self):
+        if self.index < len(self.decisions):
+            raise TraceDivergence(self.index, self.decisions[self.index], None)
+
+
+def record_by_file(input, trace, output, output_format="table", topology=None, metrics=NULL_METRICS,
+                   log_config=None, deadlock_policy=None):
+    """
+    Run the operations of input like run_by_file and record them with the decisions to trace
+
+    :param input: input file, "-" or None reads from stdin
+    :param trace: path of the binary trace
+    :param output: output file, "-" or None writes to stdout
+    :return: None
+    """
+    topology = topology if topology is not None else Topology()
+    writer = TraceWriter(trace, topology, deadlock_policy=deadlock_policy)
+    manager_class = partial(TracingTransactionManager, on_decision=writer.decision, on_operation=writer.operation)
+    operations = FileLoader(input or "-").iter_operations()
+    try:
+        if output is None or output == "-":
+            run(operations, create_sink(output_format, sys.stdout), topology, manager_class, metrics, log_config,
+                deadlock_policy=deadlock_policy)
+        else:
+            with open(output, "w") as f:
+                run(operations, create_sink(output_format, f), topology, manager_class, metrics, log_config,
+                    deadlock_policy=deadlock_policy)
+    finally:
+        writer.close()
+
+
+def replay(trace, sink=None):
+    """
+    Run the operations of a trace again and check every decision is the recorded one
+
+    :param trace: path of the binary trace
+    :param sink: OutputSink receiving the results, discarded by default
+    :return: (number of operations, number of decisions)
+    """
+    reader = TraceReader(trace)
+    checker = DecisionChecker(reader.decisions)
+    manager_class = partial(TracingTransactionManager, on_decision=checker)
+    run(reader.operations, sink if sink is not None else NullSink(), reader.topology, manager_class,
+        fair_locks=reader.fair_locks, deadlock_policy=reader.deadlock_policy)
+    checker.finish()
+    return len(reader.operations), len(reader.decisions)